@@ -1,22 +1,93 @@
 """
 Application factory and configuration.
 """
+import logging
+import os
 from flask import Flask
-from app.products.views import products_bp
+from sqlalchemy.exc import SQLAlchemyError
 from app.common.extensions import db
+from app.common.database import init_async_engine, init_engine_profile
+from app.common.instrumentation import init_instrumentation
+from app.common.json_provider import FastJSONProvider
+from app.common.startup import register_blueprints
+
+logger = logging.getLogger(__name__)
+
+# Blueprints registered by the factory, as (import path, url prefix). They are
+# imported by name so LAZY_BLUEPRINTS can defer the imports to the first request.
+BLUEPRINTS = [
+    ('app.products.views:products_bp', '/products'),
+]
+
+# Async variants of the I/O-bound product views, registered with ASYNC_VIEWS_ENABLED.
+ASYNC_BLUEPRINTS = [
+    ('app.products.async_views:products_async_bp', '/async/products'),
+]
 
 def create_app(config_name):
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
+    app.json = app.config['JSON_PROVIDER_CLASS'](app)
 
     db.init_app(app)
+    init_engine_profile(app, db)
+    init_async_engine(app, db)
+
+    if app.config['INSTRUMENTATION_ENABLED']:
+        init_instrumentation(app, db)
 
-    app.register_blueprint(products_bp, url_prefix='/products')
+    blueprints = BLUEPRINTS + (ASYNC_BLUEPRINTS if app.config['ASYNC_VIEWS_ENABLED'] else [])
+    register_blueprints(app, blueprints, lazy=app.config['LAZY_BLUEPRINTS'],
+                        on_loaded=_on_blueprints_loaded)
 
     return app
 
+def _on_blueprints_loaded(app):
+    if app.config['SEARCH_INDEX_ENABLED']:
+        build_search_index(app)
+
+def build_search_index(app):
+    """
+    Build the in-memory product search index from the database.
+    Search falls back to the product repository if the catalog cannot be loaded.
+    """
+    from app.products.views import search_service
+
+    search_service.fuzzy_min_results = app.config['SEARCH_FUZZY_MIN_RESULTS']
+    if search_service.trigram_index is not None:
+        search_service.trigram_index.memory_budget = app.config['SEARCH_TRIGRAM_MEMORY_BUDGET']
+    with app.app_context():
+        try:
+            search_service.build_index()
+        except SQLAlchemyError as e:
+            logger.warning("Could not build product search index: %s", str(e))
+
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SEARCH_INDEX_ENABLED = True
+    # Misspelled terms are corrected when the index finds fewer matches than this
+    SEARCH_FUZZY_MIN_RESULTS = 1
+    # Estimated size limit, in bytes, of the trigram index used for those corrections
+    SEARCH_TRIGRAM_MEMORY_BUDGET = 8 * 1024 * 1024
+    JSON_PROVIDER_CLASS = FastJSONProvider
+    # Import and register BLUEPRINTS on the first request instead of in create_app
+    LAZY_BLUEPRINTS = False
+    # Per-endpoint latency and SQL metrics, served at METRICS_URL_PREFIX + '/metrics'
+    INSTRUMENTATION_ENABLED = False
+    METRICS_URL_PREFIX = '/internal'
+    # Token operational clients send in the X-Internal-Token header; internal endpoints are closed without it
+    INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN')
+    # Pragmas run on every new SQLite connection, and optional routing of reads to a read-only pool
+    SQLITE_PRAGMAS = {}
+    SQLITE_READ_ROUTING = False
+    SQLALCHEMY_READ_ENGINE_OPTIONS = {}
+    # Async engine (aiosqlite) for the async repositories, and registration of ASYNC_BLUEPRINTS;
+    # both need the optional packages in requirements-async.txt
+    ASYNC_DB_ENABLED = False
+    SQLALCHEMY_ASYNC_ENGINE_OPTIONS = {}
+    ASYNC_VIEWS_ENABLED = False
+    # SQLite file holding saved carts, shared by the workers on a host
+    CART_DB = os.getenv('CART_DB', 'carts.db')
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -24,13 +95,38 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///test.db')
 
 class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///prod.db'
+    INSTRUMENTATION_ENABLED = True
+    # Writer connections. db.session keeps its connection for the whole request, so this
+    # is how many requests can use db.session at once. The default of 1 queues them in the
+    # pool instead of contending on SQLite's single write lock. Raise it when requests
+    # that use db.session mostly read. See app/common/database.py.
+    SQLITE_WRITER_POOL_SIZE = int(os.getenv('SQLITE_WRITER_POOL_SIZE', '1'))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': SQLITE_WRITER_POOL_SIZE,
+        'max_overflow': 0,
+        'pool_timeout': 30,
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,  # 64 MiB
+        'mmap_size': 268435456,  # 256 MiB
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_READ_ROUTING = True
+    SQLALCHEMY_READ_ENGINE_OPTIONS = {
+        'pool_size': 8,
+        'max_overflow': 8,
+        'pool_timeout': 10,
+    }
 
 config_by_name = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
     'production': ProductionConfig
-}
\ No newline at end of file
+}
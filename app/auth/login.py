@@ -1,8 +1,10 @@
 import logging
+import os
 from flask import Blueprint, request, jsonify, session
-from werkzeug.security import check_password_hash
 from typing import Union
-from app.common.custom_exceptions import AuthenticationError
+from app.common.custom_exceptions import AuthenticationError, LoginThrottledError
+from app.auth.password_hashing import HashingUnavailableError, password_hasher
+from app.auth.login_throttle import LoginThrottle, create_throttle_backend
 
 # Configure logging
 logger = logging.getLogger("auth_service")
@@ -14,17 +16,21 @@ auth_blueprint = Blueprint("auth", __name__)
 # Mock database for demonstration purposes
 MOCK_USERS = {
     "user1@example.com": {
-        "password_hash": "pbkdf2:sha256:260000$mypasswordhash",
-        "lockout_count": 0
+        "password_hash": "pbkdf2:sha256:260000$mypasswordhash"
     },
     "user2@example.com": {
-        "password_hash": "pbkdf2:sha256:260000$anotherpasswordhash",
-        "lockout_count": 0
+        "password_hash": "pbkdf2:sha256:260000$anotherpasswordhash"
     }
 }
 
 LOCKOUT_THRESHOLD = 5
 
+# Set LOGIN_THROTTLE_DB to a SQLite path to share lockout state between workers.
+login_throttle = LoginThrottle(
+    create_throttle_backend(os.getenv("LOGIN_THROTTLE_DB")),
+    account_limit=LOCKOUT_THRESHOLD,
+)
+
 class SessionManager:
     """
     Handles user session operations.
@@ -45,23 +51,29 @@ class AuthenticationService:
     """
 
     @staticmethod
-    def login(email: str, password: str) -> Union[str, None]:
-        if email not in MOCK_USERS:
-            raise AuthenticationError("Invalid credentials.")
-        user_data = MOCK_USERS[email]
+    def login(email: str, password: str, client_ip: str = None) -> Union[str, None]:
+        failures = login_throttle.reserve(email, client_ip)
 
-        if user_data["lockout_count"] >= LOCKOUT_THRESHOLD:
-            raise AuthenticationError("Account temporarily locked. Check your email for recovery options.")
+        user_data = MOCK_USERS.get(email)
+        if user_data is None:
+            raise AuthenticationError("Invalid credentials.")
 
-        if check_password_hash(user_data["password_hash"], password):
-            user_data["lockout_count"] = 0  # Reset lockout count on successful login
+        try:
+            verified, new_hash = password_hasher.verify_password(user_data["password_hash"], password)
+        except HashingUnavailableError:
+            login_throttle.release(email, client_ip)  # No verdict, so the attempt does not count
+            raise
+        if verified:
+            if new_hash:
+                user_data["password_hash"] = new_hash  # Upgrade hashes made with outdated parameters
+                logger.info(f"Rehashed password for user {email}.")
+            login_throttle.record_success(email, client_ip)  # Reset failure count on successful login
             logger.info(f"User {email} successfully logged in.")
             return email
         else:
-            user_data["lockout_count"] += 1
-            logger.warning(f"Failed login attempt {user_data['lockout_count']} for user {email}.")
+            logger.warning(f"Failed login attempt {failures:.0f} for user {email}.")
 
-            if user_data["lockout_count"] >= LOCKOUT_THRESHOLD:
+            if failures >= LOCKOUT_THRESHOLD:
                 # Trigger account lockout notifications here
                 logger.error(f"User {email} account locked due to repeated failures.")
             raise AuthenticationError("Invalid credentials.")
@@ -79,16 +91,22 @@ def login_handler():
         if not email or not password:
             return jsonify({"error": "Missing email or password."}), 400
 
-        user_email = AuthenticationService.login(email, password)
+        user_email = AuthenticationService.login(email, password, request.remote_addr)
 
         # Create user session
         SessionManager.create_session(user_email)
 
         return jsonify({"message": "Login successful."}), 200
 
+    except LoginThrottledError as throttle_err:
+        return jsonify({"error": str(throttle_err)}), 429
+
     except AuthenticationError as auth_err:
         return jsonify({"error": str(auth_err)}), 401
 
+    except HashingUnavailableError as busy_err:
+        return jsonify({"error": str(busy_err)}), 503
+
     except Exception as e:
         logger.error(f"Unexpected error during login: {str(e)}")
         return jsonify({"error": "Internal server error."}), 500
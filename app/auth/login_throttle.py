@@ -0,0 +1,279 @@
+"""
+Sliding-window login throttling.
+
+Failed logins are counted per account and per client IP using a sliding
+window approximated from two fixed windows: the previous window's count is
+weighted by how much of it still overlaps the sliding window. Every update
+is O(1) and counters expire on their own once both windows have passed.
+
+An attempt is counted before the password is checked and the count it
+produces decides whether the attempt may proceed, so concurrent requests
+cannot all pass a check made before any of them recorded a failure.
+"""
+
+import logging
+import sqlite3
+import threading
+import itertools
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from app.common.custom_exceptions import LoginThrottledError
+
+logger = logging.getLogger("auth_service")
+
+
+def _estimate(current: int, previous: int, window_start: float, window_seconds: float, now: float) -> float:
+    overlap = 1.0 - (now - window_start) / window_seconds
+    return current + previous * max(overlap, 0.0)
+
+
+class InMemoryThrottleBackend:
+    """
+    Process-local counters split across independently locked shards.
+    """
+
+    def __init__(self, shards: int = 64, purge_every: int = 1024):
+        """
+        :param shards: Number of shards; each has its own lock and counter table
+        :param purge_every: Number of updates to a shard between sweeps of expired counters
+        """
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._tables: List[Dict[str, list]] = [{} for _ in range(shards)]
+        self._updates = [0] * shards
+        self.purge_every = purge_every
+
+    def _shard(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % len(self._locks)
+
+    @staticmethod
+    def _roll(entry: list, window: int) -> list:
+        # entry is [window index, count in that window, count in the window before]
+        if entry[0] == window:
+            return entry
+        previous = entry[1] if entry[0] == window - 1 else 0
+        return [window, 0, previous]
+
+    def hit(self, key: str, window_seconds: float, now: float) -> float:
+        window = int(now // window_seconds)
+        shard = self._shard(key)
+        with self._locks[shard]:
+            table = self._tables[shard]
+            entry = self._roll(table.get(key, [window, 0, 0]), window)
+            entry[1] += 1
+            table[key] = entry
+
+            self._updates[shard] += 1
+            if self._updates[shard] >= self.purge_every:
+                self._updates[shard] = 0
+                self._purge_table(table, window)
+        return _estimate(entry[1], entry[2], window * window_seconds, window_seconds, now)
+
+    def peek(self, key: str, window_seconds: float, now: float) -> float:
+        window = int(now // window_seconds)
+        shard = self._shard(key)
+        with self._locks[shard]:
+            entry = self._tables[shard].get(key)
+            if entry is None:
+                return 0.0
+            entry = self._roll(entry, window)
+        return _estimate(entry[1], entry[2], window * window_seconds, window_seconds, now)
+
+    def release(self, key: str, window_seconds: float, now: float) -> None:
+        window = int(now // window_seconds)
+        shard = self._shard(key)
+        with self._locks[shard]:
+            entry = self._tables[shard].get(key)
+            if entry is not None and entry[0] >= window - 1 and entry[1] > 0:
+                entry[1] -= 1
+
+    def reset(self, key: str) -> None:
+        shard = self._shard(key)
+        with self._locks[shard]:
+            self._tables[shard].pop(key, None)
+
+    @staticmethod
+    def _purge_table(table: Dict[str, list], window: int) -> None:
+        for key in [key for key, entry in table.items() if entry[0] < window - 1]:
+            del table[key]
+
+    def purge_expired(self, window_seconds: float, now: float) -> None:
+        window = int(now // window_seconds)
+        for lock, table in zip(self._locks, self._tables):
+            with lock:
+                self._purge_table(table, window)
+
+
+class SQLiteThrottleBackend:
+    """
+    Counters stored in a SQLite database shared by all workers on a host.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, purge_every: int = 1024):
+        """
+        :param path: Path of the shared SQLite database file
+        :param busy_timeout: Seconds to wait for another worker's write lock
+        :param purge_every: Number of updates by this process between sweeps of expired counters
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_every = purge_every
+        self._updates = itertools.count(1)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS login_throttle ("
+                " key TEXT PRIMARY KEY,"
+                " window INTEGER NOT NULL,"
+                " current INTEGER NOT NULL,"
+                " previous INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_login_throttle_window ON login_throttle (window)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key: str, window_seconds: float, now: float) -> float:
+        window = int(now // window_seconds)
+        connection = self._connection()
+        with connection:
+            # Roll the windows forward and count the hit in a single statement.
+            connection.execute(
+                "INSERT INTO login_throttle (key, window, current, previous) VALUES (?, ?, 1, 0) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                " previous = CASE WHEN window = excluded.window THEN previous"
+                "                 WHEN window = excluded.window - 1 THEN current ELSE 0 END,"
+                " current = CASE WHEN window = excluded.window THEN current + 1 ELSE 1 END,"
+                " window = excluded.window",
+                (key, window),
+            )
+            current, previous = connection.execute(
+                "SELECT current, previous FROM login_throttle WHERE key = ?", (key,)
+            ).fetchone()
+        if next(self._updates) % self.purge_every == 0:
+            self.purge_expired(window_seconds, now)
+        return _estimate(current, previous, window * window_seconds, window_seconds, now)
+
+    def peek(self, key: str, window_seconds: float, now: float) -> float:
+        window = int(now // window_seconds)
+        row = self._connection().execute(
+            "SELECT window, current, previous FROM login_throttle WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < window - 1:
+            return 0.0
+        current, previous = (row[1], row[2]) if row[0] == window else (0, row[1])
+        return _estimate(current, previous, window * window_seconds, window_seconds, now)
+
+    def release(self, key: str, window_seconds: float, now: float) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE login_throttle SET current = current - 1 WHERE key = ? AND window >= ? AND current > 0",
+                (key, int(now // window_seconds) - 1),
+            )
+
+    def reset(self, key: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM login_throttle WHERE key = ?", (key,))
+
+    def purge_expired(self, window_seconds: float, now: float) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM login_throttle WHERE window < ?", (int(now // window_seconds) - 1,))
+
+
+class LoginThrottle:
+    """
+    Limits failed login attempts per account and per client IP.
+    """
+
+    def __init__(self, backend, account_limit: int = 5, ip_limit: int = 50,
+                 window_seconds: float = 900.0, clock=time.time):
+        """
+        :param backend: Counter backend (in-memory or SQLite)
+        :param account_limit: Failed attempts per account allowed within the window
+        :param ip_limit: Failed attempts per client IP allowed within the window
+        :param window_seconds: Length of the sliding window
+        :param clock: Wall-clock time source; shared backends need the same clock in every worker
+        """
+        self.backend = backend
+        self.account_limit = account_limit
+        self.ip_limit = ip_limit
+        self.window_seconds = window_seconds
+        self._clock = clock
+
+    @staticmethod
+    def _account_key(email: str) -> str:
+        return f"account:{email.strip().lower()}"
+
+    @staticmethod
+    def _ip_key(client_ip: str) -> str:
+        return f"ip:{client_ip}"
+
+    def reserve(self, email: str, client_ip: Optional[str] = None) -> float:
+        """
+        Count a login attempt as failed before it is verified, or reject it.
+
+        The attempt stays counted unless it succeeds (``record_success``) or is
+        abandoned without a verdict (``release``). Rejected attempts are not counted.
+
+        :return: Estimated number of failures for the account within the window,
+            including this attempt
+        :raises LoginThrottledError: If the account or the client IP is over its limit
+        """
+        now = self._clock()
+        account_key = self._account_key(email)
+        failures = self.backend.hit(account_key, self.window_seconds, now)
+        if failures > self.account_limit:
+            self.backend.release(account_key, self.window_seconds, now)
+            raise LoginThrottledError("Account temporarily locked. Check your email for recovery options.")
+        if client_ip:
+            ip_key = self._ip_key(client_ip)
+            if self.backend.hit(ip_key, self.window_seconds, now) > self.ip_limit:
+                self.backend.release(ip_key, self.window_seconds, now)
+                self.backend.release(account_key, self.window_seconds, now)
+                raise LoginThrottledError("Too many login attempts. Please try again later.")
+        return failures
+
+    def release(self, email: str, client_ip: Optional[str] = None) -> None:
+        """
+        Uncount a reserved attempt that could not be verified.
+        """
+        now = self._clock()
+        self.backend.release(self._account_key(email), self.window_seconds, now)
+        if client_ip:
+            self.backend.release(self._ip_key(client_ip), self.window_seconds, now)
+
+    def record_success(self, email: str, client_ip: Optional[str] = None) -> None:
+        """
+        Clear the account's failure count after a successful login and uncount
+        the attempt for the client IP.
+        """
+        self.backend.reset(self._account_key(email))
+        if client_ip:
+            self.backend.release(self._ip_key(client_ip), self.window_seconds, self._clock())
+
+    def purge_expired(self) -> None:
+        """
+        Drop counters whose windows have both passed.
+
+        Backends also do this on their own every ``purge_every`` updates.
+        """
+        self.backend.purge_expired(self.window_seconds, self._clock())
+
+
+def create_throttle_backend(sqlite_path: Optional[str] = None):
+    """
+    Build the shared SQLite backend if a path is given, else an in-memory one.
+    """
+    if sqlite_path:
+        return SQLiteThrottleBackend(sqlite_path)
+    return InMemoryThrottleBackend()
@@ -0,0 +1,165 @@
+"""
+Password hashing offloaded to a bounded process pool.
+
+Hashing and verification are CPU-bound and hold the GIL, so they run in a
+small dedicated pool of worker processes. Admission is limited: when too many
+operations are already in flight, callers wait at most ``queue_timeout``
+seconds for a slot, and at most ``operation_timeout`` seconds for the result,
+before ``HashingUnavailableError`` is raised.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HASH_METHOD = "pbkdf2:sha256:260000"
+
+
+class HashingUnavailableError(Exception):
+    """
+    Raised when the hashing pool cannot accept more work in time.
+    """
+    pass
+
+
+def _hash_password(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _check_password(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a size-limited process pool.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, queue_timeout: float = 2.0,
+                 operation_timeout: float = 10.0, method: str = DEFAULT_HASH_METHOD):
+        """
+        :param max_workers: Number of worker processes
+        :param max_pending: Maximum number of operations queued or running at once
+        :param queue_timeout: Seconds to wait for an admission slot
+        :param operation_timeout: Seconds to wait for an admitted operation to finish
+        :param method: Werkzeug hash method used for new hashes, e.g. ``pbkdf2:sha256:260000``
+        """
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self.operation_timeout = operation_timeout
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            operation: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            for operation in ("hash", "verify")
+        }
+        self._rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Workers are spawned rather than forked: forking a threaded web worker is unsafe.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _run(self, operation: str, function, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._metrics_lock:
+                self._rejected += 1
+            logger.warning("Password hashing pool saturated; rejecting %s request.", operation)
+            raise HashingUnavailableError("Password hashing is temporarily unavailable.")
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the work itself finishes, not until the caller gives up
+        # waiting, so timed-out operations still count against ``max_pending``.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.operation_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning("Password %s did not finish within %.1fs.", operation, self.operation_timeout)
+            raise HashingUnavailableError("Password hashing is temporarily unavailable.")
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._metrics_lock:
+                stats = self._metrics[operation]
+                stats["count"] += 1
+                stats["total_seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def hash_password(self, password: str) -> str:
+        """
+        Hash a password with the configured method.
+
+        :param password: Plain-text password
+        :return: Werkzeug-formatted password hash
+        :raises HashingUnavailableError: If no pool slot frees up in time
+        """
+        return self._run("hash", _hash_password, password, self.method)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Whether a stored hash was produced with a method other than the configured one.
+        """
+        return password_hash.split("$", 1)[0] != self.method
+
+    def verify_password(self, password_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password, rehashing it if the stored hash uses outdated parameters.
+
+        The rehash is best-effort: if the pool is too busy for it, the password
+        still verifies and the hash is upgraded on a later login.
+
+        :param password_hash: Stored password hash
+        :param password: Plain-text password to check
+        :return: Tuple of (whether the password matches, replacement hash or None)
+        :raises HashingUnavailableError: If verification cannot run or finish in time
+        """
+        if not self._run("verify", _check_password, password_hash, password):
+            return False, None
+        if self.needs_rehash(password_hash):
+            try:
+                return True, self.hash_password(password)
+            except HashingUnavailableError:
+                logger.info("Skipping password rehash; hashing pool is busy.")
+        return True, None
+
+    def metrics(self) -> Dict:
+        """
+        Return per-operation timing counters and the number of rejected requests.
+        """
+        with self._metrics_lock:
+            metrics = {operation: dict(stats) for operation, stats in self._metrics.items()}
+            metrics["rejected"] = self._rejected
+        return metrics
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# Shared hasher used by login, registration and password reset.
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
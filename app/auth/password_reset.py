@@ -6,8 +6,9 @@ Module for handling password reset functionality.
 
 import logging
 from flask import Blueprint, request, jsonify
-from app.models import User
-from app.common.utils import send_reset_email, verify_reset_token
+from app.common.models import User
+from app.common.utils import create_reset_token, send_reset_email, verify_reset_token, revoke_reset_token
+from app.auth.password_hashing import HashingUnavailableError
 from datetime import datetime, timedelta
 import hashlib
 import secrets
@@ -31,7 +32,7 @@ def request_password_reset():
     if not user:
         return jsonify({"message": "If your email is registered, a reset link will be sent."}), 200
 
-    token = user.get_reset_token()
+    token = create_reset_token(user.email)
     send_reset_email(user.email, token)
 
     return jsonify({"message": "If your email is registered, a reset link will be sent."}), 200
@@ -51,7 +52,13 @@ def reset_password(token: str):
     if not new_password or len(new_password) < 8:
         return jsonify({"error": "Password must be at least 8 characters long."}), 400
 
-    user.set_password(new_password)
-    user.save()
+    try:
+        user.set_password(new_password)
+    except HashingUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    # Revoking commits the new password in the same transaction; if another request
+    # used the token first, both are rolled back.
+    if not revoke_reset_token(token):
+        return jsonify({"error": "Token is invalid or expired."}), 400
 
     return jsonify({"message": "Your password has been reset successfully."}), 200
@@ -0,0 +1,198 @@
+"""
+Module for verifying password reset tokens.
+
+Recently verified tokens are cached with the user ID they resolve to, and
+tokens this process has seen revoked are kept in a local set fronted by a
+Bloom filter, so repeated, malformed and expired tokens are answered without
+a database query. Revocations are shared between processes through an
+optional shared store, which is consulted for every token that would
+otherwise be accepted. Tokens must carry an ``exp`` claim.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over byte strings.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        """
+        :param capacity: Expected number of items
+        :param error_rate: Target false-positive rate at that capacity
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: bytes):
+        # Double hashing: derive every probe position from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item: bytes) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedTokenSet:
+    """
+    Set of revoked token digests with expiry, checked through a Bloom filter first.
+    """
+
+    def __init__(self, capacity: int = 100000, clock=time.time):
+        self.capacity = capacity
+        self._clock = clock
+        self._expiry: Dict[bytes, float] = {}
+        self._bloom = BloomFilter(capacity)
+
+    def add(self, digest: bytes, expires_at: float) -> bool:
+        """
+        :return: False if the digest was already revoked
+        """
+        if digest in self:
+            return False
+        self._expiry[digest] = expires_at
+        self._bloom.add(digest)
+        if len(self._expiry) > self.capacity:
+            self.purge_expired()
+        return True
+
+    def __contains__(self, digest: bytes) -> bool:
+        if digest not in self._bloom:
+            return False
+        expires_at = self._expiry.get(digest)
+        return expires_at is not None and expires_at > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def purge_expired(self) -> None:
+        """
+        Forget tokens that have expired anyway and rebuild the Bloom filter.
+        """
+        now = self._clock()
+        self._expiry = {digest: expires_at for digest, expires_at in self._expiry.items() if expires_at > now}
+        self._bloom = BloomFilter(max(self.capacity, len(self._expiry)))
+        for digest in self._expiry:
+            self._bloom.add(digest)
+
+
+class ResetTokenVerifier:
+    """
+    Verifies password reset tokens, caching results and rejecting revoked tokens.
+    """
+
+    def __init__(self, secret_key: str, user_id_loader: Callable[[str], Optional[int]],
+                 shared_revoked=None, max_cached: int = 10000, negative_ttl: float = 60.0, clock=time.time):
+        """
+        :param secret_key: Key the tokens are signed with
+        :param user_id_loader: Returns the ID of the user with the given email, or None
+        :param shared_revoked: Revocations shared with other processes: supports ``digest in``
+            and ``add(digest, expires_at)``, which returns False if the digest was already
+            there. Without it, revocations are only known to this process.
+        :param max_cached: Maximum number of verified tokens kept in the LRU
+        :param negative_ttl: Seconds a token for an unknown email stays cached as invalid
+        :param clock: Wall-clock time source, comparable with the tokens' ``exp`` claims
+        """
+        self.secret_key = secret_key
+        self.user_id_loader = user_id_loader
+        self.max_cached = max_cached
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._verified: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._revoked = RevokedTokenSet(clock=clock)
+        self.shared_revoked = shared_revoked
+        self._lock = threading.Lock()
+
+    def _decode(self, token: str) -> Optional[Dict]:
+        import jwt  # deferred: only needed once a reset link is used
+
+        try:
+            # Without an expiry a token could not be revoked for a bounded time, so it is refused.
+            return jwt.decode(token, self.secret_key, algorithms=['HS256'], options={'require': ['exp']})
+        except jwt.InvalidTokenError:  # also covers expired tokens and a missing ``exp``
+            return None
+
+    def verify(self, token: str) -> Optional[int]:
+        """
+        Resolve a reset token to the ID of its user.
+
+        :param token: Token from the reset link
+        :return: The user's ID, or None if the token is invalid, expired, revoked or unknown
+        """
+        digest = _digest(token)
+        now = self._clock()
+        with self._lock:
+            if digest in self._revoked:
+                return None
+            cached = self._verified.get(digest)
+            if cached is not None and cached[1] <= now:
+                del self._verified[digest]
+                cached = None
+            if cached is not None:
+                self._verified.move_to_end(digest)
+
+        if cached is not None:
+            user_id, expires_at = cached
+        else:
+            payload = self._decode(token)
+            if payload is None or 'email' not in payload:
+                return None
+            user_id = self.user_id_loader(payload['email'])
+            expires_at = float(payload['exp'])
+            cached_until = expires_at if user_id is not None else min(expires_at, now + self.negative_ttl)
+            with self._lock:
+                self._verified[digest] = (user_id, cached_until)
+                self._verified.move_to_end(digest)
+                while len(self._verified) > self.max_cached:
+                    self._verified.popitem(last=False)
+
+        if user_id is not None and self.shared_revoked is not None and digest in self.shared_revoked:
+            self._remember_revoked(digest, expires_at)
+            return None
+        return user_id
+
+    def _remember_revoked(self, digest: bytes, expires_at: float) -> bool:
+        with self._lock:
+            self._verified.pop(digest, None)
+            return self._revoked.add(digest, expires_at)
+
+    def revoke(self, token: str) -> bool:
+        """
+        Mark a token as used so that it is rejected until it expires.
+
+        With a shared store this is atomic across processes, so exactly one
+        caller wins for a given token.
+
+        :param token: Token from the reset link
+        :return: True if this call revoked the token; False if it was invalid or already revoked
+        """
+        payload = self._decode(token)
+        if payload is None:
+            return False
+        digest = _digest(token)
+        expires_at = float(payload['exp'])
+        revoked = self._remember_revoked(digest, expires_at)
+        if self.shared_revoked is not None:
+            revoked = self.shared_revoked.add(digest, expires_at)
+        if revoked:
+            logger.info("Password reset token revoked.")
+        return revoked
@@ -1,6 +1,7 @@
 import logging
 from typing import Optional
 from app.common.exceptions import ValidationError
+from app.common.email_outbox import get_outbox
 from flask import current_app
 
 logger = logging.getLogger(__name__)
@@ -96,7 +97,7 @@ class UserService:
 
     def _send_confirmation_email(self, email: str) -> None:
         """
-        Sends a confirmation email to the user.
+        Queues a confirmation email to the user on the shared email outbox.
         Args:
             email (str): User's email
 
@@ -104,7 +105,7 @@ class UserService:
             None
         """
         logger.info("Sending confirmation email to: %s", email)
-        pass  # Placeholder logic for email sending
+        get_outbox().send(email, "Confirm your account", "Thank you for registering. Please confirm your email address.")
 
 
 # Example Custom Exception
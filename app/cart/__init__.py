@@ -1,2 +1,4 @@
-from .shopping_cart import ShoppingCart, Product, ShoppingCartException
-from .cart_service import handle_add_product, handle_modify_quantity
+from .shopping_cart import ShoppingCart, LineItem, ShoppingCartError
+from .cart_service import CartService, CartRevisionConflictError
+from .cart_codec import CartCodecError, decode_cart, encode_cart
+from .cart_repricing import CartRepricer
@@ -0,0 +1,53 @@
+import logging
+from flask import Blueprint, request, jsonify
+
+from app.cart import cart_controller
+from app.cart.cart_service import CartRevisionConflictError
+from app.cart.shopping_cart import ShoppingCartError
+
+logger = logging.getLogger(__name__)
+
+# Async variants of the cart save and retrieve endpoints. They use the same
+# CartService as cart_blueprint and need Flask installed with the 'async' extra.
+cart_async_blueprint = Blueprint('cart_async', __name__, url_prefix='/async/cart')
+
+@cart_async_blueprint.route('/save', methods=['POST'])
+async def save_cart():
+    """
+    Async variant of ``POST /cart/save``, with the same request body and response.
+
+    :return: JSON response with success status and the cart's new revision
+    """
+    data = request.json
+    user_id = data.get("user_id")
+    cart_data = data.get("cart")
+
+    try:
+        revision = await cart_controller.get_cart_service().save_cart_async(user_id, cart_data)
+        return jsonify({"status": "success", "revision": revision}), 200
+    except CartRevisionConflictError as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except ShoppingCartError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in save_cart: {e}")
+        return jsonify({"error": "Failed to save cart."}), 500
+
+@cart_async_blueprint.route('/retrieve', methods=['GET'])
+async def retrieve_cart():
+    """
+    Async variant of ``GET /cart/retrieve``.
+
+    Query Parameters:
+    ?user_id=<string>
+
+    :return: JSON response with the cart data and its revision
+    """
+    user_id = request.args.get("user_id")
+
+    try:
+        cart_data, revision = await cart_controller.get_cart_service().retrieve_cart_with_revision_async(user_id)
+        return jsonify({"status": "success", "cart": cart_data, "revision": revision}), 200
+    except Exception as e:
+        logger.error(f"Error in retrieve_cart: {e}")
+        return jsonify({"error": "Failed to retrieve cart."}), 500
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Initialize the module logger
+logger = logging.getLogger(__name__)
+
+class CartCache:
+    """
+    In-process LRU cache of shopping carts with a per-entry time to live.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0, clock=time.monotonic):
+        """
+        Initialize the cache.
+
+        :param max_entries: Maximum number of carts kept before evicting the least recently used
+        :param ttl_seconds: Seconds after which a cached cart is considered stale
+        :param clock: Monotonic time source, injectable for tests
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._counters: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, user_id: str, outcome: str) -> None:
+        counters = self._counters.get(user_id)
+        if counters is None:
+            counters = self._counters[user_id] = {"hits": 0, "misses": 0}
+            if len(self._counters) > self.max_entries:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(user_id)
+        counters[outcome] += 1
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached cart for a user, or None on a miss.
+
+        :param user_id: The unique identifier of the user
+        :return: Cached cart data, or None if absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] < self._clock():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self._count(user_id, "misses")
+                return None
+            self._entries.move_to_end(user_id)
+            self._count(user_id, "hits")
+            return entry[0]
+
+    def put(self, user_id: str, cart_data: Dict[str, Any]) -> None:
+        """
+        Cache the cart for a user.
+
+        :param user_id: The unique identifier of the user
+        :param cart_data: Dictionary representing shopping cart data
+        """
+        with self._lock:
+            self._entries[user_id] = (cart_data, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Drop the cached cart for a user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return hit/miss counters for one user, or totals across all tracked users.
+
+        :param user_id: Optional user to report on
+        :return: Dictionary with ``hits`` and ``misses`` (and ``size`` for totals)
+        """
+        with self._lock:
+            if user_id is not None:
+                return dict(self._counters.get(user_id, {"hits": 0, "misses": 0}))
+            return {
+                "hits": sum(counters["hits"] for counters in self._counters.values()),
+                "misses": sum(counters["misses"] for counters in self._counters.values()),
+                "size": len(self._entries),
+            }
@@ -0,0 +1,175 @@
+import logging
+import struct
+import zlib
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Mapping, NamedTuple, Union
+
+# Initialize the module logger
+logger = logging.getLogger(__name__)
+
+# Layout of an encoded cart (all integers little-endian):
+#   header: magic b"CT", format version (B), flags (B)
+#   body, zlib-compressed when FLAG_COMPRESSED is set:
+#     line count (I), then per line:
+#       id kind (B), id (q for numeric ids, H length + UTF-8 bytes otherwise),
+#       quantity (I), price mantissa (q), price exponent (b)
+MAGIC = b"CT"
+FORMAT_VERSION = 1
+FLAG_COMPRESSED = 0x01
+
+_HEADER = struct.Struct("<2sBB")
+_COUNT = struct.Struct("<I")
+_KIND = struct.Struct("<B")
+_INT_ID = struct.Struct("<q")
+_STR_LENGTH = struct.Struct("<H")
+_LINE_TAIL = struct.Struct("<Iqb")
+
+# Product ID kinds: an int, a string holding a canonical integer, or anything else as a string.
+ID_INT = 0
+ID_NUMERIC_STR = 1
+ID_STR = 2
+
+# Bodies shorter than this are stored uncompressed.
+DEFAULT_COMPRESS_THRESHOLD = 256
+
+class CartCodecError(Exception):
+    """Raised when a cart cannot be encoded or an encoded cart cannot be read"""
+    pass
+
+class CartLine(NamedTuple):
+    """A stored cart line: product ID, quantity and unit price snapshot"""
+    product_id: Union[int, str]
+    quantity: int
+    price: Decimal
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the line in the cart data shape, with the exact price as a decimal string"""
+        return {"id": self.product_id, "price": str(self.price), "quantity": self.quantity}
+
+def _encode_id(product_id: Any) -> bytes:
+    if isinstance(product_id, int) and not isinstance(product_id, bool):
+        kind, value = ID_INT, product_id
+    elif isinstance(product_id, str) and product_id.isdigit() and str(int(product_id)) == product_id:
+        kind, value = ID_NUMERIC_STR, int(product_id)
+    else:
+        # Anything else is kept in its string form, which is also its cart data key.
+        raw = str(product_id).encode("utf-8")
+        if len(raw) > 0xFFFF:
+            raise CartCodecError("Product ID is too long")
+        return _KIND.pack(ID_STR) + _STR_LENGTH.pack(len(raw)) + raw
+    try:
+        return _KIND.pack(kind) + _INT_ID.pack(value)
+    except struct.error:
+        raise CartCodecError(f"Product ID out of range: {product_id!r}")
+
+def _encode_line(item: Mapping[str, Any]) -> bytes:
+    try:
+        price = Decimal(str(item["price"]))
+        quantity = item.get("quantity", 1)
+        product_id = item["id"]
+    except (KeyError, TypeError, InvalidOperation):
+        raise CartCodecError(f"Invalid cart line: {item!r}")
+    if not price.is_finite():
+        raise CartCodecError(f"Invalid price: {item['price']!r}")
+    sign, digits, exponent = price.as_tuple()
+    mantissa = int("".join(map(str, digits)) or "0") * (-1 if sign else 1)
+    try:
+        return _encode_id(product_id) + _LINE_TAIL.pack(quantity, mantissa, exponent)
+    except struct.error:
+        raise CartCodecError(f"Cart line out of range: {item!r}")
+
+def encode_cart(cart_data: Mapping[str, Mapping[str, Any]],
+                compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD) -> bytes:
+    """
+    Encode cart data, keeping only product IDs, quantities and price snapshots.
+
+    :param cart_data: Cart data keyed by product ID, each value holding at least id and price
+    :param compress_threshold: Minimum body size in bytes before zlib compression is tried
+    :return: Encoded cart
+    :raises CartCodecError: If a line is missing fields or a value does not fit the format
+    """
+    if not isinstance(cart_data, Mapping):
+        raise CartCodecError("Invalid cart data")
+    body = _COUNT.pack(len(cart_data)) + b"".join(_encode_line(item) for item in cart_data.values())
+    flags = 0
+    if len(body) >= compress_threshold:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            body, flags = compressed, FLAG_COMPRESSED
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, flags) + body
+
+def is_encoded_cart(value: Any) -> bool:
+    """Returns whether a stored value is an encoded cart rather than legacy cart data"""
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+def cart_body(blob: bytes) -> bytes:
+    """
+    Check the header of an encoded cart and return its uncompressed body.
+
+    :param blob: Value produced by ``encode_cart``
+    :return: Line count followed by the packed lines
+    :raises CartCodecError: If the header is invalid or the body cannot be decompressed
+    """
+    blob = bytes(blob)
+    try:
+        magic, version, flags = _HEADER.unpack_from(blob, 0)
+    except struct.error:
+        raise CartCodecError("Truncated cart header")
+    if magic != MAGIC:
+        raise CartCodecError("Not an encoded cart")
+    if version != FORMAT_VERSION:
+        raise CartCodecError(f"Unsupported cart format version: {version}")
+
+    body = blob[_HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise CartCodecError(f"Corrupt cart data: {e}")
+    return body
+
+def decode_cart_lines(blob: bytes) -> List[CartLine]:
+    """
+    Decode an encoded cart into its lines.
+
+    :param blob: Value produced by ``encode_cart``
+    :return: Cart lines in their stored order
+    :raises CartCodecError: If the value is corrupt or uses an unknown format version
+    """
+    body = cart_body(blob)
+    try:
+        (count,), offset = _COUNT.unpack_from(body, 0), _COUNT.size
+        lines = []
+        for _ in range(count):
+            (kind,) = _KIND.unpack_from(body, offset)
+            offset += _KIND.size
+            if kind == ID_STR:
+                (length,) = _STR_LENGTH.unpack_from(body, offset)
+                offset += _STR_LENGTH.size
+                product_id = body[offset:offset + length].decode("utf-8")
+                offset += length
+            elif kind in (ID_INT, ID_NUMERIC_STR):
+                (product_id,) = _INT_ID.unpack_from(body, offset)
+                offset += _INT_ID.size
+                if kind == ID_NUMERIC_STR:
+                    product_id = str(product_id)
+            else:
+                raise CartCodecError(f"Unknown product ID kind: {kind}")
+            quantity, mantissa, exponent = _LINE_TAIL.unpack_from(body, offset)
+            offset += _LINE_TAIL.size
+            lines.append(CartLine(product_id, quantity, Decimal(mantissa).scaleb(exponent)))
+    except (struct.error, UnicodeDecodeError) as e:
+        raise CartCodecError(f"Corrupt cart data: {e}")
+    return lines
+
+def decode_cart(blob: bytes) -> Dict[str, Dict[str, Any]]:
+    """
+    Decode an encoded cart into cart data keyed by product ID.
+
+    Lines carry only id, price and quantity; other product details are not stored.
+
+    :param blob: Value produced by ``encode_cart``
+    :return: Cart data
+    :raises CartCodecError: If the value is corrupt or uses an unknown format version
+    """
+    return {str(line.product_id): line.to_dict() for line in decode_cart_lines(blob)}
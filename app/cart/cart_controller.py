@@ -1,14 +1,47 @@
+import atexit
 import logging
-from flask import Blueprint, request, jsonify
+import threading
+from typing import Optional
 
-from app.cart.cart_service import CartService
+from flask import Blueprint, current_app, request, jsonify
+
+from app.cart.cart_cache import CartCache
+from app.cart.cart_repository import CartRepository, load_product_details
+from app.cart.cart_repricing import CartRepricer
+from app.cart.cart_service import CartRevisionConflictError, CartService
+from app.cart.cart_store import SQLiteCartStore
+from app.common.access import current_user, internal_only, login_required
+from app.cart.shopping_cart import ShoppingCart, ShoppingCartError
 
 logger = logging.getLogger(__name__)
 
 cart_blueprint = Blueprint('cart', __name__, url_prefix='/cart')
 
-# Dependency Injection Placeholder: Replace with actual instances
-cart_service = CartService(cart_repository=None)
+# Created by get_cart_service() on first use.
+cart_service: Optional[CartService] = None
+_cart_service_lock = threading.Lock()
+
+def get_cart_service() -> CartService:
+    """
+    Return the cart service shared by the cart blueprints, creating it on first use.
+
+    Carts are stored in the SQLite file at the app's ``CART_DB`` setting, shared
+    by the workers on a host, and filled in with current product details from
+    the catalog when read. Carts still held by the write-behind queue are
+    persisted when the worker exits.
+    """
+    global cart_service
+    if cart_service is None:
+        with _cart_service_lock:
+            if cart_service is None:
+                store = SQLiteCartStore(current_app.config["CART_DB"])
+                service = CartService(CartRepository(store, product_loader=load_product_details),
+                                      cache=CartCache(), write_behind_delay=5.0)
+                atexit.register(service.close)
+                cart_service = service
+    return cart_service
+
+MAX_DELTA_OPERATIONS = 500
 
 @cart_blueprint.route('/save', methods=['POST'])
 def save_cart():
@@ -21,15 +54,20 @@ def save_cart():
         "cart": {"<product_id>": <product_details>, ...}
     }
 
-    :return: JSON response with success status
+    :return: JSON response with success status and the cart's new revision, or 409 with
+        the current revision if another worker has stored a newer cart
     """
     data = request.json
     user_id = data.get("user_id")
     cart_data = data.get("cart")
 
     try:
-        cart_service.save_cart(user_id, cart_data)
-        return jsonify({"status": "success"}), 200
+        revision = get_cart_service().save_cart(user_id, cart_data)
+        return jsonify({"status": "success", "revision": revision}), 200
+    except CartRevisionConflictError as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except ShoppingCartError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error in save_cart: {e}")
         return jsonify({"error": "Failed to save cart."}), 500
@@ -42,13 +80,163 @@ def retrieve_cart():
     Query Parameters:
     ?user_id=<string>
 
-    :return: JSON response with the cart data
+    :return: JSON response with the cart data and its revision
     """
     user_id = request.args.get("user_id")
 
     try:
-        cart_data = cart_service.retrieve_cart(user_id)
-        return jsonify({"status": "success", "cart": cart_data}), 200
+        cart_data, revision = get_cart_service().retrieve_cart_with_revision(user_id)
+        return jsonify({"status": "success", "cart": cart_data, "revision": revision}), 200
     except Exception as e:
         logger.error(f"Error in retrieve_cart: {e}")
-        return jsonify({"error": "Failed to retrieve cart."}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to retrieve cart."}), 500
+
+@cart_blueprint.route('/delta', methods=['POST'])
+def apply_cart_delta():
+    """
+    API endpoint to apply incremental changes to the saved cart.
+
+    Request Body:
+    {
+        "user_id": "<string>",
+        "base_revision": <int, the revision the client last saw>,
+        "operations": [
+            {"op": "add", "product": {"id": ..., "price": ...}, "quantity": <int>},
+            {"op": "remove", "product_id": "<id>", "quantity": <int, optional>},
+            {"op": "set_quantity", "product_id": "<id>", "quantity": <int>}
+        ]
+    }
+
+    :return: JSON response with the new revision and total, 409 with the current
+        revision if base_revision is stale, or 400 if an operation is invalid
+    """
+    data = request.json or {}
+    user_id = data.get("user_id")
+    base_revision = data.get("base_revision")
+    operations = data.get("operations")
+    if not user_id:
+        return jsonify({"error": "Missing user_id."}), 400
+    if isinstance(base_revision, bool) or not isinstance(base_revision, int):
+        return jsonify({"error": "base_revision must be an integer."}), 400
+    if not isinstance(operations, list) or len(operations) > MAX_DELTA_OPERATIONS:
+        return jsonify({"error": f"operations must be a list of at most {MAX_DELTA_OPERATIONS} entries."}), 400
+
+    try:
+        cart, revision = get_cart_service().apply_delta(user_id, base_revision, operations)
+        return jsonify({"status": "success", "revision": revision,
+                        "total_price": str(cart.get_total_price())}), 200
+    except CartRevisionConflictError as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except ShoppingCartError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in apply_cart_delta: {e}")
+        return jsonify({"error": "Failed to update cart."}), 500
+
+@cart_blueprint.route('/merge', methods=['POST'])
+def merge_guest_cart():
+    """
+    API endpoint to merge a guest cart into the user's saved cart, e.g. on login.
+
+    Request Body:
+    {
+        "user_id": "<string>",
+        "base_revision": <int, the revision of the user's cart the client last saw>,
+        "guest_cart": {"<product_id>": <product_details with quantity>, ...}
+    }
+
+    :return: JSON response with the merged cart and its new revision, or 409 with
+        the current revision if base_revision is stale, e.g. because a retried
+        request was already merged
+    """
+    data = request.json or {}
+    user_id = data.get("user_id")
+    base_revision = data.get("base_revision")
+    if not user_id:
+        return jsonify({"error": "Missing user_id."}), 400
+    if isinstance(base_revision, bool) or not isinstance(base_revision, int):
+        return jsonify({"error": "base_revision must be an integer."}), 400
+
+    try:
+        guest_cart = ShoppingCart.from_dict(data.get("guest_cart") or {})
+        cart, revision = get_cart_service().merge_guest_cart(user_id, guest_cart, base_revision)
+        return jsonify({"status": "success", "cart": cart.to_dict(), "revision": revision}), 200
+    except CartRevisionConflictError as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except ShoppingCartError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in merge_guest_cart: {e}")
+        return jsonify({"error": "Failed to merge cart."}), 500
+
+@cart_blueprint.route('/flush', methods=['POST'])
+@login_required
+def flush_cart():
+    """
+    API endpoint to persist a user's pending cart immediately, e.g. on logout.
+    Only the logged-in user's own cart can be flushed.
+
+    Request Body:
+    {
+        "user_id": "<string>"
+    }
+
+    :return: JSON response with whether a pending cart was written
+    """
+    user_id = (request.json or {}).get("user_id")
+    if not user_id:
+        return jsonify({"error": "Missing user_id."}), 400
+    if user_id != current_user():
+        return jsonify({"error": "Forbidden."}), 403
+
+    try:
+        flushed = get_cart_service().flush_cart(user_id)
+        return jsonify({"status": "success", "flushed": flushed}), 200
+    except Exception as e:
+        logger.error(f"Error in flush_cart: {e}")
+        return jsonify({"error": "Failed to flush cart."}), 500
+
+@cart_blueprint.route('/reprice', methods=['POST'])
+@internal_only
+def reprice_carts():
+    """
+    API endpoint to apply catalog price changes to the price snapshots of stored carts.
+    Requires the internal API token.
+
+    Request Body:
+    {
+        "prices": {"<product_id>": <new unit price>, ...}
+    }
+
+    :return: JSON response with the repricing report
+    """
+    prices = (request.json or {}).get("prices")
+    if not isinstance(prices, dict):
+        return jsonify({"error": "prices must be an object of product IDs to prices."}), 400
+
+    try:
+        report = CartRepricer(get_cart_service()).reprice(prices)
+        return jsonify({"status": "success", "report": report}), 200
+    except (ArithmeticError, ValueError) as e:
+        return jsonify({"error": f"Invalid price: {e}"}), 400
+    except Exception as e:
+        logger.error(f"Error in reprice_carts: {e}")
+        return jsonify({"error": "Failed to reprice carts."}), 500
+
+@cart_blueprint.route('/stats', methods=['GET'])
+@internal_only
+def cart_cache_stats():
+    """
+    API endpoint exposing cart cache hit/miss counters and write-behind queue sizes.
+    Requires the internal API token.
+
+    Query Parameters:
+    ?user_id=<string> (optional; totals are returned when omitted)
+
+    :return: JSON response with the cache counters
+    """
+    user_id = request.args.get("user_id")
+    stats = get_cart_service().cache_stats(user_id)
+    stats["pending_writes"] = get_cart_service().pending_count()
+    stats["failed_writes"] = get_cart_service().failed_flush_count()
+    return jsonify({"status": "success", "stats": stats}), 200
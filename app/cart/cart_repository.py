@@ -1,36 +1,103 @@
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from app.cart.cart_codec import CartCodecError, FORMAT_VERSION, decode_cart, encode_cart, is_encoded_cart
 
 logger = logging.getLogger(__name__)
 
+# Returns current product details for a list of product IDs, keyed by str(product ID).
+ProductLoader = Callable[[Iterable[str]], Dict[str, Dict[str, Any]]]
+
 class CartRepository:
     """
     Repository class for managing shopping cart persistence.
+
+    Carts are stored in the compact encoding from ``cart_codec``: product IDs,
+    quantities and price snapshots only. Other product details are filled in
+    from ``product_loader`` when a cart is read. Records written before the
+    encoding existed hold the raw cart data, details included. They are
+    re-encoded when read only once ``product_loader`` can restore the details
+    of every line, and otherwise kept as they are until ``migrate_cart``.
     """
 
-    def __init__(self, db):
+    def __init__(self, db, product_loader: Optional[ProductLoader] = None, migrate_on_read: bool = True):
         """
         Initialize the repository with a database connection.
 
         :param db: Database connection or ORM instance
+        :param product_loader: Optional callable used to hydrate product details on read
+        :param migrate_on_read: Whether legacy records are re-encoded when read, provided
+            ``product_loader`` finds all of their products
         """
         self.db = db
+        self.product_loader = product_loader
+        self.migrate_on_read = migrate_on_read
 
-    def save_cart(self, user_id: str, cart_data: Dict[str, Any]) -> None:
+    def save_cart(self, user_id: str, cart_data: Dict[str, Any], revision: Optional[int] = None) -> bool:
         """
         Save shopping cart details to the database.
 
         :param user_id: The unique identifier of the user
         :param cart_data: The shopping cart data to be saved
+        :param revision: Revision number stored with the cart, if any
+        :return: Whether the cart was saved; False if the database holds a newer revision
+        :raises CartCodecError: If the cart data cannot be encoded
+        :raises Exception: If database operation fails
+        """
+        return self.save_encoded_cart(user_id, encode_cart(cart_data), revision)
+
+    def save_cart_if_revision(self, user_id: str, cart_data: Dict[str, Any], expected_revision: int,
+                              revision: int) -> bool:
+        """
+        Save a cart only if its stored revision is still ``expected_revision``.
+        Requires a database that provides ``save_if_revision(table, record, expected_revision)``.
+
+        :param user_id: The unique identifier of the user
+        :param cart_data: The shopping cart data to be saved
+        :param expected_revision: Revision the stored cart must have; 0 if the user has none
+        :param revision: Revision number stored with the cart
+        :return: Whether the cart was saved; False if another writer changed it first
+        :raises CartCodecError: If the cart data cannot be encoded
+        :raises NotImplementedError: If the database has no conditional save
+        :raises Exception: If database operation fails
+        """
+        save_if_revision = getattr(self.db, "save_if_revision", None)
+        if save_if_revision is None:
+            raise NotImplementedError("Revision-checked saves require a database that supports save_if_revision().")
+        logger.info(f"Saving cart to database for user {user_id} at revision {expected_revision}")
+        record = {"user_id": user_id, "data": encode_cart(cart_data), "format": FORMAT_VERSION, "revision": revision}
+        try:
+            return save_if_revision("cart", record, expected_revision)
+        except Exception as e:
+            logger.error(f"Error saving cart for user {user_id}: {e}")
+            raise
+
+    def save_encoded_cart(self, user_id: str, blob: bytes, revision: Optional[int] = None) -> bool:
+        """
+        Save a cart already encoded with ``encode_cart``.
+
+        :param user_id: The unique identifier of the user
+        :param blob: Encoded cart
+        :param revision: Revision number stored with the cart, if any
+        :return: Whether the cart was saved; False if the database holds a newer revision
         :raises Exception: If database operation fails
         """
         logger.info(f"Saving cart to database for user: {user_id}")
+        record = {"user_id": user_id, "data": blob, "format": FORMAT_VERSION}
+        if revision is not None:
+            record["revision"] = revision
         try:
-            self.db.save("cart", {"user_id": user_id, "data": cart_data})
-            logger.info("Cart saved successfully to database.")
+            # Databases that do not report the outcome always save.
+            saved = self.db.save("cart", record) is not False
         except Exception as e:
             logger.error(f"Error saving cart for user {user_id}: {e}")
             raise
+        if saved:
+            logger.info("Cart saved successfully to database.")
+        else:
+            logger.warning(f"Not saving cart for user {user_id}: a newer revision is stored.")
+        return saved
 
     def get_cart(self, user_id: str) -> Dict[str, Any]:
         """
@@ -40,10 +107,192 @@ class CartRepository:
         :return: The shopping cart data
         :raises Exception: If database operation fails
         """
+        return self.get_cart_with_revision(user_id)[0]
+
+    def get_cart_with_revision(self, user_id: str, hydrate: bool = True) -> Tuple[Dict[str, Any], int]:
+        """
+        Retrieve shopping cart details and their revision from the database.
+
+        :param user_id: The unique identifier of the user
+        :param hydrate: Whether to fill in product details with ``product_loader``
+        :return: The shopping cart data and its revision; 0 for carts saved without one
+        :raises Exception: If database operation fails
+        """
         logger.info(f"Retrieving cart from database for user: {user_id}")
         try:
             result = self.db.get("cart", {"user_id": user_id})
-            return result["data"]
+            revision = result.get("revision", 0)
+            if is_encoded_cart(result["data"]):
+                cart_data = decode_cart(result["data"])
+            else:
+                cart_data = result["data"]
+                if self.migrate_on_read and cart_data and self._details_recoverable(cart_data):
+                    self._migrate(user_id, cart_data, revision)
         except Exception as e:
             logger.error(f"Error retrieving cart for user {user_id}: {e}")
-            raise
\ No newline at end of file
+            raise
+        if hydrate:
+            cart_data = self.hydrate(cart_data)
+        return cart_data, revision
+
+    def hydrate(self, cart_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fill in current product details for the lines of a cart.
+
+        The stored id, price snapshot and quantity take precedence over the
+        loaded details. Lines whose product cannot be loaded are left as they
+        are, and so is the whole cart if the loader fails.
+
+        :param cart_data: Cart data keyed by product ID
+        :return: Hydrated cart data
+        """
+        if self.product_loader is None or not cart_data:
+            return cart_data
+        try:
+            details = self.product_loader(list(cart_data))
+        except Exception as e:
+            logger.warning(f"Could not load product details for a cart: {e}")
+            return cart_data
+        return {product_id: {**details.get(product_id, {}), **line} for product_id, line in cart_data.items()}
+
+    def iter_encoded_batches(self, batch_size: int) -> Iterator[List[Tuple[str, bytes, int]]]:
+        """
+        Scan every stored cart, in batches of (user_id, encoded cart, revision).
+
+        Legacy records are encoded on the fly; records that cannot be encoded are skipped.
+        Requires a database that provides ``scan(table)`` yielding records.
+
+        :param batch_size: Maximum number of carts per batch
+        :return: Iterator of batches
+        """
+        scan = getattr(self.db, "scan", None)
+        if scan is None:
+            raise NotImplementedError("Scanning carts requires a database that supports scan().")
+        batch = []
+        for record in scan("cart"):
+            data = record["data"]
+            if not is_encoded_cart(data):
+                try:
+                    data = encode_cart(data or {})
+                except CartCodecError as e:
+                    logger.warning(f"Skipping unreadable cart for user {record['user_id']}: {e}")
+                    continue
+            batch.append((record["user_id"], bytes(data), record.get("revision", 0)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _details_recoverable(self, cart_data: Dict[str, Any]) -> bool:
+        # Re-encoding drops product details, so only do it if the loader can restore them all.
+        if self.product_loader is None:
+            return False
+        try:
+            details = self.product_loader(list(cart_data))
+        except Exception as e:
+            logger.warning(f"Could not load product details for a legacy cart: {e}")
+            return False
+        return all(product_id in details for product_id in cart_data)
+
+    def migrate_cart(self, user_id: str) -> bool:
+        """
+        Re-encode a cart stored in the legacy format, dropping product details other
+        than id, price and quantity regardless of ``product_loader``.
+
+        :param user_id: The unique identifier of the user
+        :return: Whether the record was rewritten
+        """
+        result = self.db.get("cart", {"user_id": user_id})
+        if is_encoded_cart(result["data"]) or not result["data"]:
+            return False
+        return self._migrate(user_id, result["data"], result.get("revision", 0))
+
+    def _migrate(self, user_id: str, cart_data: Dict[str, Any], revision: int) -> bool:
+        try:
+            if not self.save_cart(user_id, cart_data, revision=revision):
+                return False
+        except CartCodecError as e:
+            logger.warning(f"Keeping legacy cart for user {user_id}: {e}")
+            return False
+        logger.info(f"Migrated cart for user {user_id} to format {FORMAT_VERSION}")
+        return True
+
+class AsyncCartRepository:
+    """
+    Async counterpart of ``CartRepository`` for databases whose ``get`` and
+    ``save`` are coroutines.
+
+    Records use the same encoding, so carts written by either repository can
+    be read by the other. Legacy records are decoded as they are but not
+    migrated; ``CartRepository.migrate_cart`` or a sync read does that.
+    """
+
+    def __init__(self, db, product_loader: Optional[ProductLoader] = None):
+        """
+        :param db: Database connection whose ``get`` and ``save`` are awaitable
+        :param product_loader: Optional callable used to hydrate product details on read;
+            it is synchronous and runs in a worker thread
+        """
+        self.db = db
+        self.product_loader = product_loader
+
+    async def save_cart(self, user_id: str, cart_data: Dict[str, Any], revision: Optional[int] = None) -> None:
+        """
+        Save shopping cart details to the database.
+
+        :param user_id: The unique identifier of the user
+        :param cart_data: The shopping cart data to be saved
+        :param revision: Revision number stored with the cart, if any
+        :raises CartCodecError: If the cart data cannot be encoded
+        :raises Exception: If database operation fails
+        """
+        logger.info(f"Saving cart to database for user: {user_id}")
+        record = {"user_id": user_id, "data": encode_cart(cart_data), "format": FORMAT_VERSION}
+        if revision is not None:
+            record["revision"] = revision
+        try:
+            await self.db.save("cart", record)
+            logger.info("Cart saved successfully to database.")
+        except Exception as e:
+            logger.error(f"Error saving cart for user {user_id}: {e}")
+            raise
+
+    async def get_cart_with_revision(self, user_id: str, hydrate: bool = True) -> Tuple[Dict[str, Any], int]:
+        """
+        Retrieve shopping cart details and their revision from the database.
+
+        :param user_id: The unique identifier of the user
+        :param hydrate: Whether to fill in product details with ``product_loader``
+        :return: The shopping cart data and its revision; 0 for carts saved without one
+        :raises Exception: If database operation fails
+        """
+        logger.info(f"Retrieving cart from database for user: {user_id}")
+        try:
+            result = await self.db.get("cart", {"user_id": user_id})
+            revision = result.get("revision", 0)
+            cart_data = decode_cart(result["data"]) if is_encoded_cart(result["data"]) else result["data"]
+        except Exception as e:
+            logger.error(f"Error retrieving cart for user {user_id}: {e}")
+            raise
+        if hydrate and self.product_loader is not None and cart_data:
+            details = await asyncio.to_thread(self.product_loader, list(cart_data))
+            cart_data = {product_id: {**details.get(product_id, {}), **line}
+                         for product_id, line in cart_data.items()}
+        return cart_data, revision
+
+def load_product_details(product_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Product loader backed by the catalog, for ``CartRepository(product_loader=...)``.
+
+    :param product_ids: Product IDs from a cart
+    :return: Product dictionaries keyed by str(product ID); unknown IDs are omitted
+    """
+    from app.common.database import read_session
+    from app.common.models import Product
+
+    ids = {int(product_id) for product_id in product_ids if str(product_id).isdigit()}
+    if not ids:
+        return {}
+    products = read_session().query(Product).filter(Product.id.in_(ids)).all()
+    return {str(product.id): product.to_dict() for product in products}
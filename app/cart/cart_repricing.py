@@ -0,0 +1,189 @@
+import logging
+import time
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from app.cart.cart_codec import ID_STR, cart_body, decode_cart_lines
+from app.cart.cart_service import CartRevisionConflictError
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Initialize the module logger
+logger = logging.getLogger(__name__)
+
+# Prices are compared and summed as integers in units of 10 ** -PRICE_DECIMALS.
+PRICE_DECIMALS = 4
+_PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_DECIMALS)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# A line of an encoded cart whose product ID is numeric, as laid out by cart_codec.
+# The body starts with a 4-byte line count.
+_COUNT_SIZE = 4
+_LINE_DTYPE = None if np is None else np.dtype([
+    ("kind", "u1"), ("id", "<i8"), ("quantity", "<u4"), ("mantissa", "<i8"), ("exponent", "i1"),
+])
+
+def _to_units(price: Any) -> int:
+    return int(Decimal(str(price)).quantize(_PRICE_QUANTUM, rounding=ROUND_HALF_EVEN).scaleb(PRICE_DECIMALS))
+
+def _from_units(units: int) -> Decimal:
+    return Decimal(int(units)).scaleb(-PRICE_DECIMALS)
+
+def _price_key(product_id: Any) -> Any:
+    """Normalizes a product ID so 101 and "101" match"""
+    text = str(product_id)
+    return int(text) if text.isdigit() and str(int(text)) == text else text
+
+class CartRepricer:
+    """
+    Rewrites the price snapshots of stored carts after catalog price changes.
+
+    Carts are scanned in batches. With NumPy available, each batch is decoded
+    into columnar arrays (cart index, product ID, quantity, price) straight
+    from the encoded records, joined against a sorted price vector, and the
+    old and new cart totals are summed in integer price units in one pass.
+    Without NumPy the same computation runs line by line. Only carts with at
+    least one changed price are written back, through ``CartService.reprice_cart``
+    so the write is revision-checked and the service's cache and write-behind
+    queue stay consistent. Carts changed since they were scanned are skipped
+    and counted as conflicts; running the repricer again picks them up.
+    """
+
+    def __init__(self, cart_service, batch_size: int = DEFAULT_BATCH_SIZE, use_numpy: Optional[bool] = None):
+        """
+        :param cart_service: CartService whose repository's database supports ``scan``
+        :param batch_size: Number of carts loaded per batch
+        :param use_numpy: Force the NumPy (True) or pure-Python (False) engine; auto-detected if None
+        """
+        if use_numpy and np is None:
+            raise ValueError("NumPy is not installed.")
+        self.cart_service = cart_service
+        self.batch_size = batch_size
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+
+    def reprice(self, prices: Mapping[Any, Any],
+                on_repriced: Optional[Callable[[str, Decimal, Decimal], None]] = None) -> Dict[str, Any]:
+        """
+        Apply new unit prices to every stored cart containing the products.
+
+        :param prices: New unit price by product ID
+        :param on_repriced: Called with (user_id, old_total, new_total) for each rewritten cart
+        :return: Report with the number of carts scanned, changed and skipped because they
+            changed meanwhile, and of lines repriced
+        """
+        started = time.perf_counter()
+        new_prices = {_price_key(product_id): Decimal(str(price)) for product_id, price in prices.items()}
+        price_units = {product_id: _to_units(price) for product_id, price in new_prices.items()}
+        report = {"carts_scanned": 0, "carts_changed": 0, "carts_conflicted": 0, "lines_repriced": 0,
+                  "engine": "numpy" if self.use_numpy else "python"}
+        if not price_units:
+            return report
+
+        reprice_batch = self._reprice_batch_numpy if self.use_numpy else self._reprice_batch_python
+        for batch in self.cart_service.cart_repository.iter_encoded_batches(self.batch_size):
+            report["carts_scanned"] += len(batch)
+            for user_id, blob, revision, old_total, new_total, lines_changed in reprice_batch(batch, price_units):
+                if not self._write_back(user_id, blob, revision, new_prices):
+                    report["carts_conflicted"] += 1
+                    continue
+                report["carts_changed"] += 1
+                report["lines_repriced"] += lines_changed
+                if on_repriced is not None:
+                    on_repriced(user_id, _from_units(old_total), _from_units(new_total))
+
+        logger.info(f"Repriced {report['carts_changed']} of {report['carts_scanned']} carts "
+                    f"({report['carts_conflicted']} changed meanwhile) "
+                    f"in {time.perf_counter() - started:.2f}s ({report['engine']})")
+        return report
+
+    def _reprice_batch_python(self, batch: List[Tuple[str, bytes, int]], price_units: Dict[Any, int]):
+        for user_id, blob, revision in batch:
+            old_total = new_total = lines_changed = 0
+            for line in decode_cart_lines(blob):
+                old_units = _to_units(line.price)
+                new_units = price_units.get(_price_key(line.product_id), old_units)
+                old_total += old_units * line.quantity
+                new_total += new_units * line.quantity
+                lines_changed += new_units != old_units
+            if lines_changed:
+                yield user_id, blob, revision, old_total, new_total, lines_changed
+
+    def _reprice_batch_numpy(self, batch: List[Tuple[str, bytes, int]], price_units: Dict[Any, int]):
+        numeric = {product_id: units for product_id, units in price_units.items() if isinstance(product_id, int)}
+        price_ids = np.fromiter(numeric.keys(), dtype=np.int64, count=len(numeric))
+        order = np.argsort(price_ids)
+        price_ids = price_ids[order]
+        price_values = np.fromiter(numeric.values(), dtype=np.int64, count=len(numeric))[order]
+
+        columns, carts, irregular = [], [], []
+        for record in batch:
+            lines = _line_columns(record[1])
+            if lines is None:
+                irregular.append(record)
+            elif len(lines):
+                columns.append(lines)
+                carts.append(record)
+
+        # Carts with non-numeric product IDs do not fit the fixed-width layout.
+        yield from self._reprice_batch_python(irregular, price_units)
+        if not carts or not len(price_ids):
+            return
+
+        lines = np.concatenate(columns)
+        cart_index = np.repeat(np.arange(len(carts)), [len(column) for column in columns])
+        quantity = lines["quantity"].astype(np.int64)
+        old_units = _units_from_columns(lines["mantissa"], lines["exponent"].astype(np.int64))
+
+        # Join the lines against the price vector.
+        position = np.minimum(np.searchsorted(price_ids, lines["id"]), len(price_ids) - 1)
+        found = price_ids[position] == lines["id"]
+        new_units = np.where(found, price_values[position], old_units)
+        changed = found & (new_units != old_units)
+
+        old_totals = np.zeros(len(carts), dtype=np.int64)
+        new_totals = np.zeros(len(carts), dtype=np.int64)
+        np.add.at(old_totals, cart_index, old_units * quantity)
+        np.add.at(new_totals, cart_index, new_units * quantity)
+        lines_changed = np.bincount(cart_index[changed], minlength=len(carts))
+
+        for index in np.flatnonzero(lines_changed):
+            user_id, blob, revision = carts[index]
+            yield user_id, blob, revision, int(old_totals[index]), int(new_totals[index]), int(lines_changed[index])
+
+    def _write_back(self, user_id: str, blob: bytes, revision: int, new_prices: Dict[Any, Decimal]) -> bool:
+        prices = {}
+        for line in decode_cart_lines(blob):
+            price = new_prices.get(_price_key(line.product_id))
+            if price is not None:
+                prices[str(line.product_id)] = price
+        try:
+            self.cart_service.reprice_cart(user_id, revision, prices)
+        except CartRevisionConflictError as e:
+            logger.info(f"Skipping cart for user {user_id}: now at revision {e.current_revision}")
+            return False
+        return True
+
+def _line_columns(blob: bytes):
+    """Decodes an encoded cart into a structured array, or None if its lines are not all fixed-width"""
+    body = cart_body(blob)
+    count = int.from_bytes(body[:_COUNT_SIZE], "little")
+    if len(body) != _COUNT_SIZE + count * _LINE_DTYPE.itemsize:
+        return None
+    lines = np.frombuffer(body, dtype=_LINE_DTYPE, offset=_COUNT_SIZE, count=count)
+    if count and (lines["kind"] == ID_STR).any():
+        return None
+    return lines
+
+def _units_from_columns(mantissa, exponent):
+    """Converts price mantissas and exponents to integer price units, rounding half to even"""
+    shift = exponent + PRICE_DECIMALS
+    scaled = mantissa * np.power(10, np.clip(shift, 0, 18), dtype=np.int64)
+    divisor = np.power(10, np.clip(-shift, 0, 18), dtype=np.int64)
+    quotient, remainder = np.divmod(mantissa, divisor)
+    twice = remainder * 2
+    round_up = (twice > divisor) | ((twice == divisor) & (quotient % 2 == 1))
+    return np.where(shift >= 0, scaled, quotient + round_up)
@@ -1,37 +1,119 @@
+import asyncio
 import logging
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Iterable, Mapping, Optional, Tuple
+
+from app.cart.shopping_cart import ShoppingCart, ShoppingCartError
 
 # Initialize the module logger
 logger = logging.getLogger(__name__)
 
+# Number of locks user IDs are spread over for read-modify-write cart updates.
+CART_LOCK_STRIPES = 64
+
+# Failed write-behind flushes are retried after FLUSH_RETRY_BASE_DELAY seconds,
+# doubling up to FLUSH_RETRY_MAX_DELAY. After MAX_FLUSH_ATTEMPTS failures the
+# cart is only retried by the user's next save, an explicit flush or close().
+FLUSH_RETRY_BASE_DELAY = 1.0
+FLUSH_RETRY_MAX_DELAY = 300.0
+MAX_FLUSH_ATTEMPTS = 8
+
+class CartRevisionConflictError(Exception):
+    """
+    Raised when a cart delta is based on a revision that is no longer current.
+    """
+
+    def __init__(self, current_revision: int):
+        super().__init__(f"Cart has changed; current revision is {current_revision}.")
+        self.current_revision = current_revision
+
+def apply_cart_operation(cart: ShoppingCart, operation: Mapping[str, Any]) -> None:
+    """
+    Apply one delta operation to a cart.
+
+    Supported operations:
+    {"op": "add", "product": {...}, "quantity": <int, default 1>}
+    {"op": "remove", "product_id": "<id>", "quantity": <int, optional; whole line if omitted>}
+    {"op": "set_quantity", "product_id": "<id>", "quantity": <int; zero removes the line>}
+
+    :param cart: Cart to modify
+    :param operation: Operation dictionary
+    :raises ShoppingCartError: If the operation is unknown or invalid for the cart
+    """
+    if not isinstance(operation, Mapping):
+        raise ShoppingCartError("Invalid cart operation")
+    op = operation.get("op")
+    if op == "add":
+        cart.add_product(operation.get("product"), operation.get("quantity", 1))
+    elif op == "remove":
+        cart.remove_product(operation.get("product_id"), operation.get("quantity"))
+    elif op == "set_quantity":
+        cart.set_quantity(operation.get("product_id"), operation.get("quantity"))
+    else:
+        raise ShoppingCartError(f"Unknown cart operation: {op!r}")
+
 class CartService:
     """
     Service to handle shopping cart operations.
     """
 
-    def __init__(self, cart_repository):
+    def __init__(self, cart_repository, cache=None, write_behind_delay: Optional[float] = None,
+                 async_cart_repository=None):
         """
         Initialize the cart service with a cart repository.
 
         :param cart_repository: Repository instance for handling data operations
+        :param cache: Optional CartCache placed in front of the repository
+        :param write_behind_delay: If set, saves are held for this many seconds and
+            only the latest cart per user is persisted; requires a cache
+        :param async_cart_repository: Optional AsyncCartRepository used by the async
+            methods to read carts without blocking the event loop
         """
+        if write_behind_delay is not None and cache is None:
+            raise ValueError("Write-behind mode requires a cart cache.")
+        if write_behind_delay is not None and cart_repository is None:
+            raise ValueError("Write-behind mode requires a cart repository.")
         self.cart_repository = cart_repository
+        self.async_cart_repository = async_cart_repository
+        self.cache = cache
+        self.write_behind_delay = write_behind_delay
+        # Cached and stored carts are (cart_data, revision) pairs. Pending carts are
+        # (cart_data, monotonic time first queued, revision, stored revision they replace).
+        self._pending: Dict[str, tuple] = {}
+        # Users whose last flush failed: [failed attempts, monotonic time of the next retry].
+        self._flush_failures: Dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(CART_LOCK_STRIPES)]
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
 
-    def save_cart(self, user_id: str, cart_data: Dict[str, Any]) -> None:
+    def save_cart(self, user_id: str, cart_data: Dict[str, Any]) -> int:
         """
         Save the shopping cart data to the user's profile.
 
+        In write-behind mode the cart is cached and queued, and successive saves
+        for the same user within the delay are coalesced into one write. While
+        a user's queued cart cannot be flushed, their saves are written through
+        instead, so a failing repository is reported to the caller. A full save
+        replaces whatever is stored, even if another worker changed it since,
+        unless that worker stored a higher revision; a queued cart is then
+        dropped when it is flushed.
+
         :param user_id: The unique identifier of the user
         :param cart_data: Dictionary representing shopping cart data
+        :return: The cart's new revision
+        :raises ShoppingCartError: If the cart data is invalid
+        :raises CartRevisionConflictError: If a written-through cart is older than the stored one
         :raises Exception: If saving fails
         """
         logger.info(f"Saving cart for user: {user_id}")
-        try:
-            self.cart_repository.save_cart(user_id, cart_data)
-            logger.info("Cart saved successfully.")
-        except Exception as e:
-            logger.error(f"Failed to save cart for user {user_id}: {e}")
-            raise
+        # Reject carts that could not be stored before they are queued for write-behind.
+        ShoppingCart.from_dict(cart_data, user_id=user_id)
+        with self._user_lock(user_id):
+            _, revision = self._load(user_id)
+            return self._store(user_id, cart_data, revision + 1)
 
     def retrieve_cart(self, user_id: str) -> Dict[str, Any]:
         """
@@ -41,11 +123,360 @@ class CartService:
         :return: Dictionary representing shopping cart data
         :raises Exception: If retrieval fails
         """
+        return self.retrieve_cart_with_revision(user_id)[0]
+
+    def retrieve_cart_with_revision(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Retrieve the shopping cart data for a user profile together with its revision.
+
+        :param user_id: The unique identifier of the user
+        :return: Cart data and revision; revision 0 means the cart was never saved
+        :raises Exception: If retrieval fails
+        """
         logger.info(f"Retrieving cart for user: {user_id}")
+        return self._load(user_id)
+
+    async def save_cart_async(self, user_id: str, cart_data: Dict[str, Any]) -> int:
+        """
+        Async variant of ``save_cart``.
+
+        In write-behind mode the current revision is loaded first with
+        ``async_cart_repository``, if there is one, so the save usually only
+        queues the cart. The save always runs in a worker thread: it waits
+        for the user's lock, and writes through while a flush is failing.
+
+        :raises ShoppingCartError: If the cart data is invalid
+        :raises Exception: If saving fails
+        """
+        if self.write_behind_delay is not None:
+            ShoppingCart.from_dict(cart_data, user_id=user_id)
+            # Warms the cache, so the load under the user lock does no I/O.
+            await self.retrieve_cart_with_revision_async(user_id)
+        return await asyncio.to_thread(self.save_cart, user_id, cart_data)
+
+    async def retrieve_cart_with_revision_async(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Async variant of ``retrieve_cart_with_revision``.
+
+        Queued and cached carts are returned directly. Stored carts are read
+        with ``async_cart_repository`` if there is one, and by the sync
+        repository in a worker thread otherwise.
+
+        :raises Exception: If retrieval fails
+        """
+        with self._pending_lock:
+            pending = self._pending.get(user_id)
+        if pending is not None:
+            return pending[0], pending[2]
+        if self.cache is not None:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                return cached
+        if self.async_cart_repository is None:
+            return await asyncio.to_thread(self._load, user_id)
+
         try:
-            cart_data = self.cart_repository.get_cart(user_id)
+            stored = await self.async_cart_repository.get_cart_with_revision(user_id)
+        except Exception as e:
+            logger.error(f"Failed to retrieve cart for user {user_id}: {e}")
+            raise
+        if self.cache is not None:
+            self.cache.put(user_id, stored)
+        return stored
+
+    def apply_delta(self, user_id: str, base_revision: int,
+                    operations: Iterable[Mapping[str, Any]]) -> Tuple[ShoppingCart, int]:
+        """
+        Apply add/remove/set_quantity operations to a stored cart.
+
+        The operations are applied in order and atomically: if any of them is
+        invalid, the stored cart is left unchanged. The result is written
+        through with a revision check in the repository, so a cart changed by
+        another worker is never overwritten.
+
+        :param user_id: The unique identifier of the user
+        :param base_revision: Revision of the cart the client computed the operations against
+        :param operations: Operations, as accepted by ``apply_cart_operation``
+        :return: The updated cart and its new revision
+        :raises CartRevisionConflictError: If ``base_revision`` is not the current revision
+        :raises ShoppingCartError: If an operation is invalid
+        """
+        with self._user_lock(user_id):
+            cart_data, revision = self._load(user_id)
+            if base_revision != revision:
+                raise CartRevisionConflictError(revision)
+            cart = ShoppingCart.from_dict(cart_data, user_id=user_id)
+            for operation in operations:
+                apply_cart_operation(cart, operation)
+            return cart, self._store_checked(user_id, cart.to_dict(), revision)
+
+    def merge_guest_cart(self, user_id: str, guest_cart: ShoppingCart,
+                         base_revision: int) -> Tuple[ShoppingCart, int]:
+        """
+        Merge a guest cart into the user's stored cart, e.g. on login.
+
+        Quantities of products present in both carts are summed, and the guest
+        cart's product details and prices replace the stored ones. The merge
+        only applies to ``base_revision``, so a retried request cannot add the
+        guest cart twice.
+
+        :param user_id: The unique identifier of the user
+        :param guest_cart: Cart built without a user ID
+        :param base_revision: Revision of the user's cart the merge is meant for
+        :return: The merged cart and its new revision
+        :raises CartRevisionConflictError: If ``base_revision`` is not the current revision
+        :raises ShoppingCartError: If the guest cart belongs to a user
+        """
+        with self._user_lock(user_id):
+            cart_data, revision = self._load(user_id)
+            if base_revision != revision:
+                raise CartRevisionConflictError(revision)
+            cart = ShoppingCart.from_dict(cart_data, user_id=user_id)
+            cart.merge(guest_cart)
+            return cart, self._store_checked(user_id, cart.to_dict(), revision)
+
+    def reprice_cart(self, user_id: str, base_revision: int, prices: Mapping[str, Any]) -> int:
+        """
+        Update the price snapshots of a user's cart after catalog price changes.
+
+        Like a delta, the new prices only apply to ``base_revision`` and are
+        written through with a revision check, so a cart saved or changed
+        since it was read, by this worker or another, is never overwritten.
+
+        :param user_id: The unique identifier of the user
+        :param base_revision: Revision of the cart the prices were computed against
+        :param prices: New unit price by product ID
+        :return: The cart's new revision, or ``base_revision`` if no price changed
+        :raises CartRevisionConflictError: If ``base_revision`` is not the current revision
+        :raises ShoppingCartError: If a price is invalid
+        """
+        with self._user_lock(user_id):
+            cart_data, revision = self._load(user_id)
+            if base_revision != revision:
+                raise CartRevisionConflictError(revision)
+            cart = ShoppingCart.from_dict(cart_data, user_id=user_id)
+            if not cart.reprice(prices):
+                return revision
+            return self._store_checked(user_id, cart.to_dict(), revision)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % CART_LOCK_STRIPES]
+
+    def _load(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        with self._pending_lock:
+            pending = self._pending.get(user_id)
+        if pending is not None:
+            return pending[0], pending[2]
+
+        if self.cache is not None:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                return cached
+
+        try:
+            stored = self.cart_repository.get_cart_with_revision(user_id)
+            if self.cache is not None:
+                self.cache.put(user_id, stored)
             logger.info("Cart retrieved successfully.")
-            return cart_data
+            return stored
         except Exception as e:
             logger.error(f"Failed to retrieve cart for user {user_id}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _store(self, user_id: str, cart_data: Dict[str, Any], revision: int) -> int:
+        if self.write_behind_delay is not None:
+            with self._pending_lock:
+                failing = user_id in self._flush_failures
+            if failing:
+                self._write_through(user_id, cart_data, revision)
+                return revision
+            with self._pending_lock:
+                queued = self._pending.get(user_id)
+                first_queued_at, replaces = (queued[1], queued[3]) if queued else (time.monotonic(), revision - 1)
+                self._pending[user_id] = (cart_data, first_queued_at, revision, replaces)
+            self.cache.put(user_id, (cart_data, revision))
+            self._ensure_flusher()
+            return revision
+
+        self._write_through(user_id, cart_data, revision)
+        return revision
+
+    def _store_checked(self, user_id: str, cart_data: Dict[str, Any], revision: int) -> int:
+        """
+        Write a cart derived from ``revision`` through to the repository, provided
+        the stored cart has not changed since. A queued cart is written along with it.
+
+        :return: The new revision
+        :raises CartRevisionConflictError: If another writer changed the stored cart
+        """
+        with self._pending_lock:
+            pending = self._pending.get(user_id)
+        expected = pending[3] if pending is not None else revision
+        try:
+            saved = self.cart_repository.save_cart_if_revision(user_id, cart_data, expected, revision + 1)
+        except Exception as e:
+            logger.error(f"Failed to save cart for user {user_id}: {e}")
+            raise
+        if not saved:
+            raise CartRevisionConflictError(self._discard_stale(user_id))
+        self._saved(user_id, cart_data, revision + 1)
+        return revision + 1
+
+    def _discard_stale(self, user_id: str) -> int:
+        """
+        Drop this worker's copies of a cart another writer has changed, and return the stored revision.
+        """
+        with self._pending_lock:
+            self._pending.pop(user_id, None)
+            self._flush_failures.pop(user_id, None)
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+        current = self._load(user_id)[1]
+        logger.warning(f"Cart for user {user_id} was changed elsewhere; now at revision {current}.")
+        return current
+
+    def _write_through(self, user_id: str, cart_data: Dict[str, Any], revision: int) -> None:
+        try:
+            saved = self.cart_repository.save_cart(user_id, cart_data, revision=revision)
+        except Exception as e:
+            logger.error(f"Failed to save cart for user {user_id}: {e}")
+            raise
+        if saved is False:
+            raise CartRevisionConflictError(self._discard_stale(user_id))
+        self._saved(user_id, cart_data, revision)
+
+    def _saved(self, user_id: str, cart_data: Dict[str, Any], revision: int) -> None:
+        with self._pending_lock:
+            # The saved cart supersedes one that could not be flushed.
+            pending = self._pending.get(user_id)
+            if pending is not None and pending[2] <= revision:
+                del self._pending[user_id]
+            self._flush_failures.pop(user_id, None)
+        if self.cache is not None:
+            self.cache.put(user_id, (cart_data, revision))
+        logger.info("Cart saved successfully.")
+
+    def flush_cart(self, user_id: str) -> bool:
+        """
+        Persist a user's pending cart immediately, e.g. on logout.
+
+        :param user_id: The unique identifier of the user
+        :return: Whether a pending cart was written
+        :raises Exception: If saving fails; the cart stays pending
+        """
+        with self._flush_lock, self._user_lock(user_id):
+            with self._pending_lock:
+                pending = self._pending.pop(user_id, None)
+            if pending is None:
+                return False
+            return self._write_pending(user_id, pending)
+
+    def flush_all(self, older_than: float = 0.0, retry_failed: bool = False) -> int:
+        """
+        Persist every pending cart queued at least ``older_than`` seconds ago.
+
+        Carts whose previous flush failed are skipped until their retry is due.
+
+        :param older_than: Minimum age in seconds of the carts to flush
+        :param retry_failed: Also retry failed carts whose retry is not due yet
+        :return: Number of carts written
+        """
+        written = 0
+        with self._flush_lock:
+            now = time.monotonic()
+            cutoff = now - older_than
+            with self._pending_lock:
+                due = [user_id for user_id, pending in self._pending.items()
+                       if pending[1] <= cutoff and (retry_failed or self._retry_due(user_id, now))]
+            for user_id in due:
+                # Under the user's lock, so a revision-checked write cannot commit between taking
+                # the cart off the queue and writing it, only to be overwritten by this older cart.
+                with self._user_lock(user_id):
+                    with self._pending_lock:
+                        pending = self._pending.pop(user_id, None)
+                    if pending is None:
+                        continue
+                    try:
+                        written += self._write_pending(user_id, pending)
+                    except Exception:
+                        continue
+        return written
+
+    def _retry_due(self, user_id: str, now: float) -> bool:
+        failure = self._flush_failures.get(user_id)
+        return failure is None or failure[1] <= now
+
+    def _write_pending(self, user_id: str, pending: tuple) -> bool:
+        try:
+            saved = self.cart_repository.save_cart(user_id, pending[0], revision=pending[2])
+        except Exception as e:
+            with self._pending_lock:
+                # Keep the failed cart queued unless a newer save replaced it meanwhile.
+                self._pending.setdefault(user_id, pending)
+                failure = self._flush_failures.setdefault(user_id, [0, 0.0])
+                failure[0] += 1
+                attempts = failure[0]
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    failure[1] = float("inf")
+                else:
+                    delay = min(FLUSH_RETRY_BASE_DELAY * 2 ** (attempts - 1), FLUSH_RETRY_MAX_DELAY)
+                    failure[1] = time.monotonic() + delay
+            if attempts >= MAX_FLUSH_ATTEMPTS:
+                logger.error(f"Giving up automatic flushes of the cart for user {user_id} after "
+                             f"{attempts} attempts: {e}")
+            else:
+                logger.error(f"Failed to flush cart for user {user_id} (attempt {attempts}): {e}")
+            raise
+        if saved is False:
+            # Another worker stored a newer revision; this worker's copy is stale.
+            self._discard_stale(user_id)
+            return False
+        with self._pending_lock:
+            self._flush_failures.pop(user_id, None)
+        logger.info(f"Flushed pending cart for user: {user_id}")
+        return True
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._pending_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._stop.clear()
+                self._flusher = threading.Thread(target=self._run_flusher, name="cart-write-behind", daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        interval = max(self.write_behind_delay / 2, 0.05)
+        while not self._stop.wait(interval):
+            self.flush_all(older_than=self.write_behind_delay)
+
+    def close(self) -> None:
+        """
+        Stop the background flusher and persist all pending carts, e.g. on shutdown.
+        """
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush_all(retry_failed=True)
+
+    def pending_count(self) -> int:
+        """
+        Number of carts waiting to be persisted.
+        """
+        with self._pending_lock:
+            return len(self._pending)
+
+    def failed_flush_count(self) -> int:
+        """
+        Number of queued carts whose last flush failed, including those no longer retried automatically.
+        """
+        with self._pending_lock:
+            return len(self._flush_failures)
+
+    def cache_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return cache hit/miss counters for a user, or totals if no user is given.
+        """
+        if self.cache is None:
+            return {}
+        return self.cache.stats(user_id)
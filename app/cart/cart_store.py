@@ -0,0 +1,171 @@
+"""
+SQLite document store for carts.
+
+Implements the ``get``/``save`` interface ``CartRepository`` expects, plus
+the conditional ``save_if_revision`` and ``scan``, on a database file shared
+by every worker on a host. It keeps its own
+connections, so write-behind flushes can run outside a Flask app context.
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Tables the store holds, and the column each is keyed by.
+TABLE_KEYS = {"cart": "user_id"}
+
+# Rows read per query by scan(); the database is not locked between pages.
+SCAN_PAGE_SIZE = 1000
+
+
+class SQLiteCartStore:
+    """
+    Cart records in a SQLite database, one row per user.
+
+    Records are dictionaries with ``user_id``, the encoded cart as ``data``,
+    its ``format`` version and an optional ``revision``. Reading a user that
+    has no cart returns an empty record at revision 0.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        """
+        :param path: Path of the SQLite database file, or ":memory:" for a private in-memory database
+        :param busy_timeout: Seconds to wait for another worker's write lock
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        # An in-memory database only exists on its own connection, so it is shared by all threads.
+        self._shared = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False) \
+            if path == ":memory:" else None
+        self._shared_lock = threading.RLock()
+        with self._locked() as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cart ("
+                " user_id TEXT PRIMARY KEY,"
+                " data BLOB NOT NULL,"
+                " format INTEGER NOT NULL,"
+                " revision INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._shared is not None:
+            return self._shared
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _locked(self) -> Iterator[sqlite3.Connection]:
+        if self._shared is None:
+            yield self._connection()
+        else:
+            with self._shared_lock:
+                yield self._shared
+
+    @staticmethod
+    def _check_table(table: str) -> None:
+        if table not in TABLE_KEYS:
+            raise ValueError(f"Unknown table: {table!r}")
+
+    def get(self, table: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Load a user's cart record.
+
+        :param table: Table name; only ``"cart"`` is supported
+        :param query: Dictionary with the ``user_id`` to load
+        :return: The record, or an empty cart at revision 0 if the user has none
+        """
+        self._check_table(table)
+        user_id = query["user_id"]
+        with self._locked() as connection:
+            row = connection.execute(
+                "SELECT data, format, revision FROM cart WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return {"user_id": user_id, "data": {}, "revision": 0}
+        return {"user_id": user_id, "data": bytes(row[0]), "format": row[1], "revision": row[2]}
+
+    def save(self, table: str, record: Dict[str, Any]) -> bool:
+        """
+        Insert or replace a user's cart record, unless a newer revision is stored.
+
+        :param table: Table name; only ``"cart"`` is supported
+        :param record: Record with ``user_id``, encoded ``data``, ``format`` and optional ``revision``
+        :return: Whether the record was saved; False if the stored revision is higher than the record's
+        """
+        self._check_table(table)
+        with self._locked() as connection, connection:
+            # A record saved without a revision keeps the stored one.
+            revision = record.get("revision")
+            cursor = connection.execute(
+                "INSERT INTO cart (user_id, data, format, revision) VALUES (?, ?, ?, COALESCE(?, 0)) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, format = excluded.format,"
+                " revision = COALESCE(?, cart.revision) WHERE ? IS NULL OR ? >= cart.revision",
+                (record["user_id"], bytes(record["data"]), record["format"], revision, revision, revision, revision),
+            )
+            return cursor.rowcount == 1
+
+    def save_if_revision(self, table: str, record: Dict[str, Any], expected_revision: int) -> bool:
+        """
+        Save a user's cart record only if its stored revision is still the expected one.
+
+        :param table: Table name; only ``"cart"`` is supported
+        :param record: Record with ``user_id``, encoded ``data``, ``format`` and the new ``revision``
+        :param expected_revision: Revision the record must have now; 0 if the user has no cart yet
+        :return: Whether the record was saved; False if another writer changed it first
+        """
+        self._check_table(table)
+        values = (bytes(record["data"]), record["format"], record["revision"], record["user_id"])
+        with self._locked() as connection, connection:
+            if expected_revision == 0:
+                cursor = connection.execute(
+                    "INSERT INTO cart (data, format, revision, user_id) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, format = excluded.format,"
+                    " revision = excluded.revision WHERE cart.revision = 0",
+                    values,
+                )
+            else:
+                cursor = connection.execute(
+                    "UPDATE cart SET data = ?, format = ?, revision = ? WHERE user_id = ? AND revision = ?",
+                    values + (expected_revision,),
+                )
+            return cursor.rowcount == 1
+
+    def scan(self, table: str, page_size: int = SCAN_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every stored cart record, ordered by user ID.
+
+        Records are read a page at a time, so writers are not blocked for the
+        whole scan; a record changed after its page was read is yielded as it was.
+
+        :param table: Table name; only ``"cart"`` is supported
+        :param page_size: Number of records read per query
+        :return: Iterator of records, as returned by ``get``
+        """
+        self._check_table(table)
+        last_user_id = None
+        while True:
+            with self._locked() as connection:
+                if last_user_id is None:
+                    rows = connection.execute(
+                        "SELECT user_id, data, format, revision FROM cart ORDER BY user_id LIMIT ?", (page_size,)
+                    ).fetchall()
+                else:
+                    rows = connection.execute(
+                        "SELECT user_id, data, format, revision FROM cart WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                        (last_user_id, page_size),
+                    ).fetchall()
+            for user_id, data, format_version, revision in rows:
+                yield {"user_id": user_id, "data": bytes(data), "format": format_version, "revision": revision}
+            if len(rows) < page_size:
+                return
+            last_user_id = rows[-1][0]
@@ -1,58 +1,224 @@
 import logging
-from typing import List, Any
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
 
 class ShoppingCartError(Exception):
     """Custom exception for ShoppingCart operations"""
     pass
 
+def _to_decimal(price: Any) -> Decimal:
+    """Converts a price to an exact Decimal, going through str so floats keep their printed value"""
+    try:
+        value = Decimal(str(price))
+    except (InvalidOperation, ValueError):
+        raise ShoppingCartError(f"Invalid price: {price!r}")
+    if not value.is_finite() or value < 0:
+        raise ShoppingCartError(f"Invalid price: {price!r}")
+    return value
+
+def _check_quantity(quantity: Any, allow_zero: bool = False) -> int:
+    """Validates a line quantity"""
+    if isinstance(quantity, bool) or not isinstance(quantity, int):
+        raise ShoppingCartError(f"Invalid quantity: {quantity!r}")
+    if quantity < 0 or (quantity == 0 and not allow_zero):
+        raise ShoppingCartError(f"Invalid quantity: {quantity!r}")
+    return quantity
+
+class LineItem:
+    """A product in the cart together with its quantity and unit price snapshot"""
+
+    __slots__ = ("product_id", "product", "unit_price", "quantity")
+
+    def __init__(self, product: dict, unit_price: Decimal, quantity: int):
+        self.product_id = str(product["id"])
+        self.product = product
+        self.unit_price = unit_price
+        self.quantity = quantity
+
+    @property
+    def subtotal(self) -> Decimal:
+        return self.unit_price * self.quantity
+
+    def to_dict(self) -> dict:
+        """Returns the product details with the line quantity"""
+        return {**self.product, "quantity": self.quantity}
+
+    def __repr__(self):
+        return f"<LineItem {self.product_id} x{self.quantity} @ {self.unit_price}>"
+
 class ShoppingCart:
     """Represents the shopping cart"""
 
     def __init__(self, user_id: str = None):
         self.user_id = user_id
-        self.items = []
-        self.total_price = 0.0
+        self._lines: Dict[str, LineItem] = {}
+        self.total_price = Decimal("0")
         logging.info(f"ShoppingCart initialized for user: {user_id}")
 
-    def add_product(self, product: dict):
-        """Adds a product to the shopping cart"""
-        if "price" not in product or "id" not in product:
-            raise ShoppingCartError("Invalid product object")
+    def __len__(self) -> int:
+        return len(self._lines)
 
-        self.items.append(product)
-        self.total_price += product["price"]
-        logging.info(f"Added product {product['id']} to the cart. New total: {self.total_price}")
+    def __contains__(self, product_id) -> bool:
+        return str(product_id) in self._lines
 
-    def remove_product(self, product_id: str):
-        """Removes a product from the shopping cart"""
-        removed = False
+    @property
+    def items(self) -> List[dict]:
+        """Products in the cart, each with its quantity"""
+        return self.list_items()
 
-        for product in self.items:
-            if product["id"] == product_id:
-                self.items.remove(product)
-                self.total_price -= product["price"]
-                removed = True
-                logging.info(f"Removed product {product_id} from the cart. New total: {self.total_price}")
-                break
+    @staticmethod
+    def _validate_product(product: dict) -> Decimal:
+        if not isinstance(product, Mapping) or "price" not in product or "id" not in product:
+            raise ShoppingCartError("Invalid product object")
+        return _to_decimal(product["price"])
 
-        if not removed:
+    def _get_line(self, product_id) -> LineItem:
+        line = self._lines.get(str(product_id))
+        if line is None:
             logging.warning(f"Product {product_id} not found in the cart")
             raise ShoppingCartError("Product not found")
+        return line
+
+    def _add_line(self, product: dict, unit_price: Decimal, quantity: int) -> None:
+        key = str(product["id"])
+        line = self._lines.get(key)
+        if line is None:
+            self._lines[key] = LineItem(product, unit_price, quantity)
+            self.total_price += unit_price * quantity
+        else:
+            # Re-adding a product refreshes its details and price snapshot.
+            self.total_price -= line.subtotal
+            line.product = product
+            line.unit_price = unit_price
+            line.quantity += quantity
+            self.total_price += line.subtotal
+
+    def _set_line_quantity(self, line: LineItem, quantity: int) -> None:
+        self.total_price += line.unit_price * (quantity - line.quantity)
+        if quantity == 0:
+            del self._lines[line.product_id]
+        else:
+            line.quantity = quantity
+
+    def add_product(self, product: dict, quantity: int = 1):
+        """Adds a quantity of a product to the shopping cart"""
+        unit_price = self._validate_product(product)
+        _check_quantity(quantity)
+
+        self._add_line(product, unit_price, quantity)
+        logging.info(f"Added {quantity} x product {product['id']} to the cart. New total: {self.total_price}")
+
+    def remove_product(self, product_id: str, quantity: int = None):
+        """Removes a product from the shopping cart, or only the given quantity of it"""
+        line = self._get_line(product_id)
+        if quantity is None:
+            remaining = 0
+        else:
+            remaining = max(line.quantity - _check_quantity(quantity), 0)
+
+        self._set_line_quantity(line, remaining)
+        logging.info(f"Removed product {product_id} from the cart. New total: {self.total_price}")
+
+    def set_quantity(self, product_id: str, quantity: int):
+        """Sets the quantity of a product already in the cart; zero removes it"""
+        _check_quantity(quantity, allow_zero=True)
+        line = self._get_line(product_id)
+
+        self._set_line_quantity(line, quantity)
+        logging.info(f"Set product {product_id} quantity to {quantity}. New total: {self.total_price}")
+
+    def add_products(self, entries: Iterable[Tuple[dict, int]]):
+        """Adds several (product, quantity) pairs; nothing is added if any entry is invalid"""
+        validated = []
+        for product, quantity in entries:
+            validated.append((product, self._validate_product(product), _check_quantity(quantity)))
+
+        for product, unit_price, quantity in validated:
+            self._add_line(product, unit_price, quantity)
+        logging.info(f"Added {len(validated)} lines to the cart. New total: {self.total_price}")
+
+    def remove_products(self, product_ids: Iterable[str]):
+        """Removes several products; nothing is removed if any of them is missing"""
+        lines = {line.product_id: line for line in (self._get_line(product_id) for product_id in product_ids)}
+
+        for line in lines.values():
+            self._set_line_quantity(line, 0)
+        logging.info(f"Removed {len(lines)} lines from the cart. New total: {self.total_price}")
+
+    def set_quantities(self, quantities: Mapping[str, int]):
+        """Sets quantities for several products; nothing changes if any entry is invalid"""
+        # 101 and "101" name the same line; the last entry for it wins.
+        latest = {str(product_id): quantity for product_id, quantity in quantities.items()}
+        updates = [(self._get_line(product_id), _check_quantity(quantity, allow_zero=True))
+                   for product_id, quantity in latest.items()]
+
+        for line, quantity in updates:
+            self._set_line_quantity(line, quantity)
+        logging.info(f"Updated {len(updates)} line quantities. New total: {self.total_price}")
+
+    def get_quantity(self, product_id: str) -> int:
+        """Returns the quantity of a product in the cart, or 0 if absent"""
+        line = self._lines.get(str(product_id))
+        return line.quantity if line else 0
 
     def clear_cart(self):
         """Clears all items from the shopping cart"""
-        self.items = []
-        self.total_price = 0.0
+        self._lines = {}
+        self.total_price = Decimal("0")
         logging.info("Cleared the shopping cart")
 
+    def list_lines(self) -> List[LineItem]:
+        """Lists the cart's line items"""
+        return list(self._lines.values())
+
     def list_items(self) -> List[Any]:
         """Lists all products in the cart"""
-        return self.items
+        return [line.to_dict() for line in self._lines.values()]
 
-    def get_total_price(self) -> float:
+    def get_total_price(self) -> Decimal:
         """Returns the total price of items in the cart"""
         return self.total_price
 
+    def reprice(self, prices: Mapping[str, Any]) -> int:
+        """Updates the price snapshots of lines whose product has a new price and returns how many changed"""
+        new_prices = {str(product_id): (price, _to_decimal(price)) for product_id, price in prices.items()}
+        changed = 0
+        for product_id, line in self._lines.items():
+            price, unit_price = new_prices.get(product_id, (None, None))
+            if unit_price is not None and unit_price != line.unit_price:
+                line.product = {**line.product, "price": price}
+                line.unit_price = unit_price
+                changed += 1
+        # Recompute rather than adjust, so the total cannot drift from the lines.
+        self.total_price = sum((line.subtotal for line in self._lines.values()), Decimal("0"))
+        logging.info(f"Repriced {changed} lines. New total: {self.total_price}")
+        return changed
+
+    def to_dict(self) -> Dict[str, dict]:
+        """Returns the cart in its stored form: product details with quantity, keyed by product ID"""
+        return {product_id: line.to_dict() for product_id, line in self._lines.items()}
+
+    @classmethod
+    def from_dict(cls, cart_data: Mapping[str, Mapping], user_id: str = None) -> "ShoppingCart":
+        """Builds a cart from its stored form, as returned by to_dict"""
+        if not isinstance(cart_data, Mapping):
+            raise ShoppingCartError("Invalid cart data")
+        entries = []
+        for item in cart_data.values():
+            if not isinstance(item, Mapping):
+                raise ShoppingCartError("Invalid cart data")
+            product = {key: value for key, value in item.items() if key != "quantity"}
+            entries.append((product, item.get("quantity", 1)))
+        cart = cls(user_id=user_id)
+        cart.add_products(entries)
+        return cart
+
+    def merge(self, guest_cart: "ShoppingCart"):
+        """Adds the lines of a guest cart to this one, summing quantities of shared products"""
+        if guest_cart.user_id is not None:
+            raise ShoppingCartError("Only guest carts can be merged")
+        self.add_products((line.product, line.quantity) for line in guest_cart.list_lines())
+
     def persist_cart(self):
         """Placeholder method for persisting cart for logged-in users"""
         if self.user_id:
@@ -66,10 +232,10 @@ class ShoppingCart:
 if __name__ == "__main__":
     cart = ShoppingCart(user_id="12345")
     cart.add_product({"id": "101", "name": "Product A", "price": 20.0})
-    cart.add_product({"id": "102", "name": "Product B", "price": 30.0})
+    cart.add_product({"id": "102", "name": "Product B", "price": 30.0}, quantity=2)
     print(cart.list_items())
     print(cart.get_total_price())
     cart.remove_product("101")
     print(cart.list_items())
     cart.clear_cart()
-    print(cart.list_items())
\ No newline at end of file
+    print(cart.list_items())
@@ -0,0 +1,61 @@
+"""
+Access checks for views.
+
+``login_required`` admits requests from a logged-in session.
+``internal_only`` admits operational clients presenting the
+``INTERNAL_API_TOKEN`` from the app config in the ``X-Internal-Token``
+header; without a configured token, internal endpoints refuse every request.
+"""
+
+import hmac
+import logging
+from functools import wraps
+
+from flask import current_app, jsonify, request, session
+
+logger = logging.getLogger(__name__)
+
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+def current_user():
+    """
+    Email of the logged-in user, or None.
+    """
+    return session.get("user")
+
+
+def login_required(view):
+    """
+    Reject requests without a logged-in session with 401.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user() is None:
+            return jsonify({"error": "Authentication required."}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def has_internal_token() -> bool:
+    """
+    Whether the current request carries the configured internal API token.
+    """
+    expected = current_app.config.get("INTERNAL_API_TOKEN")
+    supplied = request.headers.get(INTERNAL_TOKEN_HEADER)
+    if not expected or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
+
+
+def internal_only(view):
+    """
+    Reject requests without the internal API token with 403.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not has_internal_token():
+            logger.warning("Rejected request to internal endpoint %s from %s.", request.path, request.remote_addr)
+            return jsonify({"error": "Forbidden."}), 403
+        return view(*args, **kwargs)
+    return wrapper
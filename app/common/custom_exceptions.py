@@ -1,3 +1,7 @@
 class AuthenticationError(Exception):
     """Raised when authentication fails."""
     pass
+
+class LoginThrottledError(AuthenticationError):
+    """Raised when a login attempt is rejected by rate limiting or lockout."""
+    pass
@@ -0,0 +1,163 @@
+"""
+SQLite engine profile and read/write routing.
+
+Applies tuned pragmas to every SQLite connection and, when enabled, creates
+a separate pool of read-only connections. Read-only code paths use
+``read_session()``; writes keep going through ``db.session`` and the writer
+pool.
+
+A ``db.session`` holds its writer connection until the app context ends, so
+the writer pool size (``SQLITE_WRITER_POOL_SIZE`` in ProductionConfig) caps
+how many requests can use ``db.session`` at once. With the default of 1 they
+run one at a time, which avoids ``database is locked`` errors but queues every
+request that reads through ``db.session``. Raise it when such requests are
+mostly reads. SQLite still allows only one write transaction at a time, and
+the other writers wait up to ``busy_timeout``.
+
+With ``ASYNC_DB_ENABLED``, an async engine on the same database (through
+the ``aiosqlite`` driver) backs ``async_session()`` for the async
+repositories.
+"""
+
+import logging
+from typing import Dict
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.common.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Pragmas that only make sense on the connection that owns the file.
+WRITER_ONLY_PRAGMAS = ("journal_mode", "synchronous")
+
+
+def _pragma_listener(pragmas: Dict[str, object]):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def init_engine_profile(app, database=db) -> None:
+    """
+    Configure SQLite pragmas and optional read routing for an application.
+
+    Reads ``SQLITE_PRAGMAS``, ``SQLITE_READ_ROUTING`` and
+    ``SQLALCHEMY_READ_ENGINE_OPTIONS`` from the app config.
+
+    :param app: Flask application, after ``db.init_app``
+    :param database: Flask-SQLAlchemy extension
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        writer = database.engine
+        if writer.dialect.name != "sqlite":
+            return
+        if pragmas:
+            event.listen(writer, "connect", _pragma_listener(pragmas))
+        # Open the writer once so the file exists and WAL mode is set before readers attach.
+        writer.connect().close()
+
+    if not app.config.get('SQLITE_READ_ROUTING'):
+        return
+
+    path = writer.url.database
+    if not path or path == ":memory:":
+        logger.warning("Read routing needs a file-backed SQLite database; using the writer for reads.")
+        return
+
+    reader_pragmas = {name: value for name, value in pragmas.items() if name not in WRITER_ONLY_PRAGMAS}
+    reader_pragmas["query_only"] = "ON"
+    reader = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        **app.config.get('SQLALCHEMY_READ_ENGINE_OPTIONS', {}),
+    )
+    event.listen(reader, "connect", _pragma_listener(reader_pragmas))
+
+    app.extensions['read_engine'] = reader
+    app.extensions['read_session'] = sessionmaker(bind=reader, expire_on_commit=False)
+
+    @app.teardown_appcontext
+    def close_read_session(exception=None):
+        session = g.pop('_read_session', None)
+        if session is not None:
+            session.close()
+
+
+def init_async_engine(app, database=db) -> None:
+    """
+    Create the async engine and session factory used by ``async_session()``.
+
+    Reads ``ASYNC_DB_ENABLED`` and ``SQLALCHEMY_ASYNC_ENGINE_OPTIONS`` from
+    the app config. Only SQLite databases are supported; if ``aiosqlite`` is
+    not installed the async engine is left out and the async repositories
+    report themselves unavailable.
+
+    :param app: Flask application, after ``db.init_app``
+    :param database: Flask-SQLAlchemy extension
+    """
+    if not app.config.get('ASYNC_DB_ENABLED'):
+        return
+    with app.app_context():
+        url = database.engine.url
+    if url.get_backend_name() != "sqlite":
+        logger.warning("The async engine only supports SQLite; async repositories are disabled.")
+        return
+
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        engine = create_async_engine(url.set(drivername="sqlite+aiosqlite"),
+                                     **app.config.get('SQLALCHEMY_ASYNC_ENGINE_OPTIONS', {}))
+    except ImportError as e:
+        logger.warning("Async database support is unavailable (%s); async repositories are disabled.", e)
+        return
+
+    pragmas = {name: value for name, value in (app.config.get('SQLITE_PRAGMAS') or {}).items()
+               if name not in WRITER_ONLY_PRAGMAS}
+    if pragmas:
+        event.listen(engine.sync_engine, "connect", _pragma_listener(pragmas))
+    app.extensions['async_engine'] = engine
+    app.extensions['async_session'] = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def has_async_engine() -> bool:
+    """
+    Whether the current app has an async engine configured.
+    """
+    return has_app_context() and 'async_session' in current_app.extensions
+
+
+def async_session():
+    """
+    New ``AsyncSession`` on the current app's async engine, for use as
+    ``async with async_session() as session``.
+
+    :raises RuntimeError: If the app has no async engine
+    """
+    if not has_async_engine():
+        raise RuntimeError("Async database access is not configured; set ASYNC_DB_ENABLED.")
+    return current_app.extensions['async_session']()
+
+
+def read_session():
+    """
+    Session for read-only queries: the read-only pool when routing is enabled,
+    the regular ``db.session`` otherwise. The read-only session is shared
+    within an app context and closed when it ends.
+    """
+    if has_app_context():
+        factory = current_app.extensions.get('read_session')
+        if factory is not None:
+            session = g.get('_read_session')
+            if session is None:
+                session = g._read_session = factory()
+            return session
+    return db.session
@@ -0,0 +1,388 @@
+"""
+Background email outbox.
+
+Messages are persisted to a local SQLite spool and queued for worker threads,
+each of which keeps its own SMTP connection open between messages. Failed
+sends are retried with exponential backoff, except for permanent (5xx) SMTP
+rejections, which are dropped at once. Every spooled message is leased to the
+process that queued it, so several processes can share one spool: a process
+only sends messages it holds the lease on, and on start it picks up messages
+whose lease has expired because their owner stopped or died.
+"""
+
+import atexit
+import heapq
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxFullError(Exception):
+    """
+    Raised when a message cannot be queued because the outbox is full.
+    """
+    pass
+
+
+class OutboxStore:
+    """
+    SQLite spool holding every message that has not been delivered yet.
+
+    Each row carries a lease (owner and expiry, in wall-clock seconds) so
+    that processes sharing the spool never deliver the same message twice.
+    """
+
+    _COLUMNS = "id, recipient, subject, body, attempts"
+
+    def __init__(self, path: str = ":memory:", lease_seconds: float = 300.0, busy_timeout: float = 5.0):
+        """
+        :param path: SQLite database file, or ``":memory:"``
+        :param lease_seconds: How long a message stays reserved for this process
+            beyond its next scheduled attempt
+        :param busy_timeout: Seconds to wait for another process's write lock
+        """
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._connection = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " recipient TEXT NOT NULL,"
+                " subject TEXT NOT NULL,"
+                " body TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " lease_owner TEXT,"
+                " lease_until REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(outbox)")}
+            # Spools created before leases existed: their rows count as unclaimed.
+            if "lease_owner" not in columns:
+                self._connection.execute("ALTER TABLE outbox ADD COLUMN lease_owner TEXT")
+            if "lease_until" not in columns:
+                self._connection.execute("ALTER TABLE outbox ADD COLUMN lease_until REAL NOT NULL DEFAULT 0")
+
+    def _lease_until(self, delay: float = 0.0) -> float:
+        return time.time() + delay + self.lease_seconds
+
+    def add(self, recipient: str, subject: str, body: str) -> int:
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO outbox (recipient, subject, body, lease_owner, lease_until) VALUES (?, ?, ?, ?, ?)",
+                (recipient, subject, body, self.owner, self._lease_until()),
+            )
+            return cursor.lastrowid
+
+    def claim(self, message_id: int) -> bool:
+        """
+        Renew this process's lease on a message, or take it over if its lease expired.
+
+        :return: False if the message was delivered already or is leased by another process
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE outbox SET lease_owner = ?, lease_until = ?"
+                " WHERE id = ? AND (lease_owner = ? OR lease_owner IS NULL OR lease_until < ?)",
+                (self.owner, self._lease_until(), message_id, self.owner, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def claim_expired(self) -> List[Dict]:
+        """
+        Take over every message whose lease has expired and return them.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE outbox SET lease_owner = ?, lease_until = ?"
+                " WHERE lease_owner IS NULL OR (lease_owner != ? AND lease_until < ?)",
+                (self.owner, self._lease_until(), self.owner, time.time()),
+            )
+            rows = self._connection.execute(
+                f"SELECT {self._COLUMNS} FROM outbox WHERE lease_owner = ? ORDER BY id", (self.owner,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def set_attempts(self, message_id: int, attempts: int, retry_delay: float = 0.0) -> None:
+        """
+        Record a failed attempt and hold the lease until after the next one is due.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE outbox SET attempts = ?, lease_until = ? WHERE id = ? AND lease_owner = ?",
+                (attempts, self._lease_until(retry_delay), message_id, self.owner),
+            )
+
+    def delete(self, message_id: int) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+
+    def pending(self) -> List[Dict]:
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {self._COLUMNS} FROM outbox ORDER BY id").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        return {"id": row[0], "recipient": row[1], "subject": row[2], "body": row[3], "attempts": row[4]}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class EmailOutbox:
+    """
+    Bounded queue of outgoing emails drained by a pool of SMTP worker threads.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 25, sender: str = "no-reply@example.com",
+                 workers: int = 2, max_queue_size: int = 1000, batch_size: int = 20,
+                 max_attempts: int = 5, backoff_seconds: float = 1.0, idle_timeout: float = 30.0,
+                 enqueue_timeout: float = 0.5, smtp_timeout: float = 30.0,
+                 store: Optional[OutboxStore] = None, smtp_factory: Optional[Callable] = None):
+        """
+        :param host: SMTP server host
+        :param port: SMTP server port
+        :param sender: Envelope and header sender address
+        :param workers: Number of worker threads, and therefore of pooled SMTP connections
+        :param max_queue_size: Maximum number of messages waiting to be sent
+        :param batch_size: Maximum number of messages sent per connection round
+        :param max_attempts: Attempts before a message is dropped as undeliverable
+        :param backoff_seconds: Delay before the first retry, doubled on each further attempt
+        :param idle_timeout: Seconds an idle worker keeps its SMTP connection open
+        :param enqueue_timeout: Seconds ``send`` waits for space in a full queue
+        :param smtp_timeout: Socket timeout for connecting to and talking with the SMTP server
+        :param store: Spool for pending messages; in-memory if not given
+        :param smtp_factory: Callable ``(host, port, timeout=...)`` returning a connected SMTP
+            client, injectable for tests; ``smtplib.SMTP`` if not given
+        """
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.idle_timeout = idle_timeout
+        self.enqueue_timeout = enqueue_timeout
+        self.smtp_timeout = smtp_timeout
+        self.store = store or OutboxStore()
+        if smtp_factory is None:
+            import smtplib  # deferred: pulls in ssl, which is slow to import
+            smtp_factory = smtplib.SMTP
+        self.smtp_factory = smtp_factory
+
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue_size)
+        self._retries: List[tuple] = []
+        self._retries_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"sent": 0, "failed": 0, "retried": 0, "connections_opened": 0}
+
+    def start(self) -> None:
+        """
+        Requeue spooled messages whose lease expired and start the workers.
+
+        Messages still leased by another live process are left to that process.
+        """
+        if self._threads:
+            return
+        self._stop.clear()
+        for message in self.store.claim_expired():
+            self._schedule_retry(message, delay=0.0)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run_worker, name=f"email-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Email outbox started with %d workers.", self.workers)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop the workers. Messages not yet sent stay in the spool for the next start.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def send(self, recipient: str, subject: str, body: str) -> int:
+        """
+        Queue an email for delivery.
+
+        :param recipient: Recipient address
+        :param subject: Message subject
+        :param body: Plain-text message body
+        :return: ID of the queued message
+        :raises OutboxFullError: If the queue stays full for ``enqueue_timeout`` seconds
+        """
+        message_id = self.store.add(recipient, subject, body)
+        message = {"id": message_id, "recipient": recipient, "subject": subject, "body": body, "attempts": 0}
+        try:
+            self._queue.put(message, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.store.delete(message_id)
+            raise OutboxFullError("Email outbox is full.")
+        return message_id
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Return queue depths and delivery counters.
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        with self._retries_lock:
+            metrics["retry_depth"] = len(self._retries)
+        metrics["queue_depth"] = self._queue.qsize()
+        return metrics
+
+    def _count(self, name: str) -> None:
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def _schedule_retry(self, message: Dict, delay: float) -> None:
+        with self._retries_lock:
+            heapq.heappush(self._retries, (time.monotonic() + delay, message["id"], message))
+
+    def _due_retries(self, limit: int) -> List[Dict]:
+        due = []
+        now = time.monotonic()
+        with self._retries_lock:
+            while self._retries and len(due) < limit and self._retries[0][0] <= now:
+                due.append(heapq.heappop(self._retries)[2])
+        return due
+
+    def _next_batch(self) -> List[Dict]:
+        batch = self._due_retries(self.batch_size)
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=min(self.idle_timeout, self.backoff_seconds)))
+            except queue.Empty:
+                return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_worker(self) -> None:
+        connection = None
+        last_used = time.monotonic()
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                if connection is not None and time.monotonic() - last_used > self.idle_timeout:
+                    connection = self._close(connection)
+                continue
+
+            for message in batch:
+                try:
+                    connection = self._process(connection, message)
+                except Exception:
+                    # The spool itself failed. The message keeps its lease and is
+                    # requeued by the next outbox start after that expires.
+                    logger.exception("Email %s could not be processed.", message["id"])
+                last_used = time.monotonic()
+        self._close(connection)
+
+    def _process(self, connection, message: Dict):
+        if not self.store.claim(message["id"]):
+            logger.info("Email %s is sent or leased by another process; skipping it.", message["id"])
+            return connection
+        try:
+            if connection is None:
+                connection = self.smtp_factory(self.host, self.port, timeout=self.smtp_timeout)
+                self._count("connections_opened")
+            self._send(connection, message)
+        except Exception as e:
+            connection = self._close(connection)
+            self._handle_failure(message, e)
+            return connection
+        self.store.delete(message["id"])
+        self._count("sent")
+        return connection
+
+    def _send(self, connection, message: Dict) -> None:
+        from email.message import EmailMessage
+        from email.policy import SMTP
+
+        mime = EmailMessage(policy=SMTP)
+        mime['Subject'] = message["subject"]
+        mime['From'] = self.sender
+        mime['To'] = message["recipient"]
+        mime.set_content(message["body"])
+        connection.sendmail(self.sender, message["recipient"], mime.as_bytes())
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        """
+        Whether retrying cannot help: a 5xx SMTP reply, or a message that cannot be encoded.
+        """
+        import smtplib
+
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(code >= 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code >= 500
+        return not isinstance(error, OSError)
+
+    def _handle_failure(self, message: Dict, error: Exception) -> None:
+        message["attempts"] += 1
+        permanent = self._is_permanent(error)
+        if permanent or message["attempts"] >= self.max_attempts:
+            logger.error("Dropping email %s to %s after %d attempts (%s): %r",
+                         message["id"], message["recipient"], message["attempts"],
+                         "permanent failure" if permanent else "retries exhausted", error)
+            self.store.delete(message["id"])
+            self._count("failed")
+            return
+        delay = self.backoff_seconds * (2 ** (message["attempts"] - 1))
+        logger.warning("Email %s to %s failed (%s); retrying in %.1fs.",
+                       message["id"], message["recipient"], error, delay)
+        self.store.set_attempts(message["id"], message["attempts"], retry_delay=delay)
+        self._schedule_retry(message, delay)
+        self._count("retried")
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.quit()
+            except Exception:
+                connection.close()
+        return None
+
+
+_outbox: Optional[EmailOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> EmailOutbox:
+    """
+    Return the process-wide outbox, creating and starting it on first use.
+
+    The SMTP server and spool location are read from the ``SMTP_HOST``,
+    ``SMTP_PORT`` and ``EMAIL_OUTBOX_PATH`` environment variables.
+    """
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                outbox = EmailOutbox(
+                    host=os.getenv('SMTP_HOST', 'localhost'),
+                    port=int(os.getenv('SMTP_PORT', '25')),
+                    store=OutboxStore(os.getenv('EMAIL_OUTBOX_PATH', 'email_outbox.db')),
+                )
+                outbox.start()
+                atexit.register(outbox.stop)
+                _outbox = outbox
+    return _outbox
@@ -0,0 +1,264 @@
+"""
+Request instrumentation.
+
+Records per-endpoint latency histograms and per-request SQL statement counts
+and database time, and exposes them in the Prometheus text format to clients
+holding the internal API token.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from app.common.access import internal_only
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of non-negative integer values, in the style of HdrHistogram.
+
+    Values below ``2 ** SUB_BUCKET_BITS`` are counted exactly; larger values
+    fall into buckets whose width is at most 1/32 of their lower bound, so
+    reported percentiles are within about 3% of the true value.
+    """
+
+    SUB_BUCKET_BITS = 6
+    SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+    def __init__(self):
+        self._counts: List[int] = []
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        return shift * cls.SUB_BUCKET_HALF + (value >> shift)
+
+    @classmethod
+    def _upper_bound(cls, index: int) -> int:
+        if index < 2 * cls.SUB_BUCKET_HALF:
+            return index
+        shift = index // cls.SUB_BUCKET_HALF - 1
+        top = index - shift * cls.SUB_BUCKET_HALF
+        return ((top + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """
+        Count one occurrence of a value.
+        """
+        value = max(int(value), 0)
+        index = self._index(value)
+        with self._lock:
+            if index >= len(self._counts):
+                self._counts.extend([0] * (index + 1 - len(self._counts)))
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentiles(self, quantiles=QUANTILES) -> Dict[float, int]:
+        """
+        Return the value at or below which each requested fraction of samples falls.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count = self.count
+            maximum = self.max
+        result = {}
+        if count == 0:
+            return {quantile: 0 for quantile in quantiles}
+        for quantile in sorted(quantiles):
+            target = max(1, int(round(quantile * count)))
+            seen = 0
+            for index, bucket in enumerate(counts):
+                seen += bucket
+                if seen >= target:
+                    result[quantile] = min(self._upper_bound(index), maximum)
+                    break
+        return result
+
+
+class EndpointMetrics:
+    """
+    Metrics collected for one endpoint.
+    """
+
+    def __init__(self):
+        self.latency_us = LatencyHistogram()
+        self.sql_statements = LatencyHistogram()
+        self.sql_time_us = LatencyHistogram()
+        self.errors = 0
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of metrics keyed by endpoint name.
+    """
+
+    def __init__(self):
+        self._endpoints: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name: str) -> EndpointMetrics:
+        metrics = self._endpoints.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._endpoints.setdefault(name, EndpointMetrics())
+        return metrics
+
+    def record_request(self, name: str, seconds: float, statements: int, db_seconds: float,
+                       failed: bool) -> None:
+        metrics = self.endpoint(name)
+        metrics.latency_us.record(seconds * 1e6)
+        metrics.sql_statements.record(statements)
+        metrics.sql_time_us.record(db_seconds * 1e6)
+        if failed:
+            with self._lock:
+                metrics.errors += 1
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+        lines = [
+            "# HELP app_request_duration_seconds Request latency by endpoint.",
+            "# TYPE app_request_duration_seconds summary",
+        ]
+        for name, metrics in endpoints:
+            lines.extend(_summary_lines("app_request_duration_seconds", name, metrics.latency_us, 1e-6))
+        lines += [
+            "# HELP app_request_sql_statements SQL statements executed per request.",
+            "# TYPE app_request_sql_statements summary",
+        ]
+        for name, metrics in endpoints:
+            lines.extend(_summary_lines("app_request_sql_statements", name, metrics.sql_statements, 1))
+        lines += [
+            "# HELP app_request_db_seconds Time spent in SQL statements per request.",
+            "# TYPE app_request_db_seconds summary",
+        ]
+        for name, metrics in endpoints:
+            lines.extend(_summary_lines("app_request_db_seconds", name, metrics.sql_time_us, 1e-6))
+        lines += [
+            "# HELP app_request_errors_total Requests that raised or returned a 5xx status.",
+            "# TYPE app_request_errors_total counter",
+        ]
+        for name, metrics in endpoints:
+            lines.append(f'app_request_errors_total{{endpoint="{_escape(name)}"}} {metrics.errors}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _summary_lines(metric: str, endpoint: str, histogram: LatencyHistogram, scale: float) -> List[str]:
+    label = f'endpoint="{_escape(endpoint)}"'
+    lines = [
+        f'{metric}{{{label},quantile="{quantile}"}} {value * scale:g}'
+        for quantile, value in histogram.percentiles().items()
+    ]
+    lines.append(f"{metric}_sum{{{label}}} {histogram.total * scale:g}")
+    lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+    return lines
+
+
+# The start time lives on the statement's execution context rather than on the
+# connection, so a statement that fails (and never reaches after_cursor_execute)
+# leaves nothing behind to skew the timing of later statements.
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    if has_request_context():
+        state = g.get("_instrumentation")
+        if state is not None:
+            state[1] += 1
+            state[2] += time.perf_counter() - started
+
+
+def _start_request():
+    g._instrumentation = [time.perf_counter(), 0, 0.0]
+
+
+def _record_response(response):
+    g._instrumentation_status = response.status_code
+    return response
+
+
+def _finish_request(error=None):
+    state = g.pop("_instrumentation", None)
+    if state is None:
+        return
+    status = g.pop("_instrumentation_status", 500)
+    name = request.endpoint or "<unmatched>"
+    current_app.extensions["instrumentation"].record_request(
+        name, time.perf_counter() - state[0], state[1], state[2],
+        failed=error is not None or status >= 500)
+
+
+instrumentation_bp = Blueprint('instrumentation', __name__)
+
+
+@instrumentation_bp.route('/metrics', methods=['GET'])
+@internal_only
+def metrics():
+    """
+    Expose collected metrics in the Prometheus text format.
+    """
+    registry = current_app.extensions["instrumentation"]
+    return Response(registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+def init_instrumentation(app, db, registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """
+    Enable request and SQL instrumentation for an application.
+
+    :param app: Flask application
+    :param db: Flask-SQLAlchemy extension whose engine is instrumented, together with
+        the read-only and async engines if ``init_engine_profile`` and
+        ``init_async_engine`` created them
+    :param registry: Registry to record into; a new one is created if omitted
+    :return: The registry in use
+    """
+    registry = registry or MetricsRegistry()
+    app.extensions["instrumentation"] = registry
+
+    with app.app_context():
+        engines = [db.engine]
+    if 'read_engine' in app.extensions:
+        engines.append(app.extensions['read_engine'])
+    if 'async_engine' in app.extensions:
+        engines.append(app.extensions['async_engine'].sync_engine)
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    app.register_blueprint(instrumentation_bp, url_prefix=app.config.get('METRICS_URL_PREFIX', '/internal'))
+    return registry
@@ -0,0 +1,122 @@
+"""
+JSON encoding for responses.
+
+Uses orjson when it is installed and the standard library otherwise, and
+provides a streaming response for large result arrays. Both encoders
+decode to the same values as Flask's default provider; in particular dates
+are written as HTTP dates, not the ISO 8601 strings orjson would produce.
+Unlike Flask's default, non-ASCII characters are written as UTF-8 rather
+than ``\\u`` escapes, since orjson cannot escape them.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Number of array items encoded per streamed chunk.
+STREAM_CHUNK_SIZE = 100
+
+
+# Handles dates, Decimal, UUID and dataclasses the same way Flask does.
+_default = DefaultJSONProvider.default
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = True) -> bytes:
+    """
+    Encode a value as compact UTF-8 JSON.
+
+    Non-ASCII characters are written as UTF-8, not escaped, with or without
+    orjson.
+
+    :param obj: Value to encode
+    :param sort_keys: Whether to sort object keys, for byte-stable output
+    :return: Encoded JSON
+    """
+    if orjson is not None:
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                  | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, separators=(",", ":"), sort_keys=sort_keys,
+                      ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when available.
+
+    Falls back to the default provider when orjson is missing or when
+    stdlib-specific keyword arguments are passed.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, sort_keys=self.sort_keys).decode("utf-8")
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, sort_keys=self.sort_keys) + b"\n",
+                                        mimetype=self.mimetype)
+
+
+def stream_json_array(items: Iterable[Any], key: str = "results", head: Optional[Dict[str, Any]] = None,
+                      tail: Optional[Callable[[], Dict[str, Any]]] = None, status: int = 200) -> Response:
+    """
+    Stream a JSON object whose main member is a large array, encoding items as they are produced.
+
+    The body is ``{<head fields>, "<key>": [<items>], <tail fields>}``. The
+    status is sent before the items are produced, so if producing them fails
+    the array is closed early and an ``"error"`` member is added after the
+    tail fields; a body with that member is incomplete.
+
+    :param items: Iterable of JSON-serializable items, consumed lazily
+    :param key: Name of the array member
+    :param head: Fields emitted before the array
+    :param tail: Called after the array is exhausted; returns fields emitted after it
+    :param status: HTTP status code
+    :return: Streaming response
+    """
+    def fields(values: Dict[str, Any]) -> bytes:
+        return b",".join(dumps_bytes(name) + b":" + dumps_bytes(value) for name, value in values.items())
+
+    def generate():
+        prefix = fields(head) + b"," if head else b""
+        yield b"{" + prefix + dumps_bytes(key) + b":["
+        chunk = []
+        first = True
+        failed = False
+        try:
+            for item in items:
+                chunk.append(dumps_bytes(item))
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield (b"" if first else b",") + b",".join(chunk)
+                    first = False
+                    chunk = []
+        except Exception:
+            logger.exception("Streaming the %r array failed after the response started.", key)
+            failed = True
+        if chunk:
+            yield (b"" if first else b",") + b",".join(chunk)
+        trailer = dict(tail()) if tail else {}
+        if failed:
+            trailer["error"] = "The response is incomplete because of an internal error."
+        yield b"]" + (b"," + fields(trailer) if trailer else b"") + b"}\n"
+
+    return Response(stream_with_context(generate()), status=status, mimetype="application/json")
@@ -1,20 +1,81 @@
 """
 Common models used across the application.
 """
-from flask_sqlalchemy import SQLAlchemy
-
-db = SQLAlchemy()
+from app.common.extensions import db
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
+    # Added to existing databases by migrations/0002_add_product_in_stock.sql.
+    in_stock = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    # Incremented by SQLAlchemy on every update; identifies cached representations.
+    # Added to existing databases by migrations/0001_add_product_version.sql.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text('1'))
+
+    __mapper_args__ = {"version_id_col": version}
 
     def to_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "description": self.description,
-            "price": self.price
-        }
\ No newline at end of file
+            "price": self.price,
+            "in_stock": self.in_stock
+        }
+
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "parent_id": self.parent_id
+        }
+
+class CategoryClosure(db.Model):
+    """
+    Closure table of the category tree: one row per (ancestor, descendant) pair,
+    including each category paired with itself at depth 0.
+    """
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_category_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+class ProductCategory(db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_product_category_category', 'category_id', 'product_id'),
+    )
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+
+    def set_password(self, password):
+        """
+        Hash a password in the shared hashing pool and store the hash.
+
+        :raises HashingUnavailableError: If the hashing pool is saturated
+        """
+        from app.auth.password_hashing import password_hasher
+
+        self.password_hash = password_hasher.hash_password(password)
+
+class RevokedResetToken(db.Model):
+    """
+    Password reset tokens that have been used, shared by all workers until they expire.
+    """
+    digest = db.Column(db.LargeBinary(32), primary_key=True)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
@@ -0,0 +1,152 @@
+"""
+Worker startup helpers.
+
+Provides lazy blueprint registration and a pre-fork warmup hook.
+
+With ``LAZY_BLUEPRINTS`` enabled, ``create_app`` does not import the
+blueprint modules; they are imported and registered just before the first
+request is dispatched. The models are imported with them, so import
+``app.common.models`` before calling ``db.create_all()`` on such an app.
+
+Lazy loading shortens the start of a single process, such as a development
+server. Pre-forking servers should instead preload the app in the master
+process and call ``warmup`` there, so every worker inherits the imported
+modules, the search index and the frozen heap copy-on-write::
+
+    # gunicorn.conf.py
+    preload_app = True
+
+    # wsgi.py
+    app = create_app('production')
+    warmup(app)
+
+Run ``python -m tests.benchmarks.import_report`` for a report of the slowest
+imports.
+"""
+
+import asyncio
+import gc
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence, Tuple
+
+from werkzeug.utils import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LazyBlueprintLoader:
+    """
+    WSGI middleware that imports and registers blueprints before the first request.
+
+    Flask does not allow blueprints to be registered once it has handled a
+    request, so every pending blueprint is loaded together, under a lock, by
+    whichever request arrives first.
+    """
+
+    def __init__(self, app, manifest: Sequence[Tuple[str, str]],
+                 on_loaded: Optional[Callable] = None):
+        """
+        :param app: Flask application
+        :param manifest: ``(import path, url prefix)`` pairs, e.g. ``('app.products.views:products_bp', '/products')``
+        :param on_loaded: Called with the app once every blueprint is registered
+        """
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.manifest = list(manifest)
+        self.on_loaded = on_loaded
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Import and register every pending blueprint; does nothing once loaded.
+        """
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            started = time.perf_counter()
+            for import_path, url_prefix in self.manifest:
+                self.app.register_blueprint(import_string(import_path), url_prefix=url_prefix)
+            if self.on_loaded is not None:
+                self.on_loaded(self.app)
+            self.loaded = True
+            logger.info("Loaded %d blueprints in %.1fms", len(self.manifest),
+                        (time.perf_counter() - started) * 1000)
+
+    def __call__(self, environ, start_response):
+        if not self.loaded:
+            self.load()
+        return self.wsgi_app(environ, start_response)
+
+
+def register_blueprints(app, manifest: Sequence[Tuple[str, str]], lazy: bool = False,
+                        on_loaded: Optional[Callable] = None) -> None:
+    """
+    Register the blueprints named in a manifest, now or before the first request.
+
+    :param app: Flask application
+    :param manifest: ``(import path, url prefix)`` pairs
+    :param lazy: Defer the imports until the first request or ``warmup``
+    :param on_loaded: Called with the app once every blueprint is registered
+    """
+    loader = LazyBlueprintLoader(app, manifest, on_loaded)
+    app.extensions['blueprint_loader'] = loader
+    if lazy:
+        app.wsgi_app = loader
+    else:
+        loader.load()
+
+
+def _run_to_completion(coroutine):
+    """
+    Run a coroutine from synchronous code, on a separate thread if this one
+    is already running an event loop, where ``asyncio.run`` is not allowed.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def warmup(app, freeze: bool = True) -> None:
+    """
+    Prepare a preloaded app to be forked into workers.
+
+    Loads deferred blueprints (and whatever their ``on_loaded`` hook builds,
+    such as the search index), closes pooled database connections so no
+    worker inherits a shared SQLite handle, and moves every surviving object
+    into the permanent GC generation so collections in the workers do not
+    touch, and therefore copy, the shared pages.
+
+    :param app: Flask application
+    :param freeze: Whether to call ``gc.freeze()``
+    """
+    started = time.perf_counter()
+    loader = app.extensions.get('blueprint_loader')
+    if loader is not None:
+        loader.load()
+
+    sqlalchemy = app.extensions.get('sqlalchemy')
+    if sqlalchemy is not None:
+        with app.app_context():
+            for engine in sqlalchemy.engines.values():
+                engine.dispose()
+    read_engine = app.extensions.get('read_engine')
+    if read_engine is not None:
+        read_engine.dispose()
+    async_engine = app.extensions.get('async_engine')
+    if async_engine is not None:
+        _run_to_completion(async_engine.dispose())
+
+    gc.collect()
+    if freeze:
+        gc.freeze()
+    logger.info("Warmup finished in %.1fms (%d objects frozen)",
+                (time.perf_counter() - started) * 1000, gc.get_freeze_count())
@@ -5,34 +5,86 @@ Common utility functions.
 """
 
 import os
-import smtplib
-from email.mime.text import MIMEText
-from app.models import User
-from datetime import datetime, timedelta
-import jwt
+import secrets
+import time
+from sqlalchemy.exc import IntegrityError
+from app.common.extensions import db
+from app.common.models import RevokedResetToken, User
+from app.common.email_outbox import get_outbox
+from app.auth.reset_tokens import ResetTokenVerifier
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'your_secret_key')
 
+# Seconds a password reset link stays valid.
+RESET_TOKEN_LIFETIME = 3600
 
-def send_reset_email(to_email: str, token: str) -> None:
+
+def _find_user_id(email: str):
+    user = User.query.filter_by(email=email).first()
+    return user.id if user else None
+
+
+class DatabaseRevokedTokens:
     """
-    Send a password reset email.
+    Revoked reset token digests in the application database, so that a token
+    used on one worker is rejected by all of them.
     """
-    msg = MIMEText(f"Click the link to reset your password: {token}")
-    msg['Subject'] = 'Password Reset Request'
-    msg['From'] = 'no-reply@example.com'
-    msg['To'] = to_email
 
-    with smtplib.SMTP('localhost') as server:
-        server.sendmail('no-reply@example.com', to_email, msg.as_string())
+    def __contains__(self, digest: bytes) -> bool:
+        return db.session.get(RevokedResetToken, digest) is not None
+
+    def add(self, digest: bytes, expires_at: float) -> bool:
+        """
+        Record a revocation and commit the session, dropping revocations of expired tokens.
+
+        :return: False if the token had already been revoked, in which case the session is rolled back
+        """
+        db.session.execute(db.delete(RevokedResetToken).where(RevokedResetToken.expires_at < time.time()))
+        db.session.add(RevokedResetToken(digest=digest, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+
+reset_token_verifier = ResetTokenVerifier(SECRET_KEY, _find_user_id, shared_revoked=DatabaseRevokedTokens())
+
+
+def create_reset_token(email: str) -> str:
+    """
+    Create a signed password reset token for an email address, valid for RESET_TOKEN_LIFETIME seconds.
+    Every token is unique, so using one link does not revoke another issued in the same second.
+    """
+    import jwt  # deferred: only needed once a reset is requested
+
+    payload = {'email': email, 'exp': int(time.time()) + RESET_TOKEN_LIFETIME, 'jti': secrets.token_hex(8)}
+    return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+
+
+def send_reset_email(to_email: str, token: str) -> None:
+    """
+    Queue a password reset email for background delivery.
+    """
+    get_outbox().send(to_email, 'Password Reset Request', f"Click the link to reset your password: {token}")
 
 
 def verify_reset_token(token: str):
     """
     Verify if the reset token is valid.
+    Malformed, expired and recently used tokens are rejected without a database query.
     """
-    try:
-        email = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])['email']
-    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+    user_id = reset_token_verifier.verify(token)
+    if user_id is None:
         return None
-    return User.query.filter_by(email=email).first()
+    return db.session.get(User, user_id)
+
+
+def revoke_reset_token(token: str) -> bool:
+    """
+    Mark a reset token as used so it cannot be replayed, committing the session with it.
+
+    :return: False if the token was invalid or already used, in which case the session is rolled back
+    """
+    return reset_token_verifier.revoke(token)
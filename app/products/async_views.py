@@ -0,0 +1,48 @@
+"""
+Module for async variants of the I/O-bound products views.
+Registered under ``/async/products`` when ASYNC_VIEWS_ENABLED is set; they
+share their services, caches and validation with the views in ``views.py``.
+"""
+from flask import Blueprint, request, jsonify
+from app.products.category import ProductCategorizationError
+from app.products.pagination import InvalidCursorError
+from app.products.search import ProductSearchError
+from app.products.views import (InvalidArgumentError, categorization_service, category_listing_page,
+                                category_listing_position, per_page_argument, search_arguments, search_service)
+
+products_async_bp = Blueprint('products_async_bp', __name__)
+
+@products_async_bp.route('/search', methods=['GET'])
+async def search_products():
+    try:
+        query, page, per_page, cursor = search_arguments()
+        return jsonify(await search_service.search_products_async(query, page, per_page, cursor=cursor)), 200
+    except (InvalidArgumentError, InvalidCursorError) as e:
+        return jsonify({"error": str(e)}), 400
+    except ProductSearchError as e:
+        return jsonify({"error": str(e)}), 500
+
+@products_async_bp.route('/categories/<int:category_id>/products', methods=['GET'])
+async def list_category_products(category_id):
+    try:
+        per_page = per_page_argument(20)
+        scope, position = category_listing_position(category_id, per_page)
+        results = await categorization_service.list_products_in_subtree_async(
+            category_id, limit=per_page, after_id=position["id"] if position else None)
+    except (InvalidArgumentError, InvalidCursorError) as e:
+        return jsonify({"error": str(e)}), 400
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(category_listing_page(results, per_page, position, scope)), 200
+
+@products_async_bp.route('/categories/<int:category_id>/breadcrumb', methods=['GET'])
+async def category_breadcrumb(category_id):
+    try:
+        path = await categorization_service.get_breadcrumb_async(category_id)
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 500
+
+    if not path:
+        return jsonify({"error": "Category not found"}), 404
+    return jsonify({"breadcrumb": path}), 200
@@ -0,0 +1,332 @@
+"""
+Module for the in-memory autocomplete index.
+Answers typeahead prefixes over product names and category names from a
+sorted array of keys, without touching the database or the search index.
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.products.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Most suggestions returned per kind for one prefix.
+MAX_SUGGESTIONS = 20
+
+# Prefixes matching more keys than this are answered from a cached top list
+# instead of scanning their key range.
+SCAN_LIMIT = 256
+
+# Cached top lists are built up front for prefixes up to this length.
+WARM_PREFIX_LENGTH = 2
+
+
+def normalize_prefix(prefix: str) -> str:
+    """
+    Normalize typed text the way indexed labels are normalized.
+
+    A trailing separator is kept as a single space so ``"red "`` only matches
+    labels with a word after ``red``.
+    """
+    normalized = " ".join(tokenize(prefix))
+    if normalized and not prefix[-1:].isalnum():
+        normalized += " "
+    return normalized
+
+
+def label_keys(label: str) -> Tuple[str, ...]:
+    """
+    Keys a label is found under: its normalized text starting from each word,
+    so ``"Red Running Shoe"`` matches ``"red ru"``, ``"runn"`` and ``"sh"``.
+    """
+    words = tokenize(label)
+    return tuple(dict.fromkeys(" ".join(words[start:]) for start in range(len(words))))
+
+
+class _Entry:
+    __slots__ = ("id", "label", "score", "keys", "rank")
+
+    def __init__(self, entry_id, label: str, score: int):
+        self.id = entry_id
+        self.label = label
+        self.keys = label_keys(label)
+        self.set_score(score)
+
+    def set_score(self, score: int) -> None:
+        self.score = score
+        self.rank = (-score, self.label.lower(), self.id)
+
+
+class PrefixIndex:
+    """
+    Sorted array of label keys with popularity-ranked prefix lookups.
+
+    Keys and the entries they belong to are kept in two parallel lists
+    ordered by key, so a prefix maps to one contiguous range found with two
+    bisections. Short ranges are scanned; for prefixes matching many keys the
+    best ``MAX_SUGGESTIONS`` entries are cached and kept current as entries
+    are added or gain popularity. Only the prefix lengths that have a cached
+    list are checked on an update, so bumping a long label's score costs a few
+    lookups rather than one per prefix of every key. Not thread-safe;
+    ``AutocompleteIndex`` serializes access.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._entries: List[_Entry] = []
+        self._by_id: Dict[object, _Entry] = {}
+        self._top: Dict[str, List[_Entry]] = {}
+        # Number of cached top lists per prefix length.
+        self._cached_lengths: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def rebuild(self, items: Iterable[Tuple[object, str, int]]) -> None:
+        """
+        Replace the contents with (id, label, score) items.
+        """
+        self._by_id = {entry_id: _Entry(entry_id, label, score) for entry_id, label, score in items}
+        pairs = sorted(((key, entry) for entry in self._by_id.values() for key in entry.keys),
+                       key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._entries = [entry for _, entry in pairs]
+        self._top = {}
+        self._cached_lengths = {}
+        self._warm()
+
+    def put(self, entry_id, label: str, score: Optional[int] = None) -> None:
+        """
+        Add an entry or update its label and score; a score of None keeps the current one.
+        """
+        entry = self._by_id.get(entry_id)
+        if entry is not None and entry.label == label:
+            if score is not None:
+                self.set_score(entry_id, score)
+            return
+        if entry is not None:
+            self.remove(entry_id)
+            score = entry.score if score is None else score
+        entry = self._by_id[entry_id] = _Entry(entry_id, label, score or 0)
+        for key in entry.keys:
+            position = bisect.bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._entries.insert(position, entry)
+        self._promote(entry)
+
+    def remove(self, entry_id) -> bool:
+        """
+        Remove an entry; returns whether it was present.
+        """
+        entry = self._by_id.pop(entry_id, None)
+        if entry is None:
+            return False
+        self._retire(entry)
+        for key in entry.keys:
+            position = bisect.bisect_left(self._keys, key)
+            while self._entries[position] is not entry:
+                position += 1
+            del self._keys[position]
+            del self._entries[position]
+        return True
+
+    def set_score(self, entry_id, score: int) -> None:
+        """
+        Change the popularity of an entry.
+        """
+        entry = self._by_id.get(entry_id)
+        if entry is None or entry.score == score:
+            return
+        if score < entry.score:
+            self._retire(entry)
+            entry.set_score(score)
+        else:
+            entry.set_score(score)
+            self._promote(entry)
+
+    def top(self, prefix: str, limit: int) -> List[_Entry]:
+        """
+        The most popular entries with a key starting with an already normalized prefix.
+
+        :param prefix: Normalized prefix
+        :param limit: Maximum number of entries, at most ``MAX_SUGGESTIONS``
+        :return: Entries by descending score, then label
+        """
+        cached = self._top.get(prefix)
+        if cached is not None:
+            return cached[:limit]
+        low = bisect.bisect_left(self._keys, prefix)
+        high = bisect.bisect_left(self._keys, prefix + "\uffff", low)
+        if high - low <= SCAN_LIMIT:
+            return self._best(self._entries[low:high], limit)
+        best = self._top[prefix] = self._best(self._entries[low:high], MAX_SUGGESTIONS)
+        self._cached_lengths[len(prefix)] = self._cached_lengths.get(len(prefix), 0) + 1
+        return best[:limit]
+
+    @staticmethod
+    def _best(entries: Iterable[_Entry], limit: int) -> List[_Entry]:
+        unique = {id(entry): entry for entry in entries}
+        return heapq.nsmallest(limit, unique.values(), key=lambda entry: entry.rank)
+
+    def _warm(self) -> None:
+        for prefix in {key[:length] for key in self._keys for length in range(1, WARM_PREFIX_LENGTH + 1)}:
+            self.top(prefix, 0)
+
+    def _cached_prefixes(self, entry: _Entry) -> List[str]:
+        prefixes = {key[:length] for key in entry.keys for length in self._cached_lengths if length <= len(key)}
+        return [prefix for prefix in prefixes if prefix in self._top]
+
+    def _promote(self, entry: _Entry) -> None:
+        # The entry is new or ranks higher than before: merge it into the cached lists.
+        for prefix in self._cached_prefixes(entry):
+            best = self._top[prefix]
+            if entry in best:
+                best.sort(key=lambda candidate: candidate.rank)
+            elif len(best) < MAX_SUGGESTIONS or entry.rank < best[-1].rank:
+                bisect.insort(best, entry, key=lambda candidate: candidate.rank)
+                del best[MAX_SUGGESTIONS:]
+
+    def _retire(self, entry: _Entry) -> None:
+        # The entry is leaving or ranks lower: lists holding it are rebuilt on their next lookup.
+        for prefix in self._cached_prefixes(entry):
+            if entry in self._top[prefix]:
+                del self._top[prefix]
+                remaining = self._cached_lengths.pop(len(prefix)) - 1
+                if remaining:
+                    self._cached_lengths[len(prefix)] = remaining
+
+
+class AutocompleteIndex:
+    """
+    Thread-safe typeahead index over product names and category names.
+
+    Products are ranked by how often their detail page has been viewed,
+    categories by how many indexed products they contain. View counts are
+    kept in memory and survive ``rebuild``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._products = PrefixIndex()
+        self._categories = PrefixIndex()
+        self._views: Dict[int, int] = {}
+        self._product_categories: Dict[int, Tuple[str, ...]] = {}
+        self._category_counts: Dict[str, int] = {}
+        self._category_labels: Dict[str, str] = {}
+        self.is_ready = False
+
+    def rebuild(self, products: Iterable[Dict]) -> None:
+        """
+        Replace the index contents with the given products and their category names.
+
+        :param products: Iterable of product dictionaries with ``id``, ``name`` and optional ``categories``
+        """
+        product_items = []
+        product_categories = {}
+        category_counts: Dict[str, int] = {}
+        category_labels: Dict[str, str] = {}
+        with self._lock:
+            views = dict(self._views)
+        for product in products:
+            product_items.append((product["id"], product["name"], views.get(product["id"], 0)))
+            keys = self._category_keys(product, category_labels)
+            product_categories[product["id"]] = keys
+            for key in keys:
+                category_counts[key] = category_counts.get(key, 0) + 1
+
+        fresh_products, fresh_categories = PrefixIndex(), PrefixIndex()
+        fresh_products.rebuild(product_items)
+        fresh_categories.rebuild((key, category_labels[key], count) for key, count in category_counts.items())
+        with self._lock:
+            self._products = fresh_products
+            self._categories = fresh_categories
+            self._product_categories = product_categories
+            self._category_counts = category_counts
+            self._category_labels = category_labels
+            self.is_ready = True
+        logger.info("Autocomplete index rebuilt with %d products and %d categories.",
+                    len(fresh_products), len(fresh_categories))
+
+    def add_product(self, product: Dict) -> None:
+        """
+        Index a product, replacing any previous version of it.
+
+        :param product: Product dictionary with ``id``, ``name`` and optional ``categories``
+        """
+        product_id = product["id"]
+        with self._lock:
+            self._products.put(product_id, product["name"], self._views.get(product_id, 0))
+            keys = self._category_keys(product, self._category_labels)
+            previous = self._product_categories.get(product_id, ())
+            self._product_categories[product_id] = keys
+            for key in set(previous) - set(keys):
+                self._count_category(key, -1)
+            for key in set(keys) - set(previous):
+                self._count_category(key, 1)
+
+    def remove_product(self, product_id: int) -> bool:
+        """
+        Remove a product from the index.
+
+        :param product_id: ID of the product to remove
+        :return: Whether the product was indexed
+        """
+        with self._lock:
+            for key in self._product_categories.pop(product_id, ()):
+                self._count_category(key, -1)
+            return self._products.remove(product_id)
+
+    def record_view(self, product_id: int) -> None:
+        """
+        Count a view of a product's detail page towards its popularity.
+        """
+        with self._lock:
+            views = self._views[product_id] = self._views.get(product_id, 0) + 1
+            self._products.set_score(product_id, views)
+
+    def suggest(self, prefix: str, limit: int = 8) -> Dict[str, List[Dict]]:
+        """
+        Suggest products and categories whose name has a word starting with the prefix.
+
+        :param prefix: Text typed so far
+        :param limit: Maximum number of suggestions per kind, at most ``MAX_SUGGESTIONS``
+        :return: Dictionary with ``products`` (id, name) and ``categories`` (name, product_count) lists
+        """
+        normalized = normalize_prefix(prefix)
+        if not normalized:
+            return {"products": [], "categories": []}
+        limit = min(limit, MAX_SUGGESTIONS)
+        with self._lock:
+            products = self._products.top(normalized, limit)
+            categories = self._categories.top(normalized, limit)
+            return {
+                "products": [{"id": entry.id, "name": entry.label} for entry in products],
+                "categories": [{"name": entry.label, "product_count": entry.score} for entry in categories],
+            }
+
+    @staticmethod
+    def _category_keys(product: Dict, labels: Dict[str, str]) -> Tuple[str, ...]:
+        keys = []
+        for name in product.get("categories") or ():
+            key = " ".join(tokenize(name))
+            if key and key not in keys:
+                labels.setdefault(key, name)
+                keys.append(key)
+        return tuple(keys)
+
+    def _count_category(self, key: str, delta: int) -> None:
+        count = self._category_counts.get(key, 0) + delta
+        if count > 0:
+            self._category_counts[key] = count
+            self._categories.put(key, self._category_labels[key], count)
+        else:
+            self._category_counts.pop(key, None)
+            self._categories.remove(key)
+
+
+# Shared index instance used by the products blueprint.
+product_autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,238 @@
+"""
+Module for bulk product imports.
+Parses streamed NDJSON or CSV catalog files and inserts valid rows in
+bounded, set-validated batches.
+"""
+
+import csv
+import io
+import json
+import logging
+import math
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.common.extensions import db
+from app.common.models import Product
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+CSV_BOOLEANS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+class BulkImportError(Exception):
+    """
+    Raised when an import body cannot be read at all.
+    """
+    pass
+
+
+def validate_product_payload(data: Dict) -> Optional[str]:
+    """
+    Validate the fields of a new product.
+
+    :param data: Product fields as submitted by the client
+    :return: An error message, or None if the payload is valid
+    """
+    if not data.get('name'):
+        return "Product name is required"
+    if not isinstance(data['name'], str):
+        return "Product name must be a string"
+    if not data.get('description'):
+        return "Product description is required"
+    if not isinstance(data['description'], str):
+        return "Product description must be a string"
+    price = data.get('price')
+    if price is None:
+        return "Product price is required"
+    if isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price):
+        return "Product price must be a number"
+    if price < 0:
+        return "Product price must be a positive number"
+    if not isinstance(data.get('in_stock', True), bool):
+        return "Product in_stock must be a boolean"
+    return None
+
+
+def iter_records(stream, content_type: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Lazily parse an import body.
+
+    :param stream: Binary file-like object with the request body
+    :param content_type: MIME type of the body (NDJSON or CSV)
+    :return: Iterator of (row number, record or None, parse error or None); it raises
+        BulkImportError if the rest of the body cannot be read
+    :raises BulkImportError: If the content type is not supported
+    """
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in NDJSON_CONTENT_TYPES:
+        return _iter_ndjson(stream)
+    if mimetype in CSV_CONTENT_TYPES:
+        return _iter_csv(stream)
+    raise BulkImportError(f"Unsupported content type: {content_type!r}")
+
+
+def _iter_ndjson(stream):
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Row must be a JSON object"
+            continue
+        yield row_number, record, None
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+    row_number = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise BulkImportError(f"Unreadable CSV after row {row_number}: {e}") from e
+        row_number += 1
+        record = {key: value for key, value in row.items() if key is not None}
+        price = record.get('price')
+        if price not in (None, ""):
+            try:
+                record['price'] = float(price)
+            except ValueError:
+                yield row_number, None, "Product price must be a number"
+                continue
+        else:
+            record['price'] = None
+        in_stock = (record.get('in_stock') or "").strip().lower()
+        if in_stock in CSV_BOOLEANS:
+            record['in_stock'] = CSV_BOOLEANS[in_stock]
+        elif in_stock:
+            yield row_number, None, "Product in_stock must be a boolean"
+            continue
+        else:
+            record.pop('in_stock', None)
+        yield row_number, record, None
+
+
+class ProductImporter:
+    """
+    Imports products in batches, each validated and committed as one transaction.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 on_inserted: Optional[Callable[[List[Dict]], None]] = None):
+        """
+        :param batch_size: Number of valid rows per insert transaction
+        :param on_inserted: Called with the product dictionaries of each committed batch
+        """
+        self.batch_size = batch_size
+        self.on_inserted = on_inserted
+
+    def run(self, records: Iterable[Tuple[int, Optional[Dict], Optional[str]]]) -> Dict:
+        """
+        Validate and insert parsed records.
+
+        :param records: Iterator produced by ``iter_records``
+        :return: Report with counts and a per-row error list, and an ``error``
+            message if the body became unreadable; rows before that point are imported
+        """
+        report = {"processed": 0, "inserted": 0, "failed": 0}
+        errors = list(self.iter_run(records, report))
+        report["errors"] = sorted(errors, key=lambda entry: entry["row"])
+        return report
+
+    def iter_run(self, records: Iterable[Tuple[int, Optional[Dict], Optional[str]]],
+                 report: Dict) -> Iterator[Dict]:
+        """
+        Validate and insert parsed records, yielding each row error as soon as it is known.
+
+        :param records: Iterator produced by ``iter_records``
+        :param report: Dictionary whose processed, inserted and failed counts are updated as the import
+            runs; an ``error`` message is added if the body becomes unreadable
+        :return: Iterator of row error entries
+        """
+        seen_names = set()
+        batch: List[Tuple[int, Dict]] = []
+
+        records = iter(records)
+        while True:
+            try:
+                row_number, record, error = next(records)
+            except StopIteration:
+                break
+            except BulkImportError as e:
+                logger.warning("Bulk import stopped: %s", str(e))
+                report["error"] = str(e)
+                break
+            report["processed"] += 1
+            if error is None:
+                error = validate_product_payload(record)
+            if error is None and record['name'] in seen_names:
+                error = "Duplicate product name in import"
+            if error is not None:
+                yield self._fail(report, row_number, error)
+                continue
+
+            seen_names.add(record['name'])
+            batch.append((row_number, {
+                "name": record['name'],
+                "description": record['description'],
+                "price": record['price'],
+                "in_stock": record.get('in_stock', True),
+            }))
+            if len(batch) >= self.batch_size:
+                yield from self._insert_batch(batch, report)
+                batch = []
+
+        if batch:
+            yield from self._insert_batch(batch, report)
+
+    @staticmethod
+    def _fail(report: Dict, row_number: int, error: str) -> Dict:
+        report["failed"] += 1
+        return {"row": row_number, "error": error}
+
+    def _insert_batch(self, batch: List[Tuple[int, Dict]], report: Dict) -> Iterator[Dict]:
+        names = [row["name"] for _, row in batch]
+        existing = set()
+        failures = []
+        try:
+            existing = set(db.session.scalars(select(Product.name).where(Product.name.in_(names))))
+            rows = []
+            for row_number, row in batch:
+                if row["name"] in existing:
+                    failures.append(self._fail(report, row_number, "Product name must be unique"))
+                else:
+                    rows.append(row)
+            if rows:
+                db.session.execute(insert(Product), rows)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Bulk import batch failed: %s", str(e))
+            for row_number, row in batch:
+                if row["name"] not in existing:
+                    failures.append(self._fail(report, row_number, "Database error while inserting batch"))
+            yield from failures
+            return
+
+        yield from failures
+        report["inserted"] += len(rows)
+        if rows and self.on_inserted is not None:
+            inserted_names = [row["name"] for row in rows]
+            products = Product.query.filter(Product.name.in_(inserted_names)).all()
+            self.on_inserted([product.to_dict() for product in products])
@@ -3,18 +3,24 @@ Module for Product Categorization functionality.
 Enables assigning and managing product categories.
 """
 
+import asyncio
 import logging
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ASSIGNMENT_BATCH_SIZE = 500
+
 class ProductCategorizationService:
     """
     Service for categorizing products.
     """
 
-    def __init__(self, category_repository):
+    def __init__(self, category_repository, async_category_repository=None):
         self.category_repository = category_repository
+        self.async_category_repository = async_category_repository
 
     def assign_categories_to_product(self, product_id: int, category_ids: List[int]) -> bool:
         """
@@ -34,6 +40,48 @@ class ProductCategorizationService:
             logger.error("Failed to assign categories: %s", str(e))
             raise ProductCategorizationError("An error occurred during category assignment.")
 
+    def assign_categories_bulk(self, assignments: Iterable[Tuple[int, List[int]]],
+                               batch_size: int = DEFAULT_ASSIGNMENT_BATCH_SIZE) -> Dict:
+        """
+        Set the categories of many products, replacing their current assignments.
+
+        Each batch of products is diffed against its current assignments and
+        applied in a single transaction; a failed batch does not affect the others.
+
+        :param assignments: (product ID, category IDs) pairs; a product listed twice keeps only
+            its last entry and gets one result
+        :param batch_size: Number of products per transaction
+        :return: Counts of updated, unchanged and failed products and a per-product result list
+        """
+        targets: Dict[int, set] = {}
+        rejected: Dict[int, Dict] = {}
+        report = {"updated": 0, "unchanged": 0, "failed": 0, "results": []}
+        for product_id, category_ids in assignments:
+            if not category_ids:
+                targets.pop(product_id, None)
+                rejected[product_id] = {"product_id": product_id, "status": "error",
+                                        "error": "Product must belong to at least one category."}
+                continue
+            rejected.pop(product_id, None)
+            targets[product_id] = set(category_ids)
+        report["results"].extend(rejected.values())
+
+        product_ids = list(targets)
+        for start in range(0, len(product_ids), batch_size):
+            batch = {product_id: targets[product_id] for product_id in product_ids[start:start + batch_size]}
+            try:
+                outcomes = self.category_repository.replace_assignments(batch)
+            except SQLAlchemyError as e:
+                logger.error("Failed to assign categories for %d products: %s", len(batch), str(e))
+                outcomes = {product_id: {"status": "error", "error": "An error occurred during category assignment."}
+                            for product_id in batch}
+            for product_id, outcome in outcomes.items():
+                report["results"].append({"product_id": product_id, **outcome})
+
+        for result in report["results"]:
+            report["failed" if result["status"] == "error" else result["status"]] += 1
+        return report
+
     def create_category(self, name: str, parent_category_id: int = None) -> int:
         """
         Create a new product category.
@@ -48,6 +96,67 @@ class ProductCategorizationService:
             logger.error("Failed to create category: %s", str(e))
             raise ProductCategorizationError("An error occurred during category creation.")
 
+    def list_products_in_subtree(self, category_id: int, limit: int = 20,
+                                 after_id: Optional[int] = None) -> List[Dict]:
+        """
+        List products in a category or any of its descendant categories.
+
+        :param category_id: ID of the category at the root of the subtree
+        :param limit: Maximum number of products to return
+        :param after_id: Only return products with an ID greater than this one
+        :return: List of products ordered by ID
+        """
+        try:
+            return self.category_repository.find_products_in_subtree(category_id, limit, after_id=after_id)
+        except Exception as e:
+            logger.error("Failed to list products for category %s: %s", category_id, str(e))
+            raise ProductCategorizationError("An error occurred while listing category products.")
+
+    def get_breadcrumb(self, category_id: int) -> List[Dict]:
+        """
+        Get the path of categories from the root of the tree to a category.
+
+        :param category_id: ID of the category
+        :return: List of categories, root first; empty if the category does not exist
+        """
+        try:
+            return self.category_repository.find_breadcrumb(category_id)
+        except Exception as e:
+            logger.error("Failed to build breadcrumb for category %s: %s", category_id, str(e))
+            raise ProductCategorizationError("An error occurred while building the category path.")
+
+    async def list_products_in_subtree_async(self, category_id: int, limit: int = 20,
+                                             after_id: Optional[int] = None) -> List[Dict]:
+        """
+        Async variant of ``list_products_in_subtree``.
+
+        Uses the async repository when the app has an async engine, and runs
+        the sync query in a worker thread otherwise.
+        """
+        if not self._async_available():
+            return await asyncio.to_thread(self.list_products_in_subtree, category_id, limit, after_id)
+        try:
+            return await self.async_category_repository.find_products_in_subtree(category_id, limit,
+                                                                                 after_id=after_id)
+        except Exception as e:
+            logger.error("Failed to list products for category %s: %s", category_id, str(e))
+            raise ProductCategorizationError("An error occurred while listing category products.")
+
+    async def get_breadcrumb_async(self, category_id: int) -> List[Dict]:
+        """
+        Async variant of ``get_breadcrumb``.
+        """
+        if not self._async_available():
+            return await asyncio.to_thread(self.get_breadcrumb, category_id)
+        try:
+            return await self.async_category_repository.find_breadcrumb(category_id)
+        except Exception as e:
+            logger.error("Failed to build breadcrumb for category %s: %s", category_id, str(e))
+            raise ProductCategorizationError("An error occurred while building the category path.")
+
+    def _async_available(self) -> bool:
+        return self.async_category_repository is not None and self.async_category_repository.available
+
 class ProductCategorizationError(Exception):
     """
     Custom exception for product categorization errors.
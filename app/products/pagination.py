@@ -0,0 +1,148 @@
+"""
+Module for search pagination helpers.
+Provides opaque continuation tokens for keyset pagination and a small cache
+of per-query result counts.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a continuation token cannot be decoded.
+    """
+    pass
+
+
+def cursor_scope(*parts: Hashable) -> str:
+    """
+    Fingerprint of the request a cursor belongs to, e.g. its query and page size.
+
+    :param parts: JSON-serializable values identifying the request
+    :return: Short hexadecimal digest
+    """
+    encoded = json.dumps(list(parts), separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=6).hexdigest()
+
+
+def encode_cursor(position: Dict[str, Any], scope: Optional[str] = None) -> str:
+    """
+    Encode a keyset position into an opaque, URL-safe continuation token.
+
+    :param position: JSON-serializable values identifying the last returned row
+    :param scope: ``cursor_scope`` of the request; the token is then only accepted for the same scope
+    :return: Continuation token
+    """
+    payload = {"v": CURSOR_VERSION, **position}
+    if scope is not None:
+        payload["k"] = scope
+    payload = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, scope: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decode a continuation token produced by ``encode_cursor``.
+
+    Every position has an integer ``pos`` and ``id``, and optionally a numeric score ``s``.
+
+    :param token: Continuation token supplied by the client
+    :param scope: ``cursor_scope`` of the current request; must match the one the token was issued for
+    :return: The keyset position stored in the token
+    :raises InvalidCursorError: If the token is malformed, from an unknown version or for another request
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError("Malformed pagination cursor.") from e
+
+    if not isinstance(position, dict) or position.pop("v", None) != CURSOR_VERSION:
+        raise InvalidCursorError("Unsupported pagination cursor.")
+    if position.pop("k", None) != scope:
+        raise InvalidCursorError("Pagination cursor belongs to a different query or page size.")
+    if not _is_int(position.get("pos")) or position["pos"] < 0 or not _is_int(position.get("id")):
+        raise InvalidCursorError("Malformed pagination cursor.")
+    if "s" in position and not (_is_number(position["s"]) and math.isfinite(position["s"])):
+        raise InvalidCursorError("Malformed pagination cursor.")
+    return position
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query for use as a cache key.
+    """
+    return " ".join(query.lower().split())
+
+
+def total_pages(total_count: int, per_page: int) -> int:
+    """
+    Number of pages needed to show ``total_count`` items.
+    """
+    return (total_count // per_page) + (1 if total_count % per_page > 0 else 0)
+
+
+class CountCache:
+    """
+    Thread-safe LRU cache of result counts keyed by normalized query, with a TTL.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[int]:
+        """
+        Return the cached count for a query, or None if missing or expired.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            count, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return count
+
+    def set(self, query: str, count: int) -> None:
+        """
+        Cache the result count for a query.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (count, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop every cached count, e.g. after catalog writes.
+        """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,213 @@
+"""
+Module for caching search results.
+Holds complete search responses keyed by normalized query and page, retired
+all at once when the catalog generation changes and individually after a
+time to live.
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.products.pagination import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def search_cache_key(query: str, page: Optional[int], per_page: int, cursor: Optional[str] = None,
+                     filters: Optional[Dict[str, Any]] = None, ignore_term_order: bool = False,
+                     scope: Hashable = None) -> Tuple:
+    """
+    Build the cache key of a search request.
+
+    Queries are compared case-insensitively with whitespace collapsed.
+
+    :param query: Search term entered by the user
+    :param page: Page number, or None when the page is given by ``cursor``
+    :param per_page: Number of items per page
+    :param cursor: Continuation token of the request, if any
+    :param filters: Filters applied to the search, if any
+    :param ignore_term_order: Also treat queries with the same terms in any order
+        as equal; only valid when the backend does not depend on term order
+    :param scope: Distinguishes backends whose results differ for the same request
+    :return: Hashable key
+    """
+    normalized = normalize_query(query)
+    if ignore_term_order:
+        normalized = " ".join(sorted(normalized.split()))
+    return (scope, normalized, page if cursor is None else None, per_page, cursor,
+            tuple(sorted((filters or {}).items())))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value, in bytes, counting shared objects once.
+    """
+    seen = set()
+    size = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+    return size
+
+
+class _Flight:
+    """
+    A computation in progress that concurrent misses for the same key wait on.
+    """
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU of search results bounded by estimated memory use.
+
+    Entries are only valid for the catalog generation they were computed
+    in. When ``generation()`` returns a new value the whole cache is
+    dropped, so catalog writes need no per-key invalidation. The generation
+    only sees this process's writes, so entries also expire after
+    ``ttl_seconds`` to bound staleness across worker processes. Concurrent
+    misses for the same key are coalesced: one caller runs the search and
+    the others wait for its result.
+
+    Cached values are shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, generation: Optional[Callable[[], Hashable]] = None,
+                 ttl_seconds: float = 30.0, clock=time.monotonic):
+        """
+        :param max_bytes: Estimated memory the cached values may use
+        :param generation: Returns the current catalog generation; entries only expire by age if None
+        :param ttl_seconds: Seconds after which a cached result is recomputed
+        :param clock: Monotonic time source, injectable for tests
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._generation = generation or (lambda: 0)
+        # Values with their estimated size and expiry time.
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[Hashable, Hashable], _Flight] = {}
+        self._current_generation = None
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for a key, computing it on a miss.
+
+        If another caller is already computing the same key, wait for its
+        result instead; its exception, if any, is raised here too.
+
+        :param key: Cache key, e.g. from ``search_cache_key``
+        :param compute: Produces the value on a miss
+        :return: The cached or computed value
+        """
+        generation = self._generation()
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < self._clock():
+                self._drop(key)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[0]
+            flight = self._in_flight.get((generation, key))
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[(generation, key)] = _Flight()
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            # A result computed across a catalog write may be stale, so it is not kept.
+            keep = flight.error is None and generation == self._generation()
+            size = estimate_size(flight.value) if keep else 0
+            with self._lock:
+                del self._in_flight[(generation, key)]
+                if keep and generation == self._current_generation:
+                    self._store(key, flight.value, size)
+            flight.done.set()
+        return flight.value
+
+    def _sync_generation(self, generation: Hashable) -> None:
+        if generation != self._current_generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._current_generation = generation
+
+    def _store(self, key: Hashable, value: Any, size: int) -> None:
+        if size > self.max_bytes // 4:
+            return
+        self._drop(key)
+        self._entries[key] = (value, size, self._clock() + self.ttl_seconds)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self) -> None:
+        """
+        Drop every cached result.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness.
+
+        :return: Counts of hits, misses (searches run), coalesced lookups
+            (waited for a concurrent search), evictions and expirations, the number of
+            entries and estimated bytes held, and ``hit_rate``: the share of
+            lookups that did not run a search
+        """
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._entries), bytes=self._bytes,
+                         max_bytes=self.max_bytes)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        return stats
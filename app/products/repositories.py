@@ -0,0 +1,420 @@
+"""
+Module for product data access.
+Provides SQLAlchemy-backed repositories used by the product services.
+"""
+
+import logging
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, literal, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.common.database import async_session, has_async_engine, read_session
+from app.common.extensions import db
+from app.common.models import Category, CategoryClosure, Product, ProductCategory
+
+logger = logging.getLogger(__name__)
+
+
+def _escape_like(text: str) -> str:
+    """
+    Escape LIKE wildcards so the text is matched literally with ``escape="\\"``.
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class ProductRepository:
+    """
+    Repository for querying products from the database.
+
+    All queries are read-only and go through ``read_session()``.
+    """
+
+    @staticmethod
+    def _matching(query: str):
+        pattern = f"%{_escape_like(query)}%"
+        return or_(Product.name.ilike(pattern, escape="\\"), Product.description.ilike(pattern, escape="\\"))
+
+    def search_page(self, query: str, limit: int, after_id: Optional[int] = None,
+                    offset: int = 0, with_count: bool = True) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Fetch one page of matching products ordered by ID.
+
+        The number of matches is computed with a window function in the same
+        statement, so no separate count query is issued.
+
+        :param query: Search term entered by the user
+        :param limit: Maximum number of products to return
+        :param after_id: Keyset position; only products with a greater ID are returned
+        :param offset: Number of rows to skip, for page-number pagination
+        :param with_count: Whether to compute the number of matches
+        :return: Tuple of (products, number of matches after ``after_id`` or None if not requested)
+        """
+        criteria = [self._matching(query)]
+        if after_id is not None:
+            criteria.append(Product.id > after_id)
+
+        if not with_count:
+            products = (read_session().query(Product).filter(*criteria).order_by(Product.id)
+                        .offset(offset).limit(limit).all())
+            return [product.to_dict() for product in products], None
+
+        rows = (read_session().query(Product, func.count().over().label("match_count"))
+                .filter(*criteria).order_by(Product.id).offset(offset).limit(limit).all())
+        if rows:
+            return [product.to_dict() for product, _ in rows], rows[0].match_count
+        if offset:
+            # The page is past the end, so the window produced no row to read the count from.
+            return [], read_session().query(Product).filter(*criteria).count()
+        return [], 0
+
+    def find_by_query(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], int]:
+        """
+        Find products whose name or description contains the query.
+
+        :param query: Search term entered by the user
+        :param page: Page number for pagination
+        :param per_page: Number of items per page
+        :return: Tuple of (products for the page, total number of matches)
+        """
+        return self.search_page(query, per_page, offset=(page - 1) * per_page)
+
+    def find_by_name_prefix(self, prefix: str, limit: int) -> List[Dict]:
+        """
+        Find products whose name starts with a prefix, ordered by name.
+
+        :param prefix: Start of the product name, matched case-insensitively
+        :param limit: Maximum number of products to return
+        :return: List of product dictionaries
+        """
+        products = (read_session().query(Product)
+                    .filter(Product.name.ilike(f"{_escape_like(prefix)}%", escape="\\"))
+                    .order_by(Product.name).limit(limit).all())
+        return [product.to_dict() for product in products]
+
+    def find_by_id(self, product_id: int) -> Optional[Tuple[Dict, int]]:
+        """
+        Load a single product.
+
+        :param product_id: ID of the product
+        :return: Tuple of (product dictionary, row version), or None if not found
+        """
+        product = read_session().get(Product, product_id)
+        if product is None:
+            return None
+        return product.to_dict(), product.version
+
+    def list_page(self, limit: int, after_id: Optional[int] = None) -> List[Dict]:
+        """
+        List products in ID order.
+
+        :param limit: Maximum number of products to return
+        :param after_id: Keyset position; only products with a greater ID are returned
+        :return: List of product dictionaries
+        """
+        products = read_session().query(Product)
+        if after_id is not None:
+            products = products.filter(Product.id > after_id)
+        return [product.to_dict() for product in products.order_by(Product.id).limit(limit).all()]
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Iterate over every product in ID order, loading one keyset batch at a time.
+
+        :param batch_size: Number of products loaded per query
+        :return: Iterator of product dictionaries
+        """
+        after_id = None
+        while True:
+            batch = self.list_page(batch_size, after_id=after_id)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1]["id"]
+
+    def find_all(self) -> List[Dict]:
+        """
+        Load every product in the catalog, including the names of its categories.
+
+        :return: List of product dictionaries
+        """
+        return self._with_category_names(read_session().query(Product).order_by(Product.id).all())
+
+    def find_for_index(self, product_ids: List[int]) -> List[Dict]:
+        """
+        Load the given products, including the names of their categories.
+
+        :param product_ids: IDs of the products to load
+        :return: List of product dictionaries; unknown IDs are omitted
+        """
+        products = read_session().query(Product).filter(Product.id.in_(product_ids)).order_by(Product.id).all()
+        return self._with_category_names(products, product_ids)
+
+    @staticmethod
+    def _with_category_names(products: List[Product], product_ids: Optional[List[int]] = None) -> List[Dict]:
+        category_names: Dict[int, List[str]] = {}
+        assignments = (read_session().query(ProductCategory.product_id, Category.name)
+                       .join(Category, Category.id == ProductCategory.category_id))
+        if product_ids is not None:
+            assignments = assignments.filter(ProductCategory.product_id.in_(product_ids))
+        for product_id, name in assignments:
+            category_names.setdefault(product_id, []).append(name)
+
+        payloads = []
+        for product in products:
+            payload = product.to_dict()
+            if product.id in category_names:
+                payload["categories"] = category_names[product.id]
+            payloads.append(payload)
+        return payloads
+
+
+class CategoryRepository:
+    """
+    Repository for the category tree and product category assignments.
+
+    The tree is mirrored in a closure table so that subtree and ancestor
+    lookups are single indexed queries regardless of depth.
+    """
+
+    def create(self, name: str, parent_id: Optional[int] = None) -> int:
+        """
+        Create a category and its closure rows.
+
+        :param name: Name of the category
+        :param parent_id: Optional parent category ID
+        :return: ID of the new category
+        :raises ValueError: If the parent category does not exist
+        """
+        if parent_id is not None and db.session.get(Category, parent_id) is None:
+            raise ValueError(f"Parent category {parent_id} does not exist.")
+
+        category = Category(name=name, parent_id=parent_id)
+        db.session.add(category)
+        db.session.flush()
+
+        # The new category is its own ancestor at depth 0, and a descendant of
+        # every ancestor of its parent one level deeper.
+        db.session.add(CategoryClosure(ancestor_id=category.id, descendant_id=category.id, depth=0))
+        if parent_id is not None:
+            db.session.execute(insert(CategoryClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(CategoryClosure.ancestor_id, literal(category.id), CategoryClosure.depth + 1)
+                .where(CategoryClosure.descendant_id == parent_id)
+            ))
+        db.session.commit()
+        return category.id
+
+    def attach_categories(self, product_id: int, category_ids: List[int]) -> None:
+        """
+        Assign categories to a product, ignoring ones it already has.
+
+        :param product_id: ID of the product
+        :param category_ids: IDs of the categories to assign
+        :raises ValueError: If any of the categories does not exist
+        """
+        requested = set(category_ids)
+        known = set(db.session.scalars(select(Category.id).where(Category.id.in_(requested))))
+        if known != requested:
+            raise ValueError(f"Unknown category IDs: {sorted(requested - known)}")
+
+        existing = set(db.session.scalars(
+            select(ProductCategory.category_id).where(ProductCategory.product_id == product_id)
+        ))
+        new_ids = sorted(requested - existing)
+        if new_ids:
+            db.session.execute(insert(ProductCategory), [
+                {"product_id": product_id, "category_id": category_id} for category_id in new_ids
+            ])
+        db.session.commit()
+
+    def replace_assignments(self, assignments: Dict[int, Set[int]]) -> Dict[int, Dict]:
+        """
+        Make each product's categories exactly the given set, in one transaction.
+
+        Current assignments are loaded with one query and only the missing rows
+        are inserted and the surplus rows deleted. Products that do not exist or
+        that reference unknown categories are skipped and reported.
+
+        :param assignments: Target category IDs by product ID
+        :return: Outcome by product ID: status ``updated``, ``unchanged`` or
+            ``error``, with the added and removed category IDs or the error
+        :raises SQLAlchemyError: If the transaction fails; nothing is applied
+        """
+        # The reads share the transaction, so a failure anywhere leaves the session rolled back.
+        try:
+            product_ids = list(assignments)
+            category_ids = set().union(*assignments.values()) if assignments else set()
+            known_products = set(db.session.scalars(select(Product.id).where(Product.id.in_(product_ids))))
+            known_categories = set(db.session.scalars(select(Category.id).where(Category.id.in_(category_ids))))
+
+            current: Dict[int, Set[int]] = {}
+            rows = db.session.execute(select(ProductCategory.product_id, ProductCategory.category_id)
+                                      .where(ProductCategory.product_id.in_(known_products)))
+            for product_id, category_id in rows:
+                current.setdefault(product_id, set()).add(category_id)
+
+            outcomes: Dict[int, Dict] = {}
+            inserts, deletes = [], []
+            for product_id, target in assignments.items():
+                if product_id not in known_products:
+                    outcomes[product_id] = {"status": "error", "error": "Product not found"}
+                    continue
+                unknown = target - known_categories
+                if unknown:
+                    outcomes[product_id] = {"status": "error", "error": f"Unknown category IDs: {sorted(unknown)}"}
+                    continue
+                existing = current.get(product_id, set())
+                added, removed = sorted(target - existing), sorted(existing - target)
+                inserts.extend({"product_id": product_id, "category_id": category_id} for category_id in added)
+                deletes.extend({"p": product_id, "c": category_id} for category_id in removed)
+                outcomes[product_id] = {"status": "updated" if added or removed else "unchanged",
+                                        "added": added, "removed": removed}
+
+            if inserts:
+                db.session.execute(insert(ProductCategory), inserts)
+            if deletes:
+                table = ProductCategory.__table__
+                db.session.connection().execute(
+                    delete(table).where(table.c.product_id == bindparam("p"), table.c.category_id == bindparam("c")),
+                    deletes)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        return outcomes
+
+    def find_products_in_subtree(self, category_id: int, limit: int,
+                                 after_id: Optional[int] = None) -> List[Dict]:
+        """
+        List products assigned to a category or any of its descendants.
+
+        :param category_id: ID of the subtree root
+        :param limit: Maximum number of products to return
+        :param after_id: Keyset position; only products with a greater ID are returned
+        :return: List of product dictionaries ordered by ID
+        """
+        in_subtree = (select(ProductCategory.product_id)
+                      .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategory.category_id)
+                      .where(CategoryClosure.ancestor_id == category_id))
+        products = read_session().query(Product).filter(Product.id.in_(in_subtree))
+        if after_id is not None:
+            products = products.filter(Product.id > after_id)
+        return [product.to_dict() for product in products.order_by(Product.id).limit(limit).all()]
+
+    def find_breadcrumb(self, category_id: int) -> List[Dict]:
+        """
+        Return the path from the root of the tree down to a category.
+
+        :param category_id: ID of the category
+        :return: List of category dictionaries, root first
+        """
+        path = (read_session().query(Category)
+                .join(CategoryClosure, CategoryClosure.ancestor_id == Category.id)
+                .filter(CategoryClosure.descendant_id == category_id)
+                .order_by(CategoryClosure.depth.desc()))
+        return [category.to_dict() for category in path]
+
+
+class AsyncProductRepository:
+    """
+    Async counterpart of the read paths of ``ProductRepository``.
+
+    Queries run on the app's async engine through ``async_session()``, so
+    callers on an event loop do not block while SQLite works.
+    """
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the current app has an async engine to query.
+        """
+        return has_async_engine()
+
+    async def search_page(self, query: str, limit: int, after_id: Optional[int] = None,
+                          offset: int = 0, with_count: bool = True) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Fetch one page of matching products ordered by ID; see ``ProductRepository.search_page``.
+
+        :return: Tuple of (products, number of matches after ``after_id`` or None if not requested)
+        """
+        criteria = [ProductRepository._matching(query)]
+        if after_id is not None:
+            criteria.append(Product.id > after_id)
+
+        async with async_session() as session:
+            if not with_count:
+                products = await session.scalars(select(Product).where(*criteria).order_by(Product.id)
+                                                 .offset(offset).limit(limit))
+                return [product.to_dict() for product in products], None
+
+            rows = (await session.execute(
+                select(Product, func.count().over().label("match_count"))
+                .where(*criteria).order_by(Product.id).offset(offset).limit(limit))).all()
+            if rows:
+                return [product.to_dict() for product, _ in rows], rows[0].match_count
+            if offset:
+                count = await session.scalar(select(func.count()).select_from(Product).where(*criteria))
+                return [], count
+            return [], 0
+
+    async def find_by_id(self, product_id: int) -> Optional[Tuple[Dict, int]]:
+        """
+        Load a single product.
+
+        :param product_id: ID of the product
+        :return: Tuple of (product dictionary, row version), or None if not found
+        """
+        async with async_session() as session:
+            product = await session.get(Product, product_id)
+        if product is None:
+            return None
+        return product.to_dict(), product.version
+
+
+class AsyncCategoryRepository:
+    """
+    Async counterpart of the read paths of ``CategoryRepository``.
+    """
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the current app has an async engine to query.
+        """
+        return has_async_engine()
+
+    async def find_products_in_subtree(self, category_id: int, limit: int,
+                                       after_id: Optional[int] = None) -> List[Dict]:
+        """
+        List products assigned to a category or any of its descendants.
+
+        :param category_id: ID of the subtree root
+        :param limit: Maximum number of products to return
+        :param after_id: Keyset position; only products with a greater ID are returned
+        :return: List of product dictionaries ordered by ID
+        """
+        in_subtree = (select(ProductCategory.product_id)
+                      .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategory.category_id)
+                      .where(CategoryClosure.ancestor_id == category_id))
+        statement = select(Product).where(Product.id.in_(in_subtree))
+        if after_id is not None:
+            statement = statement.where(Product.id > after_id)
+        async with async_session() as session:
+            products = await session.scalars(statement.order_by(Product.id).limit(limit))
+            return [product.to_dict() for product in products]
+
+    async def find_breadcrumb(self, category_id: int) -> List[Dict]:
+        """
+        Return the path from the root of the tree down to a category.
+
+        :param category_id: ID of the category
+        :return: List of category dictionaries, root first
+        """
+        statement = (select(Category)
+                     .join(CategoryClosure, CategoryClosure.ancestor_id == Category.id)
+                     .where(CategoryClosure.descendant_id == category_id)
+                     .order_by(CategoryClosure.depth.desc()))
+        async with async_session() as session:
+            categories = await session.scalars(statement)
+            return [category.to_dict() for category in categories]
@@ -0,0 +1,139 @@
+"""
+Module for caching serialized product representations.
+Holds pre-encoded JSON bodies with strong ETags so product reads can be
+served, or answered with 304 Not Modified, without touching the database.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.common.json_provider import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class CachedRepresentation:
+    """
+    A serialized response body and its strong ETag.
+    """
+
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+def serialize(payload: Any) -> bytes:
+    """
+    Encode a payload as compact, key-sorted JSON so equal payloads give equal bytes.
+    """
+    return dumps_bytes(payload, sort_keys=True)
+
+
+class ProductRepresentationCache:
+    """
+    Thread-safe LRU of product detail and listing representations.
+
+    Product entries are keyed by product ID and tagged with the row version.
+    Listing entries belong to a generation that is advanced on every catalog
+    write, which retires all cached listings at once. Entries also expire
+    after ``ttl_seconds`` to bound staleness across worker processes.
+    """
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 30.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CachedRepresentation]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable) -> Optional[CachedRepresentation]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: Hashable, body: bytes, etag: str) -> CachedRepresentation:
+        entry = CachedRepresentation(body, etag, self._clock() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_product(self, product_id: int) -> Optional[CachedRepresentation]:
+        """
+        Return the cached representation of a product, if any.
+        """
+        return self._get(("product", product_id))
+
+    def put_product(self, product: Dict, version: int) -> CachedRepresentation:
+        """
+        Serialize and cache a product.
+
+        :param product: Product dictionary
+        :param version: Row version of the product
+        :return: The cached representation
+        """
+        body = serialize(product)
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        return self._put(("product", product["id"]), body, f"p{product['id']}-v{version}-{digest}")
+
+    def invalidate_product(self, product_id: int) -> None:
+        """
+        Drop the cached representation of a product.
+        """
+        with self._lock:
+            self._entries.pop(("product", product_id), None)
+
+    @property
+    def generation(self) -> int:
+        """
+        Current catalog generation; read it before querying a listing to cache.
+        """
+        return self._generation
+
+    def get_listing(self, key: Hashable) -> Optional[CachedRepresentation]:
+        """
+        Return a cached listing page for the current catalog generation, if any.
+        """
+        return self._get(("listing", self._generation, key))
+
+    def put_listing(self, key: Hashable, payload: Any, generation: int) -> CachedRepresentation:
+        """
+        Serialize and cache a listing page.
+
+        :param key: Identifies the page, e.g. (cursor, per_page)
+        :param payload: Listing response payload
+        :param generation: Generation read before the listing was queried, so a
+            page raced by a concurrent write is filed under the retired generation
+        :return: The cached representation
+        """
+        body = serialize(payload)
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        return self._put(("listing", generation, key), body, f"l-{digest}")
+
+    def bump_generation(self) -> None:
+        """
+        Retire every cached listing after a catalog write.
+        """
+        with self._lock:
+            # Old-generation entries are never looked up again and age out of the LRU.
+            self._generation += 1
+
+
+# Shared cache used by the products blueprint.
+product_representation_cache = ProductRepresentationCache()
@@ -3,43 +3,229 @@ Module for Product Search functionality.
 Provides services for querying products based on user input.
 """
 
+import asyncio
 import logging
 from typing import List, Dict, Optional
 
+from app.products.pagination import cursor_scope, decode_cursor, encode_cursor, normalize_query, total_pages
+from app.products.query_cache import search_cache_key
+
 logger = logging.getLogger(__name__)
 
+def search_cursor_scope(query: str, per_page: int) -> str:
+    """
+    Scope search cursors are bound to: the query's terms, in any order, and the page size.
+    """
+    return cursor_scope("search", sorted(normalize_query(query).split()), per_page)
+
 class ProductSearchService:
     """
     Service for searching products in the catalog.
     """
 
-    def __init__(self, product_repository):
+    def __init__(self, product_repository, search_index=None, count_cache=None, autocomplete_index=None,
+                 trigram_index=None, fuzzy_min_results: int = 1, result_cache=None,
+                 async_product_repository=None):
         self.product_repository = product_repository
+        self.search_index = search_index
+        self.count_cache = count_cache
+        self.autocomplete_index = autocomplete_index
+        self.trigram_index = trigram_index
+        self.fuzzy_min_results = fuzzy_min_results
+        self.result_cache = result_cache
+        self.async_product_repository = async_product_repository
 
-    def search_products(self, query: str, page: int = 1, per_page: int = 10) -> Dict[str, Optional[List[Dict]]]:
+    def search_products(self, query: str, page: int = 1, per_page: int = 10,
+                        cursor: Optional[str] = None) -> Dict[str, Optional[List[Dict]]]:
         """
         Search products based on names, categories, or attributes.
 
+        Queries are answered from the in-memory search index once it has been
+        built, and from the product repository otherwise. Passing the
+        ``next_cursor`` of a previous response continues from where that page
+        ended instead of skipping ``page - 1`` pages.
+
+        Results from the index come with ``facets``: counts of all matches by
+        category, price band and stock status. Without the index ``facets`` is None.
+
+        When the index finds fewer than ``fuzzy_min_results`` matches, terms it
+        does not know are corrected with the trigram index and the corrected
+        query is searched instead if it matches more; it is returned as
+        ``corrected_query``.
+
+        With a ``result_cache``, responses are reused until the next catalog
+        write or until they expire. Index results do not depend on term order,
+        so queries with the same terms in any order share an entry; its
+        ``corrected_query`` is rewritten in each caller's own term order.
+
         :param query: Search term entered by the user
-        :param page: Page number for pagination
+        :param page: Page number for pagination, ignored when a cursor is given
         :param per_page: Number of items per page
-        :return: Dictionary containing search results and pagination details
+        :param cursor: Continuation token returned with the previous page
+        :return: Dictionary containing search results, pagination details and facet counts
+        :raises InvalidCursorError: If the cursor cannot be decoded
         """
+        if self.result_cache is None:
+            return self._search_products(query, page, per_page, cursor)
+        use_index = self.search_index is not None and self.search_index.is_ready
+        key = search_cache_key(query, page, per_page, cursor, ignore_term_order=use_index,
+                               scope="index" if use_index else "repository")
+        response = self.result_cache.get_or_compute(
+            key, lambda: self._search_products(query, page, per_page, cursor))
+        if response["corrected_query"] is not None:
+            # The shared response may have been computed for the terms in another order.
+            corrected_query = self._correct(query)
+            if corrected_query is not None and corrected_query != response["corrected_query"]:
+                response = {**response, "corrected_query": corrected_query}
+        return response
+
+    def _search_products(self, query, page, per_page, cursor):
+        scope = search_cursor_scope(query, per_page)
+        position = decode_cursor(cursor, scope) if cursor else None
+        start = position["pos"] if position else (page - 1) * per_page
+
         try:
-            results, total_count = self.product_repository.find_by_query(query, page, per_page)
-            return {
-                "results": results,
-                "pagination": {
-                    "current_page": page,
-                    "total_pages": (total_count // per_page) + (1 if total_count % per_page > 0 else 0),
-                    "per_page": per_page,
-                    "total_count": total_count
-                }
-            }
+            facets = corrected_query = None
+            if self.search_index is not None and self.search_index.is_ready:
+                results, total_count, last_key, facets = self._search_index(query, per_page, start, position)
+                if total_count < self.fuzzy_min_results:
+                    corrected_query = self._correct(query)
+                    if corrected_query is not None:
+                        corrected = self._search_index(corrected_query, per_page, start, position)
+                        if corrected[1] > total_count:
+                            results, total_count, last_key, facets = corrected
+                        else:
+                            corrected_query = None
+            else:
+                results, total_count, last_key = self._search_repository(query, per_page, start, position)
+
+            return self._response(results, total_count, last_key, start, per_page, scope, facets, corrected_query)
         except Exception as e:
             logger.error("Failed to search products: %s", str(e))
             raise ProductSearchError("An error occurred during product search.")
 
+    async def search_products_async(self, query: str, page: int = 1, per_page: int = 10,
+                                    cursor: Optional[str] = None) -> Dict[str, Optional[List[Dict]]]:
+        """
+        Async variant of ``search_products``, with the same parameters and response.
+
+        Index searches involve no I/O and run inline. Before the index is
+        built, the repository is queried through ``async_product_repository``
+        when the app has an async engine, and in a worker thread otherwise.
+        Repository results fetched asynchronously are not cached.
+
+        :raises InvalidCursorError: If the cursor cannot be decoded
+        """
+        if self.search_index is not None and self.search_index.is_ready:
+            return self.search_products(query, page, per_page, cursor)
+        if self.async_product_repository is None or not self.async_product_repository.available:
+            return await asyncio.to_thread(self.search_products, query, page, per_page, cursor)
+
+        scope = search_cursor_scope(query, per_page)
+        position = decode_cursor(cursor, scope) if cursor else None
+        start = position["pos"] if position else (page - 1) * per_page
+        try:
+            after_id, cached_count = self._repository_position(query, position)
+            results, match_count = await self.async_product_repository.search_page(
+                query, per_page, after_id=after_id, offset=0 if after_id is not None else start,
+                with_count=cached_count is None)
+            total_count, last_key = self._repository_totals(query, results, match_count, cached_count,
+                                                            start, after_id)
+            return self._response(results, total_count, last_key, start, per_page, scope)
+        except Exception as e:
+            logger.error("Failed to search products: %s", str(e))
+            raise ProductSearchError("An error occurred during product search.")
+
+    @staticmethod
+    def _response(results, total_count, last_key, start, per_page, scope, facets=None, corrected_query=None):
+        next_position = start + len(results)
+        next_cursor = None
+        if last_key is not None and next_position < total_count:
+            next_cursor = encode_cursor({"pos": next_position, **last_key}, scope)
+        return {
+            "results": results,
+            "pagination": {
+                "current_page": start // per_page + 1,
+                "total_pages": total_pages(total_count, per_page),
+                "per_page": per_page,
+                "total_count": total_count,
+                "next_cursor": next_cursor
+            },
+            "facets": facets,
+            "corrected_query": corrected_query
+        }
+
+    def _search_index(self, query, per_page, start, position):
+        after = None
+        if position and "s" in position:
+            after = (position["s"], position["id"])
+        hits, total_count, facets = self.search_index.search_with_facets(query, per_page, after=after, offset=start)
+        last_key = {"s": hits[-1][0], "id": hits[-1][1]["id"]} if hits else None
+        return [product for _, product in hits], total_count, last_key, facets
+
+    def _correct(self, query):
+        if self.trigram_index is None or not self.trigram_index.is_ready:
+            return None
+        return self.trigram_index.correct_query(query, frequency=self.search_index.document_frequency)
+
+    def _search_repository(self, query, per_page, start, position):
+        after_id, cached_count = self._repository_position(query, position)
+        results, match_count = self.product_repository.search_page(
+            query, per_page, after_id=after_id, offset=0 if after_id is not None else start,
+            with_count=cached_count is None)
+        total_count, last_key = self._repository_totals(query, results, match_count, cached_count, start, after_id)
+        return results, total_count, last_key
+
+    def _repository_position(self, query, position):
+        # Cursors issued by the index carry a score and cannot be used as an ID keyset.
+        after_id = position["id"] if position and "s" not in position else None
+        cached_count = self.count_cache.get(query) if self.count_cache is not None else None
+        return after_id, cached_count
+
+    def _repository_totals(self, query, results, match_count, cached_count, start, after_id):
+        if cached_count is not None:
+            total_count = cached_count
+        else:
+            total_count = match_count + (start if after_id is not None else 0)
+            if self.count_cache is not None:
+                self.count_cache.set(query, total_count)
+        last_key = {"id": results[-1]["id"]} if results else None
+        return total_count, last_key
+
+    def suggest(self, prefix: str, limit: int = 8) -> Dict[str, List[Dict]]:
+        """
+        Suggest products and categories for text typed into the search box.
+
+        Suggestions come from the autocomplete index once it has been built,
+        ranked by popularity. Until then, products whose name starts with the
+        prefix are read from the repository and no categories are suggested.
+
+        :param prefix: Text typed so far
+        :param limit: Maximum number of suggestions per kind
+        :return: Dictionary with ``products`` and ``categories`` suggestion lists
+        """
+        try:
+            if self.autocomplete_index is not None and self.autocomplete_index.is_ready:
+                return self.autocomplete_index.suggest(prefix, limit)
+            products = self.product_repository.find_by_name_prefix(prefix, limit)
+            return {"products": [{"id": product["id"], "name": product["name"]} for product in products],
+                    "categories": []}
+        except Exception as e:
+            logger.error("Failed to suggest products: %s", str(e))
+            raise ProductSearchError("An error occurred during autocomplete.")
+
+    def build_index(self) -> None:
+        """
+        Populate the search, autocomplete and trigram indexes from every product in the repository.
+        """
+        indexes = [index for index in (self.search_index, self.autocomplete_index, self.trigram_index)
+                   if index is not None]
+        if not indexes:
+            return
+        products = self.product_repository.find_all()
+        for index in indexes:
+            index.rebuild(products)
+
 class ProductSearchError(Exception):
     """
     Custom exception for product search errors.
@@ -48,4 +234,5 @@ class ProductSearchError(Exception):
 
 # Example initialization of the service:
 # product_repository = SomeProductRepositoryImplementation()
-# search_service = ProductSearchService(product_repository)
+# search_service = ProductSearchService(product_repository, search_index=InvertedIndex(), count_cache=CountCache(),
+#                                       autocomplete_index=AutocompleteIndex(), trigram_index=TrigramIndex())
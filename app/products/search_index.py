@@ -0,0 +1,338 @@
+"""
+Module for the in-memory product search index.
+Keeps an inverted index over product names, descriptions and category names
+so that catalog searches can be answered without scanning the products table,
+plus per-facet-value bitmaps for counting categories, price bands and stock
+across the matches of a query.
+"""
+
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Relative weight of a term occurrence in each indexed field.
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "categories": 2.0,
+    "description": 1.0,
+}
+
+
+# Facets counted over search matches, as produced by facet_values().
+FACETS = ("category", "price", "in_stock")
+
+# Upper bounds of the price facet bands; the last band is open-ended.
+PRICE_BAND_LIMITS = (25, 50, 100, 250)
+
+
+def price_band(price) -> Optional[str]:
+    """
+    Label of the price facet band a price falls into, e.g. ``"25-50"`` or ``"250+"``.
+    """
+    if price is None:
+        return None
+    lower = 0
+    for upper in PRICE_BAND_LIMITS:
+        if price < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def facet_values(product: Dict) -> Tuple[Tuple[str, object], ...]:
+    """
+    The (facet, value) pairs a product is counted under.
+    """
+    values = [("category", name) for name in set(product.get("categories") or ())]
+    band = price_band(product.get("price"))
+    if band is not None:
+        values.append(("price", band))
+    values.append(("in_stock", bool(product.get("in_stock", True))))
+    return tuple(values)
+
+
+def bitmap_from_numbers(numbers: Iterable[int]) -> int:
+    """
+    Build an integer bitmap with bit ``number`` set for every document number.
+    """
+    numbers = list(numbers)
+    if not numbers:
+        return 0
+    bits = bytearray(max(numbers) // 8 + 1)
+    for number in numbers:
+        bits[number >> 3] |= 1 << (number & 7)
+    return int.from_bytes(bits, "little")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split text into lowercase alphanumeric search terms.
+
+    :param text: Raw text to tokenize
+    :return: List of terms in the order they appear
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    Thread-safe inverted index over product documents.
+
+    Each document is the product's ``to_dict()`` payload, optionally extended
+    with a ``categories`` list of category names. Search results are the
+    stored payloads, ranked by a weighted TF-IDF score.
+
+    Every document gets a dense number, reused after the document is removed,
+    and each facet value keeps a bitmap with the numbers of the documents
+    having it. Counting a value over a query's matches is a single AND and
+    popcount against the match bitmap, and bitmaps are sized by the number of
+    indexed documents rather than by how large product IDs are.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._documents: Dict[int, Dict] = {}
+        self._document_terms: Dict[int, Tuple[str, ...]] = {}
+        self._document_facets: Dict[int, Tuple[Tuple[str, object], ...]] = {}
+        self._document_numbers: Dict[int, int] = {}
+        self._free_numbers: List[int] = []
+        self._facets: Dict[str, Dict[object, int]] = {facet: {} for facet in FACETS}
+        self.is_ready = False
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def _weigh_terms(product: Dict) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for field, field_weight in FIELD_WEIGHTS.items():
+            value = product.get(field)
+            if isinstance(value, (list, tuple, set)):
+                value = " ".join(value)
+            for term in tokenize(value):
+                weights[term] = weights.get(term, 0.0) + field_weight
+        return weights
+
+    def _add_locked(self, product: Dict, update_facets: bool = True) -> None:
+        product_id = product["id"]
+        self._remove_locked(product_id)
+        weights = self._weigh_terms(product)
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[product_id] = weight
+        self._documents[product_id] = product
+        self._document_terms[product_id] = tuple(weights)
+        self._document_facets[product_id] = values = facet_values(product)
+        if self._free_numbers:
+            number = heapq.heappop(self._free_numbers)
+        else:
+            number = len(self._document_numbers)
+        self._document_numbers[product_id] = number
+        if update_facets:
+            bit = 1 << number
+            for facet, value in values:
+                bitmaps = self._facets.setdefault(facet, {})
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def _remove_locked(self, product_id: int) -> bool:
+        terms = self._document_terms.pop(product_id, None)
+        if terms is None:
+            return False
+        number = self._document_numbers.pop(product_id)
+        heapq.heappush(self._free_numbers, number)
+        mask = ~(1 << number)
+        for facet, value in self._document_facets.pop(product_id, ()):
+            bitmaps = self._facets[facet]
+            bitmaps[value] &= mask
+            if not bitmaps[value]:
+                del bitmaps[value]
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(product_id, None)
+                if not posting:
+                    del self._postings[term]
+        del self._documents[product_id]
+        return True
+
+    def rebuild(self, products: Iterable[Dict]) -> None:
+        """
+        Replace the index contents with the given products.
+
+        :param products: Iterable of product dictionaries containing at least an ``id``
+        """
+        fresh = InvertedIndex()
+        for product in products:
+            fresh._add_locked(product, update_facets=False)
+        # Setting bits one product at a time would copy each bitmap per product.
+        members: Dict[Tuple[str, object], List[int]] = {}
+        for product_id, values in fresh._document_facets.items():
+            for facet_value in values:
+                members.setdefault(facet_value, []).append(fresh._document_numbers[product_id])
+        for (facet, value), numbers in members.items():
+            fresh._facets.setdefault(facet, {})[value] = bitmap_from_numbers(numbers)
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._documents = fresh._documents
+            self._document_terms = fresh._document_terms
+            self._document_facets = fresh._document_facets
+            self._document_numbers = fresh._document_numbers
+            self._free_numbers = fresh._free_numbers
+            self._facets = fresh._facets
+            self.is_ready = True
+        logger.info("Search index rebuilt with %d products.", len(fresh._documents))
+
+    def add_product(self, product: Dict) -> None:
+        """
+        Index a product, replacing any previous version of it.
+
+        :param product: Product dictionary containing at least an ``id``
+        """
+        with self._lock:
+            self._add_locked(product)
+
+    def remove_product(self, product_id: int) -> bool:
+        """
+        Remove a product from the index.
+
+        :param product_id: ID of the product to remove
+        :return: Whether the product was indexed
+        """
+        with self._lock:
+            return self._remove_locked(product_id)
+
+    def document_frequency(self, term: str) -> int:
+        """
+        Return the number of indexed products containing the term.
+        """
+        return len(self._postings.get(term, ()))
+
+    def get_product(self, product_id: int) -> Optional[Dict]:
+        """
+        Return the indexed payload of a product, if present.
+        """
+        return self._documents.get(product_id)
+
+    def search(self, query: str, page: int = 1, per_page: int = 10) -> Tuple[List[Dict], int]:
+        """
+        Return the ranked page of products matching every term of the query.
+
+        :param query: Search term entered by the user
+        :param page: Page number for pagination
+        :param per_page: Number of items per page
+        :return: Tuple of (results for the page, total number of matches)
+        """
+        hits, total_count = self.search_after(query, per_page, offset=(page - 1) * per_page)
+        return [product for _, product in hits], total_count
+
+    def search_after(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None,
+                     offset: int = 0) -> Tuple[List[Tuple[float, Dict]], int]:
+        """
+        Return ranked matches following a keyset position.
+
+        :param query: Search term entered by the user
+        :param limit: Maximum number of products to return
+        :param after: (score, product_id) of the last product already returned
+        :param offset: Number of ranked matches to skip when no keyset position is given
+        :return: Tuple of ((score, product) pairs, total number of matches)
+        """
+        ranked = self.rank(query)
+        return self._page(ranked, limit, after, offset), len(ranked)
+
+    def search_with_facets(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None,
+                           offset: int = 0) -> Tuple[List[Tuple[float, Dict]], int, Dict[str, Dict]]:
+        """
+        Like ``search_after``, and also count every facet value over all matches of the query.
+
+        :return: Tuple of ((score, product) pairs, total number of matches, facet counts)
+        """
+        ranked = self.rank(query)
+        facets = self.facet_counts(product_id for _, product_id in ranked)
+        return self._page(ranked, limit, after, offset), len(ranked), facets
+
+    def facet_counts(self, matches: Iterable[int]) -> Dict[str, Dict]:
+        """
+        Count matching products under each facet value.
+
+        :param matches: IDs of the matching products
+        :return: Counts by facet and value; values with no matches are omitted
+        """
+        counts: Dict[str, Dict] = {}
+        with self._lock:
+            numbers = self._document_numbers
+            match_bits = bitmap_from_numbers(numbers[product_id] for product_id in matches if product_id in numbers)
+            for facet, bitmaps in self._facets.items():
+                values = counts[facet] = {}
+                if not match_bits:
+                    continue
+                for value, bits in bitmaps.items():
+                    count = (bits & match_bits).bit_count()
+                    if count:
+                        values[value] = count
+        return counts
+
+    def _page(self, ranked: List[Tuple[float, int]], limit: int, after: Optional[Tuple[float, int]],
+              offset: int) -> List[Tuple[float, Dict]]:
+        start = offset
+        if after is not None:
+            start = bisect.bisect_right(ranked, (-after[0], after[1]), key=lambda item: (-item[0], item[1]))
+
+        hits = []
+        for score, product_id in ranked[start:start + limit]:
+            product = self._documents.get(product_id)
+            if product is not None:
+                hits.append((score, product))
+        return hits
+
+    def rank(self, query: str) -> List[Tuple[float, int]]:
+        """
+        Score all products matching every term of the query.
+
+        :param query: Search term entered by the user
+        :return: List of (score, product_id) sorted by descending score, then ID
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = []
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    return []
+                postings.append(posting)
+
+            # Intersect starting from the rarest term to keep the candidate set small.
+            postings.sort(key=len)
+            total_documents = len(self._documents)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for posting in postings:
+                idf = math.log(1.0 + total_documents / len(posting))
+                for product_id in candidates:
+                    scores[product_id] += posting[product_id] * idf
+
+        ranked = [(score, product_id) for product_id, score in scores.items()]
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return ranked
+
+
+# Shared index instance used by the products blueprint.
+product_search_index = InvertedIndex()
@@ -1,21 +1,55 @@
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from app.products.pagination import cursor_scope, decode_cursor, encode_cursor, normalize_query
+from app.products.query_cache import search_cache_key
 
 class SearchService:
-    def __init__(self, product_repository):
+    def __init__(self, product_repository, count_cache=None, result_cache=None):
         self.product_repository = product_repository
+        self.count_cache = count_cache
+        self.result_cache = result_cache
         self.logger = logging.getLogger(__name__)
 
-    def search_products(self, query: str, page: int, per_page: int) -> Dict[str, any]:
+    def search_products(self, query: str, page: int, per_page: int, cursor: Optional[str] = None) -> Dict[str, any]:
+        if self.result_cache is None:
+            return self._search_products(query, page, per_page, cursor)
+        # Substring matching depends on term order, so only case and whitespace are normalized.
+        key = search_cache_key(query, page, per_page, cursor)
+        return self.result_cache.get_or_compute(key, lambda: self._search_products(query, page, per_page, cursor))
+
+    def _search_products(self, query: str, page: int, per_page: int, cursor: Optional[str]) -> Dict[str, any]:
+        # Substring matching depends on term order, so cursors are bound to the normalized query as typed.
+        scope = cursor_scope("search", normalize_query(query), per_page)
+        position = decode_cursor(cursor, scope) if cursor else None
         try:
-            results = self.product_repository.search(query, page, per_page)
-            total_results = self.product_repository.count_search_results(query)
+            start = position["pos"] if position else (page - 1) * per_page
+            after_id = position["id"] if position else None
+            cached_total = self.count_cache.get(query) if self.count_cache is not None else None
+
+            # The repository returns the match count from the same statement as the page.
+            results, match_count = self.product_repository.search_page(
+                query, per_page, after_id=after_id, offset=0 if after_id is not None else start,
+                with_count=cached_total is None)
+
+            if cached_total is not None:
+                total_results = cached_total
+            else:
+                total_results = match_count + (start if after_id is not None else 0)
+                if self.count_cache is not None:
+                    self.count_cache.set(query, total_results)
+
+            next_position = start + len(results)
+            next_cursor = None
+            if results and next_position < total_results:
+                next_cursor = encode_cursor({"pos": next_position, "id": results[-1]["id"]}, scope)
             return {
                 "results": results,
                 "total": total_results,
-                "page": page,
-                "per_page": per_page
+                "page": start // per_page + 1,
+                "per_page": per_page,
+                "next_cursor": next_cursor
             }
         except Exception as e:
             self.logger.error(f"Error while searching for products: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
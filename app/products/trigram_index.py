@@ -0,0 +1,263 @@
+"""
+Module for the typo-tolerant term index.
+Keeps a trigram index over the words of product names so that misspelled
+query terms can be corrected to the nearest known word before searching.
+"""
+
+import heapq
+import logging
+import sys
+import threading
+from array import array
+from collections import Counter
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.products.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET = 8 * 1024 * 1024
+
+# Terms shorter than this are never corrected.
+MIN_TERM_LENGTH = 3
+
+# Candidates re-ranked by edit distance per query term, best trigram overlap first.
+MAX_CANDIDATES = 64
+
+# Over budget, trigrams found in more than 1 / COMMON_TRIGRAM_DIVISOR of the
+# words are dropped first; if that is not enough, new words are not indexed.
+COMMON_TRIGRAM_DIVISOR = 100
+
+# Rough per-item overheads used by the memory estimate, in bytes.
+_POSTING_OVERHEAD = sys.getsizeof(array("I")) + sys.getsizeof("abc") + 100
+_TERM_OVERHEAD = 120
+
+
+def trigrams(term: str) -> Set[str]:
+    """
+    Trigrams of a term padded with two spaces in front and one behind, so
+    ``"shoe"`` gives ``"  s"``, ``" sh"``, ``"sho"``, ``"hoe"`` and ``"oe "``.
+    """
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term: str) -> int:
+    """
+    Number of typos tolerated in a term of this length.
+    """
+    if len(term) < MIN_TERM_LENGTH:
+        return 0
+    return 1 if len(term) <= 5 else 2
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """
+    Edit distance counting insertions, deletions, substitutions and adjacent
+    transpositions, giving up as soon as it must exceed ``limit``.
+
+    :return: The distance, or None if it is greater than ``limit``
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    # A shared prefix or suffix never changes the distance.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return max(len(a), len(b))
+
+    # Only cells within ``limit`` of the diagonal can stay within the limit.
+    outside = limit + 1
+    before, previous_row = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [outside] * (len(b) + 1)
+        if i <= limit:
+            row[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if before is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            row[j] = value
+        if min(row) > limit:
+            return None
+        before, previous_row = previous_row, row
+    return previous_row[-1] if previous_row[-1] <= limit else None
+
+
+class TrigramIndex:
+    """
+    Thread-safe trigram index over the distinct words of product names.
+
+    Each trigram maps to the IDs of the words containing it. Correcting a
+    term counts trigram overlaps to pick candidate words, drops those that
+    share too few trigrams to be within the allowed number of edits, and
+    re-ranks the best ``MAX_CANDIDATES`` by bounded edit distance.
+
+    Words are only added between rebuilds; a word no longer used by any
+    product stays until the next ``rebuild``, and callers that pass
+    ``frequency`` never get it back as a correction.
+
+    The estimated size is kept under ``memory_budget``: when it would be
+    exceeded, the posting lists of the most common trigrams, which are also
+    the least selective, are dropped and those trigrams are no longer
+    indexed. If the budget is still exceeded, new words are skipped until
+    the next rebuild.
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self._lock = threading.RLock()
+        self.memory_budget = memory_budget
+        self._reset()
+        self.is_ready = False
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, array] = {}
+        self._dropped: Set[str] = set()
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        self._size = 0
+        self._full = False
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._term_ids
+
+    @property
+    def memory_usage(self) -> int:
+        """
+        Estimated size of the index in bytes.
+        """
+        return self._size
+
+    def rebuild(self, products: Iterable[Dict]) -> None:
+        """
+        Replace the index contents with the words of the given products' names.
+
+        :param products: Iterable of product dictionaries with a ``name``
+        """
+        with self._lock:
+            self._reset()
+            for product in products:
+                self._add_locked(product)
+            self.is_ready = True
+        logger.info("Trigram index rebuilt with %d terms (~%d KiB, %d trigrams dropped).",
+                    len(self._terms), self._size // 1024, len(self._dropped))
+
+    def add_product(self, product: Dict) -> None:
+        """
+        Index the words of a product's name that are not indexed yet.
+
+        :param product: Product dictionary with a ``name``
+        """
+        with self._lock:
+            self._add_locked(product)
+
+    def _add_locked(self, product: Dict) -> None:
+        for term in tokenize(product.get("name")):
+            if term not in self._term_ids and not self._full:
+                self._add_term(term)
+                self._enforce_budget()
+
+    def _add_term(self, term: str) -> None:
+        term_id = self._term_ids[term] = len(self._terms)
+        self._terms.append(term)
+        self._size += sys.getsizeof(term) + _TERM_OVERHEAD
+        for trigram in trigrams(term) - self._dropped:
+            posting = self._postings.get(trigram)
+            if posting is None:
+                posting = self._postings[trigram] = array("I")
+                self._size += _POSTING_OVERHEAD
+            posting.append(term_id)
+            self._size += posting.itemsize
+
+    def _enforce_budget(self) -> None:
+        if self._size <= self.memory_budget:
+            return
+        # Free some headroom so the next few additions do not trigger another pass.
+        target = self.memory_budget * 9 // 10
+        common = len(self._terms) // COMMON_TRIGRAM_DIVISOR
+        dropped = 0
+        for trigram in sorted(self._postings, key=lambda key: len(self._postings[key]), reverse=True):
+            if self._size <= target or len(self._postings[trigram]) <= common:
+                break
+            posting = self._postings.pop(trigram)
+            self._dropped.add(trigram)
+            self._size -= _POSTING_OVERHEAD + posting.itemsize * len(posting)
+            dropped += 1
+        if self._size > self.memory_budget:
+            self._full = True
+            logger.warning("Trigram index is over its %d byte budget; new words are no longer indexed.",
+                           self.memory_budget)
+        elif dropped:
+            logger.info("Dropped %d common trigrams to keep the trigram index under its budget.", dropped)
+
+    def correct(self, term: str, frequency: Optional[Callable[[str], int]] = None) -> Optional[str]:
+        """
+        Find the indexed word nearest to a term.
+
+        :param term: Lowercase query term
+        :param frequency: Returns the number of products using a word; words used by none are skipped
+        :return: The closest word within ``max_edits(term)`` edits, preferring
+            more frequent words; None if there is none
+        """
+        limit = max_edits(term)
+        if not limit:
+            return None
+        with self._lock:
+            query_trigrams = trigrams(term) - self._dropped
+            # An edit changes at most three trigrams of the term, a transposition four.
+            min_shared = max(1, len(query_trigrams) - 4 * limit)
+            overlaps = Counter()
+            for trigram in query_trigrams:
+                overlaps.update(self._postings.get(trigram, ()))
+            candidates = [self._terms[term_id] for term_id, shared
+                          in heapq.nlargest(MAX_CANDIDATES, overlaps.items(), key=itemgetter(1))
+                          if shared >= min_shared]
+
+        best, best_key = None, None
+        for candidate in candidates:
+            distance = bounded_edit_distance(term, candidate, limit)
+            if distance is None:
+                continue
+            count = frequency(candidate) if frequency is not None else 1
+            if not count:
+                continue
+            key = (distance, -count, candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def correct_query(self, query: str, frequency: Optional[Callable[[str], int]] = None) -> Optional[str]:
+        """
+        Rewrite a query with its misspelled terms corrected.
+
+        :param query: Search term entered by the user
+        :param frequency: Returns the number of products using a word; words used
+            by some product are kept as they are. By default indexed words are kept.
+        :return: The corrected query, or None if no term could be corrected
+        """
+        corrected = []
+        changed = False
+        for term in tokenize(query):
+            known = frequency(term) > 0 if frequency is not None else term in self
+            replacement = None if known else self.correct(term, frequency)
+            if replacement is not None:
+                changed = True
+                corrected.append(replacement)
+            else:
+                corrected.append(term)
+        return " ".join(corrected) if changed else None
+
+
+# Shared index instance used by the products blueprint.
+product_trigram_index = TrigramIndex()
@@ -1,40 +1,327 @@
 """
 Module for products-related views.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from app.common.access import internal_only
 from app.common.models import Product
 from app.common.extensions import db
+from app.common.json_provider import stream_json_array
+from app.products.autocomplete import MAX_SUGGESTIONS, product_autocomplete_index
+from app.products.bulk_import import (BulkImportError, ProductImporter, DEFAULT_BATCH_SIZE,
+                                      iter_records, validate_product_payload)
+from app.products.category import (DEFAULT_ASSIGNMENT_BATCH_SIZE, ProductCategorizationService,
+                                   ProductCategorizationError)
+from app.products.pagination import CountCache, InvalidCursorError, cursor_scope, decode_cursor, encode_cursor
+from app.products.query_cache import SearchResultCache
+from app.products.repositories import (AsyncCategoryRepository, AsyncProductRepository, CategoryRepository,
+                                       ProductRepository)
+from app.products.representation_cache import product_representation_cache
+from app.products.search import ProductSearchService, ProductSearchError
+from app.products.search_index import product_search_index
+from app.products.trigram_index import product_trigram_index
 
 products_bp = Blueprint('products_bp', __name__)
 
+product_repository = ProductRepository()
+# Search results are reused until the next catalog write advances the listing generation,
+# which only this worker sees, or for at most as long as cached representations.
+search_result_cache = SearchResultCache(generation=lambda: product_representation_cache.generation,
+                                        ttl_seconds=product_representation_cache.ttl_seconds)
+search_service = ProductSearchService(product_repository, search_index=product_search_index,
+                                      count_cache=CountCache(), autocomplete_index=product_autocomplete_index,
+                                      trigram_index=product_trigram_index, result_cache=search_result_cache,
+                                      async_product_repository=AsyncProductRepository())
+categorization_service = ProductCategorizationService(CategoryRepository(),
+                                                      async_category_repository=AsyncCategoryRepository())
+
+MAX_PER_PAGE = 100
+
+MAX_IMPORT_BATCH_SIZE = 5000
+
+MAX_ASSIGNMENT_BATCH_SIZE = 5000
+
+class InvalidArgumentError(ValueError):
+    """
+    Raised when a query string argument is missing or out of range.
+    """
+    pass
+
+def per_page_argument(default: int) -> int:
+    """
+    Read ``per_page`` from the query string.
+
+    :raises InvalidArgumentError: If it is not between 1 and ``MAX_PER_PAGE``
+    """
+    per_page = request.args.get('per_page', default, type=int)
+    if per_page < 1 or per_page > MAX_PER_PAGE:
+        raise InvalidArgumentError(f"per_page must be between 1 and {MAX_PER_PAGE}")
+    return per_page
+
+def search_arguments():
+    """
+    Read the query, page, page size and cursor of a search request.
+
+    :return: Tuple of (query, page, per_page, cursor)
+    :raises InvalidArgumentError: If the query is empty or the page or page size is out of range
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise InvalidArgumentError("Search query is required")
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    if page < 1 or per_page < 1 or per_page > MAX_PER_PAGE:
+        raise InvalidArgumentError(f"page must be >= 1 and per_page between 1 and {MAX_PER_PAGE}")
+    return query, page, per_page, request.args.get('cursor')
+
+def category_listing_position(category_id: int, per_page: int):
+    """
+    Read the page size and cursor of a category listing request.
+
+    :return: Tuple of (cursor scope, keyset position or None for the first page)
+    :raises InvalidCursorError: If the cursor is malformed or was issued for another category or page size
+    """
+    scope = cursor_scope("category", category_id, per_page)
+    cursor = request.args.get('cursor')
+    return scope, decode_cursor(cursor, scope) if cursor else None
+
+def category_listing_page(results, per_page: int, position, scope: str):
+    """
+    Build a category listing response body with the cursor of the next page, if any.
+    """
+    next_cursor = None
+    if len(results) == per_page:
+        next_cursor = encode_cursor({"pos": (position["pos"] if position else 0) + per_page,
+                                     "id": results[-1]["id"]}, scope)
+    return {"results": results, "next_cursor": next_cursor}
+
+def _index_products(products):
+    for product in products:
+        product_search_index.add_product(product)
+        product_autocomplete_index.add_product(product)
+        product_trigram_index.add_product(product)
+        product_representation_cache.invalidate_product(product['id'])
+    search_service.count_cache.clear()
+    # Streamed imports index products after the response has started, past retire_cached_listings.
+    product_representation_cache.bump_generation()
+
+@products_bp.after_request
+def retire_cached_listings(response):
+    if request.method != 'GET' and response.status_code < 400:
+        product_representation_cache.bump_generation()
+    return response
+
+def _representation_response(entry):
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @products_bp.route('/add_product', methods=['POST'])
 def add_product():
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
     
+    error = validate_product_payload(data)
+    if error:
+        return jsonify({"error": error}), 400
+
     name = data.get('name')
     description = data.get('description')
     price = data.get('price')
-
-    if not name:
-        return jsonify({"error": "Product name is required"}), 400
-
-    if not description:
-        return jsonify({"error": "Product description is required"}), 400
-
-    if price is None:
-        return jsonify({"error": "Product price is required"}), 400
-
-    if price < 0:
-        return jsonify({"error": "Product price must be a positive number"}), 400
     
     existing_product = Product.query.filter_by(name=name).first()
     if existing_product:
         return jsonify({"error": "Product name must be unique"}), 400
     
-    new_product = Product(name=name, description=description, price=price)
+    new_product = Product(name=name, description=description, price=price,
+                          in_stock=data.get('in_stock', True))
     db.session.add(new_product)
     db.session.commit()
+
+    _index_products([new_product.to_dict()])
     
-    return jsonify({"message": "Product added successfully", "product": new_product.to_dict()}), 201
\ No newline at end of file
+    return jsonify({"message": "Product added successfully", "product": new_product.to_dict()}), 201
+
+@products_bp.route('/<int:product_id>', methods=['GET'])
+def get_product(product_id):
+    entry = product_representation_cache.get_product(product_id)
+    if entry is None:
+        found = product_repository.find_by_id(product_id)
+        if found is None:
+            return jsonify({"error": "Product not found"}), 404
+        entry = product_representation_cache.put_product(*found)
+    product_autocomplete_index.record_view(product_id)
+    return _representation_response(entry)
+
+@products_bp.route('/', methods=['GET'])
+def list_products():
+    try:
+        per_page = per_page_argument(20)
+    except InvalidArgumentError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cursor = request.args.get('cursor')
+    entry = product_representation_cache.get_listing((cursor, per_page))
+    if entry is None:
+        generation = product_representation_cache.generation
+        scope = cursor_scope("listing", per_page)
+        try:
+            position = decode_cursor(cursor, scope) if cursor else None
+        except InvalidCursorError as e:
+            return jsonify({"error": str(e)}), 400
+        results = product_repository.list_page(per_page, after_id=position["id"] if position else None)
+        next_cursor = None
+        if len(results) == per_page:
+            next_cursor = encode_cursor({"pos": (position["pos"] if position else 0) + per_page,
+                                         "id": results[-1]["id"]}, scope)
+        entry = product_representation_cache.put_listing(
+            (cursor, per_page), {"results": results, "next_cursor": next_cursor}, generation)
+    return _representation_response(entry)
+
+@products_bp.route('/import', methods=['POST'])
+def import_products():
+    batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    if batch_size < 1 or batch_size > MAX_IMPORT_BATCH_SIZE:
+        return jsonify({"error": f"batch_size must be between 1 and {MAX_IMPORT_BATCH_SIZE}"}), 400
+
+    try:
+        records = iter_records(request.stream, request.content_type)
+    except BulkImportError as e:
+        return jsonify({"error": str(e)}), 415
+
+    importer = ProductImporter(batch_size=batch_size, on_inserted=_index_products)
+    if request.args.get('stream', type=int):
+        # Row errors are written as they are found; the counts follow the array.
+        report = {"processed": 0, "inserted": 0, "failed": 0}
+        return stream_json_array(importer.iter_run(records, report), key="errors", tail=lambda: report)
+    report = importer.run(records)
+    # Rows read before an unreadable part of the body are still imported.
+    return jsonify(report), 400 if "error" in report else 200
+
+@products_bp.route('/export', methods=['GET'])
+def export_products():
+    batch_size = request.args.get('batch_size', 1000, type=int)
+    if batch_size < 1 or batch_size > MAX_IMPORT_BATCH_SIZE:
+        return jsonify({"error": f"batch_size must be between 1 and {MAX_IMPORT_BATCH_SIZE}"}), 400
+    return stream_json_array(product_repository.iter_all(batch_size), key="products")
+
+@products_bp.route('/search', methods=['GET'])
+def search_products():
+    try:
+        query, page, per_page, cursor = search_arguments()
+        return jsonify(search_service.search_products(query, page, per_page, cursor=cursor)), 200
+    except (InvalidArgumentError, InvalidCursorError) as e:
+        return jsonify({"error": str(e)}), 400
+    except ProductSearchError as e:
+        return jsonify({"error": str(e)}), 500
+
+@products_bp.route('/search/stats', methods=['GET'])
+@internal_only
+def search_cache_stats():
+    return jsonify(search_result_cache.stats()), 200
+
+@products_bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    prefix = request.args.get('q', '').lstrip()
+    if not prefix.strip():
+        return jsonify({"error": "Autocomplete prefix is required"}), 400
+
+    limit = request.args.get('limit', 8, type=int)
+    if limit < 1 or limit > MAX_SUGGESTIONS:
+        return jsonify({"error": f"limit must be between 1 and {MAX_SUGGESTIONS}"}), 400
+
+    try:
+        return jsonify(search_service.suggest(prefix, limit)), 200
+    except ProductSearchError as e:
+        return jsonify({"error": str(e)}), 500
+
+@products_bp.route('/categories', methods=['POST'])
+def create_category():
+    data = request.get_json()
+    if not data or not data.get('name'):
+        return jsonify({"error": "Category name is required"}), 400
+
+    try:
+        category_id = categorization_service.create_category(data['name'], data.get('parent_id'))
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"message": "Category created successfully", "category_id": category_id}), 201
+
+def _is_id(value) -> bool:
+    # JSON true/false decode to bools, which are ints in Python.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+@products_bp.route('/categories/bulk', methods=['POST'])
+def assign_categories_bulk():
+    data = request.get_json()
+    assignments = data.get('assignments') if isinstance(data, dict) else None
+    if not isinstance(assignments, list) or not assignments:
+        return jsonify({"error": "assignments must be a non-empty list"}), 400
+
+    batch_size = request.args.get('batch_size', DEFAULT_ASSIGNMENT_BATCH_SIZE, type=int)
+    if batch_size < 1 or batch_size > MAX_ASSIGNMENT_BATCH_SIZE:
+        return jsonify({"error": f"batch_size must be between 1 and {MAX_ASSIGNMENT_BATCH_SIZE}"}), 400
+
+    pairs = []
+    for entry in assignments:
+        product_id = entry.get('product_id') if isinstance(entry, dict) else None
+        category_ids = entry.get('category_ids') if isinstance(entry, dict) else None
+        if not _is_id(product_id) or not isinstance(category_ids, list) \
+                or not all(_is_id(category_id) for category_id in category_ids):
+            return jsonify({"error": "Each assignment needs an integer product_id and a list of "
+                                     "integer category_ids"}), 400
+        pairs.append((product_id, category_ids))
+
+    report = categorization_service.assign_categories_bulk(pairs, batch_size=batch_size)
+    _index_products(product_repository.find_for_index(
+        [result["product_id"] for result in report["results"] if result["status"] == "updated"]))
+    return jsonify(report), 200
+
+@products_bp.route('/<int:product_id>/categories', methods=['POST'])
+def assign_categories(product_id):
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+
+    if db.session.get(Product, product_id) is None:
+        return jsonify({"error": "Product not found"}), 404
+
+    try:
+        categorization_service.assign_categories_to_product(product_id, data.get('category_ids') or [])
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    _index_products(product_repository.find_for_index([product_id]))
+
+    return jsonify({"message": "Categories assigned successfully"}), 200
+
+@products_bp.route('/categories/<int:category_id>/products', methods=['GET'])
+def list_category_products(category_id):
+    try:
+        per_page = per_page_argument(20)
+        scope, position = category_listing_position(category_id, per_page)
+        results = categorization_service.list_products_in_subtree(
+            category_id, limit=per_page, after_id=position["id"] if position else None)
+    except (InvalidArgumentError, InvalidCursorError) as e:
+        return jsonify({"error": str(e)}), 400
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify(category_listing_page(results, per_page, position, scope)), 200
+
+@products_bp.route('/categories/<int:category_id>/breadcrumb', methods=['GET'])
+def category_breadcrumb(category_id):
+    try:
+        path = categorization_service.get_breadcrumb(category_id)
+    except ProductCategorizationError as e:
+        return jsonify({"error": str(e)}), 500
+
+    if not path:
+        return jsonify({"error": "Category not found"}), 404
+    return jsonify({"breadcrumb": path}), 200
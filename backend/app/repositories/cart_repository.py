@@ -2,16 +2,25 @@
 Module for interacting with the database to manage shopping cart data.
 """
 
+from typing import Optional, Tuple
+
+# For demonstration purposes, we use a dict as mock storage.
+MOCK_DATABASE = {}
+
 class CartRepository:
     @staticmethod
-    def save_cart_to_profile(user_id: str, cart_data: dict) -> None:
-        """Persist the cart to the user's profile in the database."""
-        # For demonstration purposes, we use a dict as mock storage.
-        MOCK_DATABASE = {}
-        MOCK_DATABASE[user_id] = cart_data
+    def save_cart_to_profile(user_id: str, cart_data: dict, revision: Optional[int] = None) -> None:
+        """Persist the cart, and optionally its revision number, to the user's profile in the database."""
+        if revision is None:
+            revision = MOCK_DATABASE.get(user_id, ({}, 0))[1]
+        MOCK_DATABASE[user_id] = (cart_data, revision)
 
     @staticmethod
     def get_cart_from_profile(user_id: str) -> dict:
         """Retrieve the user's cart from the database."""
-        MOCK_DATABASE = {}
-        return MOCK_DATABASE.get(user_id, {})
\ No newline at end of file
+        return MOCK_DATABASE.get(user_id, ({}, 0))[0]
+
+    @staticmethod
+    def get_cart_with_revision(user_id: str) -> Tuple[dict, int]:
+        """Retrieve the user's cart and its revision number; revision 0 means it was never saved."""
+        return MOCK_DATABASE.get(user_id, ({}, 0))
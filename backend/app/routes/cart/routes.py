@@ -17,8 +17,8 @@ def save_cart():
         if not user_id or not cart_data:
             return jsonify({"error": "Missing user_id or cart data."}), 400
 
-        CartService.save_cart(user_id, cart_data)
-        return jsonify({"message": "Cart saved successfully."}), 200
+        revision = CartService.save_cart(user_id, cart_data)
+        return jsonify({"message": "Cart saved successfully.", "revision": revision}), 200
     except Exception as e:
         return jsonify({"error": "Failed to save cart.", "details": str(e)}), 500
 
@@ -31,7 +31,7 @@ def retrieve_cart():
         if not user_id:
             return jsonify({"error": "Missing user_id."}), 400
 
-        cart_data = CartService.retrieve_cart(user_id)
-        return jsonify({"cart": cart_data}), 200
+        cart_data, revision = CartService.retrieve_cart_with_revision(user_id)
+        return jsonify({"cart": cart_data, "revision": revision}), 200
     except Exception as e:
-        return jsonify({"error": "Failed to retrieve cart.", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to retrieve cart.", "details": str(e)}), 500
@@ -1,18 +1,29 @@
 """
 Module for shopping cart-related business logic.
+
+Carts are saved whole. Delta updates and guest cart merges are served by
+the main application's cart service (app/cart), which validates them with
+ShoppingCart.
 """
 
 import logging
+import threading
 from app.repositories.cart_repository import CartRepository
 
 logger = logging.getLogger(__name__)
 
+# Serializes read-modify-write updates of stored carts.
+_cart_lock = threading.Lock()
+
 class CartService:
     @staticmethod
-    def save_cart(user_id: str, cart_data: dict) -> None:
-        """Save the shopping cart to the repository."""
+    def save_cart(user_id: str, cart_data: dict) -> int:
+        """Save the shopping cart to the repository and return its new revision."""
         try:
-            CartRepository.save_cart_to_profile(user_id, cart_data)
+            with _cart_lock:
+                _, revision = CartRepository.get_cart_with_revision(user_id)
+                CartRepository.save_cart_to_profile(user_id, cart_data, revision + 1)
+                return revision + 1
         except Exception as e:
             logger.error(f"Failed to save cart for user {user_id}: {e}")
             raise e
@@ -24,4 +35,13 @@ class CartService:
             return CartRepository.get_cart_from_profile(user_id)
         except Exception as e:
             logger.error(f"Failed to retrieve cart for user {user_id}: {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+    @staticmethod
+    def retrieve_cart_with_revision(user_id: str) -> tuple:
+        """Retrieve the shopping cart and its revision from the repository."""
+        try:
+            return CartRepository.get_cart_with_revision(user_id)
+        except Exception as e:
+            logger.error(f"Failed to retrieve cart for user {user_id}: {e}")
+            raise e
@@ -0,0 +1,4 @@
+-- Adds the row version SQLAlchemy uses for optimistic locking and for the
+-- product representation cache's ETags (Product.version, version_id_col).
+-- Existing rows start at version 1.
+ALTER TABLE product ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
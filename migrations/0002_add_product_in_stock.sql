@@ -0,0 +1,3 @@
+-- Adds the stock flag counted by the search facets (Product.in_stock).
+-- Existing rows are treated as in stock.
+ALTER TABLE product ADD COLUMN in_stock BOOLEAN NOT NULL DEFAULT 1;
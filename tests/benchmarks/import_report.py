@@ -0,0 +1,82 @@
+"""
+Import-time report.
+
+Runs a statement in a fresh interpreter under ``python -X importtime`` and
+lists the modules with the highest cumulative and self import time, to see
+what dominates worker cold starts.
+
+Usage (from the repository root):
+
+    python -m tests.benchmarks.import_report
+    python -m tests.benchmarks.import_report --statement "import app.auth.login" --top 10
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+IMPORT_TIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_import_times(output: str) -> List[Dict]:
+    """
+    Parse the stderr of ``python -X importtime``.
+
+    :param output: Raw importtime output
+    :return: One entry per module with self and cumulative microseconds and nesting depth
+    """
+    entries = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+    return entries
+
+
+def import_time_report(statement: str = "import app", top: int = 20) -> Dict:
+    """
+    Measure imports in a fresh interpreter.
+
+    :param statement: Python statement to time, e.g. ``import app``
+    :param top: Number of modules to list
+    :return: Total import time and the modules with the highest cumulative and self time
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                               capture_output=True, text=True, check=True)
+    entries = parse_import_times(completed.stderr)
+    total_us = sum(entry["cumulative_us"] for entry in entries if entry["depth"] == 0)
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(entries),
+        "by_cumulative": sorted(entries, key=lambda entry: entry["cumulative_us"], reverse=True)[:top],
+        "by_self": sorted(entries, key=lambda entry: entry["self_us"], reverse=True)[:top],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report the slowest imports of the application.")
+    parser.add_argument("--statement", default="import app", help="statement to time")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    report = import_time_report(args.statement, args.top)
+    print(f"{args.statement}: {report['total_ms']}ms across {report['modules']} modules\n")
+    for title, key in (("Cumulative", "by_cumulative"), ("Self", "by_self")):
+        print(f"{title} time:")
+        for entry in report[key]:
+            value = entry["cumulative_us"] if key == "by_cumulative" else entry["self_us"]
+            print(f"  {value / 1000:9.1f}ms  {entry['module']}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
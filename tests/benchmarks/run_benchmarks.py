@@ -0,0 +1,312 @@
+"""
+Benchmark suite for the core request paths.
+
+Builds the application with ``create_app('testing')`` on a throwaway SQLite
+database, seeds a catalog, and drives login, add_product, search, category
+assignment and cart save/retrieve through the Flask test client. Reports
+throughput and latency percentiles per scenario and compares them against a
+stored baseline.
+
+Usage (from the repository root):
+
+    python -m tests.benchmarks.run_benchmarks --catalog-size 5000 --concurrency 8
+    python -m tests.benchmarks.run_benchmarks --update-baseline
+    python -m tests.benchmarks.run_benchmarks --async-views --concurrency 64
+
+``--async-views`` also registers the async blueprints, on an aiosqlite engine,
+and adds their scenarios; it needs the packages in requirements-async.txt.
+
+Exits with status 1 if any scenario regresses past ``--threshold``, or if
+there is no baseline to compare against. The committed ``baseline.json`` was
+recorded with the default arguments; re-record it with ``--update-baseline``
+on the machine that runs the comparison.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+WORDS = [
+    "red", "blue", "green", "black", "white", "steel", "cotton", "leather", "wooden", "glass",
+    "shoe", "shirt", "lamp", "chair", "table", "bottle", "jacket", "watch", "bag", "mug",
+    "running", "office", "outdoor", "kitchen", "garden", "travel", "classic", "compact", "deluxe", "eco",
+]
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "benchmark-password-1"
+
+
+def build_app(database_path: str, async_views: bool = False):
+    """
+    Create the testing app on a fresh SQLite file with every benchmarked blueprint registered.
+    """
+    os.environ["TEST_DATABASE_URL"] = f"sqlite:///{database_path}"
+
+    from app import TestingConfig, config_by_name, create_app
+    from app.auth import login as login_module
+    from app.auth.password_hashing import password_hasher
+    from app.cart import cart_controller
+    from werkzeug.security import generate_password_hash
+
+    class AsyncTestingConfig(TestingConfig):
+        ASYNC_DB_ENABLED = True
+        ASYNC_VIEWS_ENABLED = True
+
+    config_by_name["benchmark-async"] = AsyncTestingConfig
+    app = create_app("benchmark-async" if async_views else "testing")
+    app.secret_key = "benchmark"
+    # Carts go through the same SQLite store and service the cart blueprints build in production.
+    app.config["CART_DB"] = os.path.join(os.path.dirname(database_path), "carts.db")
+    cart_controller.cart_service = None
+    app.register_blueprint(login_module.auth_blueprint)
+    app.register_blueprint(cart_controller.cart_blueprint)
+
+    login_module.MOCK_USERS[BENCH_EMAIL] = {
+        "password_hash": generate_password_hash(BENCH_PASSWORD, method=password_hasher.method)
+    }
+    if async_views:
+        from app.cart.async_cart_controller import cart_async_blueprint
+        app.register_blueprint(cart_async_blueprint)
+    return app
+
+
+def seed_catalog(app, catalog_size: int, category_count: int, rng: random.Random) -> List[int]:
+    """
+    Insert a random catalog and category tree, then build the search index.
+
+    :return: IDs of the created categories
+    """
+    from sqlalchemy import insert
+
+    from app import build_search_index
+    from app.common.extensions import db
+    from app.common.models import Product
+    from app.products.views import categorization_service
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        rows = [
+            {
+                "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {index}",
+                "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+                "price": round(rng.uniform(1, 500), 2),
+            }
+            for index in range(catalog_size)
+        ]
+        for start in range(0, len(rows), 1000):
+            db.session.execute(insert(Product), rows[start:start + 1000])
+        db.session.commit()
+
+        category_ids = []
+        for index in range(category_count):
+            parent_id = rng.choice(category_ids) if category_ids and index % 4 else None
+            category_ids.append(categorization_service.create_category(f"category {index}", parent_id))
+
+    build_search_index(app)
+    return category_ids
+
+
+def make_scenarios(catalog_size: int, category_ids: List[int], rng: random.Random,
+                   async_views: bool = False) -> Dict[str, Callable]:
+    """
+    Build the request functions for each scenario; each takes a client and a request number.
+    """
+    product_counter = itertools.count()
+
+    def login(client, number):
+        return client.post("/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+    def add_product(client, number):
+        return client.post("/products/add_product", json={
+            "name": f"bench product {next(product_counter)}",
+            "description": "benchmark product",
+            "price": 9.99,
+        })
+
+    def search(client, number):
+        query = WORDS[number % len(WORDS)]
+        return client.get(f"/products/search?q={query}&per_page=20")
+
+    def category_assignment(client, number):
+        product_id = number % catalog_size + 1
+        category_id = category_ids[number % len(category_ids)]
+        return client.post(f"/products/{product_id}/categories", json={"category_ids": [category_id]})
+
+    def cart_save(client, number):
+        user_id = f"user-{number % 50}"
+        cart = {str(product_id): {"id": product_id, "price": 10.0, "quantity": 1}
+                for product_id in range(number % 20 + 1)}
+        return client.post("/cart/save", json={"user_id": user_id, "cart": cart})
+
+    def cart_retrieve(client, number):
+        return client.get(f"/cart/retrieve?user_id=user-{number % 50}")
+
+    scenarios = {
+        "login": login,
+        "add_product": add_product,
+        "search": search,
+        "category_assignment": category_assignment,
+        "cart_save": cart_save,
+        "cart_retrieve": cart_retrieve,
+    }
+    if not async_views:
+        return scenarios
+
+    def async_search(client, number):
+        query = WORDS[number % len(WORDS)]
+        return client.get(f"/async/products/search?q={query}&per_page=20")
+
+    def async_category_products(client, number):
+        return client.get(f"/async/products/categories/{category_ids[number % len(category_ids)]}/products")
+
+    def async_cart_save(client, number):
+        user_id = f"user-{number % 50}"
+        cart = {str(product_id): {"id": product_id, "price": 10.0, "quantity": 1}
+                for product_id in range(number % 20 + 1)}
+        return client.post("/async/cart/save", json={"user_id": user_id, "cart": cart})
+
+    def async_cart_retrieve(client, number):
+        return client.get(f"/async/cart/retrieve?user_id=user-{number % 50}")
+
+    scenarios.update({
+        "async_search": async_search,
+        "async_category_products": async_category_products,
+        "async_cart_save": async_cart_save,
+        "async_cart_retrieve": async_cart_retrieve,
+    })
+    return scenarios
+
+
+def percentile(sorted_values: List[float], quantile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(app, request_function: Callable, requests: int, concurrency: int) -> Dict:
+    """
+    Issue ``requests`` calls spread over ``concurrency`` threads and summarize them.
+    """
+    local = threading.local()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(number):
+        nonlocal errors
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        response = request_function(client, number)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / wall_time, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    List regressions: p95 latency above, or throughput below, the baseline by more than ``threshold``.
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if current["p95_ms"] > reference["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {reference['p95_ms']}ms")
+        if current["throughput_rps"] < reference["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']}/s vs baseline {reference['throughput_rps']}/s")
+        if current["errors"] > reference.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {reference.get('errors', 0)}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--catalog-size", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scenarios", nargs="*", help="subset of scenarios to run")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative regression before failing (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="write the results JSON to this path")
+    parser.add_argument("--async-views", action="store_true",
+                        help="also benchmark the async variants of the search, category and cart views")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(os.path.join(directory, "benchmark.db"), async_views=args.async_views)
+        category_ids = seed_catalog(app, args.catalog_size, args.categories, rng)
+        scenarios = make_scenarios(args.catalog_size, category_ids, rng, async_views=args.async_views)
+        selected = args.scenarios or list(scenarios)
+
+        results = {}
+        for name in selected:
+            results[name] = run_scenario(app, scenarios[name], args.requests, args.concurrency)
+            print(f"{name:<22} {json.dumps(results[name])}")
+
+        from app.auth.password_hashing import password_hasher
+        from app.cart import cart_controller
+        password_hasher.shutdown()
+        if cart_controller.cart_service is not None:
+            cart_controller.cart_service.close()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 1
+
+    with open(args.baseline) as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Shared fixtures: a testing app on a throwaway SQLite database with the
+product caches and indexes reset for every test.
+"""
+import os
+import tempfile
+
+# TestingConfig reads the database URL when the app package is first imported.
+_DATABASE_DIRECTORY = tempfile.mkdtemp(prefix="app-tests-")
+os.environ["TEST_DATABASE_URL"] = f"sqlite:///{os.path.join(_DATABASE_DIRECTORY, 'test.db')}"
+os.environ["CART_DB"] = os.path.join(_DATABASE_DIRECTORY, "carts.db")
+
+import pytest
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from app import build_search_index, create_app
+    from app.common.extensions import db
+    from app.products import views
+    from app.products.representation_cache import ProductRepresentationCache
+
+    monkeypatch.setattr(views, "product_representation_cache", ProductRepresentationCache())
+    application = create_app('testing')
+    with application.app_context():
+        db.drop_all()
+        db.create_all()
+    views.search_result_cache.clear()
+    views.search_service.count_cache.clear()
+    build_search_index(application)
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_products(app):
+    """
+    Insert products by name, index them and return their IDs.
+    """
+    from app.common.extensions import db
+    from app.common.models import Product
+    from app.products.views import _index_products
+
+    def add(*names, **fields):
+        with app.app_context():
+            products = [Product(name=name, description=fields.get("description", f"about {name}"),
+                                price=fields.get("price", 10.0)) for name in names]
+            db.session.add_all(products)
+            db.session.commit()
+            _index_products([product.to_dict() for product in products])
+            return [product.id for product in products]
+    return add
+
+
+@pytest.fixture
+def cart_service(monkeypatch):
+    """
+    Write-behind cart service over a private in-memory store, installed in the cart blueprints.
+    """
+    from app.cart import cart_controller
+    from app.cart.cart_cache import CartCache
+    from app.cart.cart_repository import CartRepository, load_product_details
+    from app.cart.cart_service import CartService
+    from app.cart.cart_store import SQLiteCartStore
+
+    repository = CartRepository(SQLiteCartStore(":memory:"), product_loader=load_product_details)
+    service = CartService(repository, cache=CartCache(), write_behind_delay=60.0)
+    monkeypatch.setattr(cart_controller, "cart_service", service)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def cart_client(app, cart_service):
+    from app.cart.cart_controller import cart_blueprint
+
+    app.secret_key = "test"
+    app.config["INTERNAL_API_TOKEN"] = "internal-token"
+    app.register_blueprint(cart_blueprint)
+    return app.test_client()
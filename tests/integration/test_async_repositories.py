@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+
+@pytest.fixture
+def async_app(monkeypatch, app):
+    from app import TestingConfig, create_app
+    from app.common.extensions import db
+
+    monkeypatch.setattr(TestingConfig, "ASYNC_DB_ENABLED", True, raising=False)
+    application = create_app("testing")
+    assert "async_engine" in application.extensions
+    yield application
+    with application.app_context():
+        db.session.remove()
+    asyncio.run(application.extensions["async_engine"].dispose())
+
+
+@pytest.fixture
+def tree(async_app, add_products):
+    from app.products.repositories import CategoryRepository
+
+    lamp, chair, rake = add_products("Desk lamp", "Desk chair", "Garden rake")
+    with async_app.app_context():
+        categories = CategoryRepository()
+        home = categories.create("home")
+        office = categories.create("office", home)
+        garden = categories.create("garden")
+        categories.attach_categories(lamp, [office])
+        categories.attach_categories(chair, [home])
+        categories.attach_categories(rake, [garden])
+    return {"home": home, "office": office, "garden": garden, "lamp": lamp, "chair": chair}
+
+
+def test_async_product_search_pages_by_id(async_app, add_products):
+    from app.products.repositories import AsyncProductRepository
+
+    first, second, _ = add_products("Desk lamp", "Floor lamp", "Office chair")
+    repository = AsyncProductRepository()
+
+    with async_app.app_context():
+        assert repository.available
+        results, count = asyncio.run(repository.search_page("lamp", 1))
+        rest, _ = asyncio.run(repository.search_page("lamp", 5, after_id=first, with_count=False))
+        found = asyncio.run(repository.find_by_id(second))
+
+    assert [product["id"] for product in results] == [first]
+    assert count == 2
+    assert [product["id"] for product in rest] == [second]
+    assert found[0]["name"] == "Floor lamp" and found[1] == 1
+
+
+def test_async_category_reads_match_the_sync_repository(async_app, tree):
+    from app.products.repositories import AsyncCategoryRepository, CategoryRepository
+
+    repository = AsyncCategoryRepository()
+    with async_app.app_context():
+        products = asyncio.run(repository.find_products_in_subtree(tree["home"], 10))
+        page = asyncio.run(repository.find_products_in_subtree(tree["home"], 10, after_id=tree["lamp"]))
+        breadcrumb = asyncio.run(repository.find_breadcrumb(tree["office"]))
+        assert products == CategoryRepository().find_products_in_subtree(tree["home"], 10)
+
+    assert [product["id"] for product in products] == [tree["lamp"], tree["chair"]]
+    assert [product["id"] for product in page] == [tree["chair"]]
+    assert [category["name"] for category in breadcrumb] == ["home", "office"]
+
+
+def test_async_category_cursors_are_bound_to_category_and_page_size(monkeypatch, tree):
+    pytest.importorskip("asgiref")
+    from app import TestingConfig, create_app
+
+    monkeypatch.setattr(TestingConfig, "ASYNC_DB_ENABLED", True, raising=False)
+    monkeypatch.setattr(TestingConfig, "ASYNC_VIEWS_ENABLED", True, raising=False)
+    client = create_app("testing").test_client()
+
+    first = client.get(f"/async/products/categories/{tree['home']}/products?per_page=1").get_json()
+    url = f"/async/products/categories/{tree['home']}/products?per_page=1&cursor={first['next_cursor']}"
+    assert [product["id"] for product in client.get(url).get_json()["results"]] == [tree["chair"]]
+    assert client.get(url.replace("per_page=1", "per_page=2")).status_code == 400
+    assert client.get(url.replace(f"/{tree['home']}/", f"/{tree['garden']}/")).status_code == 400
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def login(client, email):
+    with client.session_transaction() as session:
+        session["user"] = email
+
+
+def test_save_and_retrieve(cart_client):
+    response = cart_client.post("/cart/save", json={"user_id": "a@example.com",
+                                                    "cart": {"1": {"id": 1, "price": 3, "quantity": 2}}})
+    assert response.status_code == 200
+
+    body = cart_client.get("/cart/retrieve?user_id=a@example.com").get_json()
+    assert body["revision"] == 1
+    assert body["cart"]["1"]["quantity"] == 2
+
+
+def test_flush_requires_the_owner_to_be_logged_in(cart_client, cart_service):
+    cart_client.post("/cart/save", json={"user_id": "a@example.com", "cart": {"1": {"id": 1, "price": 3}}})
+
+    assert cart_client.post("/cart/flush", json={"user_id": "a@example.com"}).status_code == 401
+    login(cart_client, "b@example.com")
+    assert cart_client.post("/cart/flush", json={"user_id": "a@example.com"}).status_code == 403
+
+    login(cart_client, "a@example.com")
+    response = cart_client.post("/cart/flush", json={"user_id": "a@example.com"})
+    assert response.get_json()["flushed"] is True
+    assert cart_service.pending_count() == 0
+
+
+def test_stats_require_the_internal_token(cart_client):
+    assert cart_client.get("/cart/stats").status_code == 403
+    assert cart_client.get("/cart/stats", headers={"X-Internal-Token": "wrong"}).status_code == 403
+
+    response = cart_client.get("/cart/stats", headers={"X-Internal-Token": "internal-token"})
+    assert response.status_code == 200
+    assert response.get_json()["stats"]["failed_writes"] == 0
+
+
+def test_merge_requires_and_checks_base_revision(cart_client):
+    guest = {"7": {"id": 7, "price": "4.00", "quantity": 1}}
+    assert cart_client.post("/cart/merge", json={"user_id": "a@example.com", "guest_cart": guest}).status_code == 400
+
+    request = {"user_id": "a@example.com", "base_revision": 0, "guest_cart": guest}
+    response = cart_client.post("/cart/merge", json=request)
+    assert response.status_code == 200
+    assert response.get_json()["revision"] == 1
+
+    retried = cart_client.post("/cart/merge", json=request)
+    assert retried.status_code == 409
+    assert retried.get_json()["revision"] == 1
+    assert cart_client.get("/cart/retrieve?user_id=a@example.com").get_json()["cart"]["7"]["quantity"] == 1
+
+
+def test_delta_conflict_reports_current_revision(cart_client):
+    operation = {"op": "add", "product": {"id": 1, "price": "2.00"}, "quantity": 1}
+    assert cart_client.post("/cart/delta", json={"user_id": "a@example.com", "base_revision": 0,
+                                                 "operations": [operation]}).status_code == 200
+    response = cart_client.post("/cart/delta", json={"user_id": "a@example.com", "base_revision": 0,
+                                                     "operations": [operation]})
+    assert response.status_code == 409
+    assert response.get_json()["revision"] == 1
+
+
+def test_retrieve_fills_in_current_product_details(cart_client, cart_service, add_products):
+    product_id, = add_products("Desk lamp", description="Adjustable", price=24.0)
+    cart_client.post("/cart/save", json={"user_id": "a@example.com",
+                                         "cart": {str(product_id): {"id": product_id, "price": "19.90",
+                                                                    "quantity": 2}}})
+    cart_service.flush_all()
+    cart_service.cache.invalidate("a@example.com")
+
+    line = cart_client.get("/cart/retrieve?user_id=a@example.com").get_json()["cart"][str(product_id)]
+    # The stored price snapshot and quantity win over the catalog's current values.
+    assert line == {"id": product_id, "name": "Desk lamp", "description": "Adjustable",
+                    "in_stock": True, "price": "19.90", "quantity": 2}
+
+
+def test_reprice_endpoint_requires_the_internal_token(cart_client, cart_service):
+    cart_client.post("/cart/save", json={"user_id": "u1", "cart": {"1": {"id": 1, "price": "2.00", "quantity": 1}}})
+    cart_service.flush_all()
+
+    assert cart_client.post("/cart/reprice", json={"prices": {"1": "2.25"}}).status_code == 403
+    response = cart_client.post("/cart/reprice", json={"prices": {"1": "2.25"}},
+                                headers={"X-Internal-Token": "internal-token"})
+    assert response.status_code == 200
+    assert response.get_json()["report"]["carts_changed"] == 1
+    assert cart_client.get("/cart/retrieve?user_id=u1").get_json()["cart"]["1"]["price"] == "2.25"
+
+
+def test_importing_the_cart_blueprints_creates_no_store(tmp_path):
+    environment = {key: value for key, value in os.environ.items() if key != "CART_DB"}
+    environment["PYTHONPATH"] = ROOT
+    subprocess.run([sys.executable, "-c", "import app.cart.async_cart_controller"],
+                   cwd=tmp_path, env=environment, check=True)
+
+    assert not (tmp_path / "carts.db").exists()
+
+
+def test_cart_store_is_built_on_first_use_from_app_config(app, monkeypatch, tmp_path):
+    from app.cart import cart_controller
+
+    monkeypatch.setattr(cart_controller, "cart_service", None)
+    app.config["CART_DB"] = str(tmp_path / "configured.db")
+    with app.app_context():
+        service = cart_controller.get_cart_service()
+        assert cart_controller.get_cart_service() is service
+    try:
+        assert (tmp_path / "configured.db").exists()
+    finally:
+        service.close()
@@ -0,0 +1,140 @@
+import pytest
+
+from app.products.pagination import encode_cursor
+
+
+@pytest.fixture
+def tree(app):
+    """
+    clothing > shoes > running, plus an unrelated root.
+    """
+    from app.products.views import categorization_service
+
+    with app.app_context():
+        clothing = categorization_service.create_category("clothing")
+        shoes = categorization_service.create_category("shoes", clothing)
+        running = categorization_service.create_category("running", shoes)
+        garden = categorization_service.create_category("garden")
+    return {"clothing": clothing, "shoes": shoes, "running": running, "garden": garden}
+
+
+def assign(client, product_id, *category_ids):
+    response = client.post(f"/products/{product_id}/categories", json={"category_ids": list(category_ids)})
+    assert response.status_code == 200
+
+
+def test_breadcrumb_runs_from_the_root(client, tree):
+    body = client.get(f"/products/categories/{tree['running']}/breadcrumb").get_json()
+
+    assert [category["name"] for category in body["breadcrumb"]] == ["clothing", "shoes", "running"]
+
+
+def test_breadcrumb_of_an_unknown_category_is_not_found(client, tree):
+    assert client.get("/products/categories/999/breadcrumb").status_code == 404
+
+
+def test_subtree_listing_includes_descendant_categories(client, add_products, tree):
+    trainer, boot, rake = add_products("trainer", "boot", "rake")
+    assign(client, trainer, tree["running"])
+    assign(client, boot, tree["shoes"])
+    assign(client, rake, tree["garden"])
+
+    def listed(category):
+        body = client.get(f"/products/categories/{tree[category]}/products").get_json()
+        return [product["id"] for product in body["results"]]
+
+    assert listed("clothing") == [trainer, boot]
+    assert listed("shoes") == [trainer, boot]
+    assert listed("running") == [trainer]
+    assert listed("garden") == [rake]
+
+
+def test_subtree_listing_pages_with_cursors(client, add_products, tree):
+    product_ids = add_products(*(f"shoe {number}" for number in range(5)))
+    for product_id in product_ids:
+        assign(client, product_id, tree["running"])
+
+    seen, cursor = [], None
+    while True:
+        url = f"/products/categories/{tree['clothing']}/products?per_page=2"
+        body = client.get(url + (f"&cursor={cursor}" if cursor else "")).get_json()
+        seen.extend(product["id"] for product in body["results"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == product_ids
+
+
+def test_subtree_listing_rejects_foreign_and_malformed_cursors(client, add_products, tree):
+    product_ids = add_products("shoe 1", "shoe 2")
+    for product_id in product_ids:
+        assign(client, product_id, tree["shoes"])
+    cursor = client.get(f"/products/categories/{tree['shoes']}/products?per_page=1").get_json()["next_cursor"]
+
+    assert client.get(f"/products/categories/{tree['garden']}/products?per_page=1&cursor={cursor}").status_code == 400
+    response = client.get(f"/products/categories/{tree['shoes']}/products?cursor={encode_cursor({'pos': 1})}")
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_creating_a_category_under_an_unknown_parent_fails(client, tree):
+    response = client.post("/products/categories", json={"name": "orphan", "parent_id": 999})
+
+    assert response.status_code == 400
+
+
+def test_bulk_assignment_replaces_categories(client, add_products, tree):
+    lamp, chair = add_products("Lamp", "Chair")
+    assign(client, lamp, tree["garden"])
+
+    response = client.post("/products/categories/bulk", json={"assignments": [
+        {"product_id": lamp, "category_ids": [tree["shoes"]]},
+        {"product_id": chair, "category_ids": []},
+        {"product_id": chair, "category_ids": [tree["running"]]},
+        {"product_id": 9999, "category_ids": [tree["shoes"]]},
+    ]})
+
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report["updated"], report["unchanged"], report["failed"]) == (2, 0, 1)
+    results = {result["product_id"]: result for result in report["results"]}
+    assert len(report["results"]) == 3
+    assert results[lamp]["added"] == [tree["shoes"]] and results[lamp]["removed"] == [tree["garden"]]
+    assert results[chair]["status"] == "updated"
+    assert results[9999]["error"] == "Product not found"
+
+
+def test_bulk_assignment_rejects_boolean_ids(client, add_products, tree):
+    (lamp,) = add_products("Lamp")
+
+    for entry in ({"product_id": True, "category_ids": [tree["shoes"]]},
+                  {"product_id": lamp, "category_ids": [True]}):
+        response = client.post("/products/categories/bulk", json={"assignments": [entry]})
+        assert response.status_code == 400
+
+
+def test_bulk_assignment_rolls_back_when_a_read_fails(app, add_products, tree, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    from app.common.extensions import db
+    from app.products.repositories import CategoryRepository
+
+    (lamp,) = add_products("Lamp")
+    with app.app_context():
+        real_scalars = db.session.scalars
+        calls = []
+
+        def failing_scalars(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OperationalError("SELECT", {}, Exception("database is locked"))
+            return real_scalars(*args, **kwargs)
+
+        rolled_back = []
+        monkeypatch.setattr(db.session, "scalars", failing_scalars)
+        real_rollback = db.session.rollback
+        monkeypatch.setattr(db.session, "rollback", lambda: (rolled_back.append(True), real_rollback()))
+        with pytest.raises(OperationalError):
+            CategoryRepository().replace_assignments({lamp: {tree["shoes"]}})
+        assert rolled_back == [True]
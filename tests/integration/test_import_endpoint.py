@@ -0,0 +1,47 @@
+import json
+
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+def test_import_reports_row_errors_and_inserts_valid_rows(client):
+    body = ndjson({"name": "mug", "description": "a mug", "price": 3},
+                  {"name": ["list"], "description": "bad name", "price": 3},
+                  {"name": "cup", "description": "a cup", "price": "NaN"},
+                  {"name": "mug", "description": "duplicate", "price": 3})
+
+    response = client.post("/products/import", data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report["processed"], report["inserted"], report["failed"]) == (4, 1, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert client.get("/products/search?q=mug").get_json()["pagination"]["total_count"] == 1
+
+
+def test_nan_json_price_is_rejected(client):
+    body = b'{"name": "cup", "description": "a cup", "price": NaN}'
+
+    report = client.post("/products/import", data=body, content_type="application/x-ndjson").get_json()
+
+    assert report["failed"] == 1
+
+
+def test_unreadable_csv_keeps_earlier_rows_and_reports_the_error(client):
+    # The body is decoded in chunks, so the rows before the bad bytes need to span a few of them.
+    rows = b"".join(b"mug %d,a mug,1\n" % number for number in range(2000))
+    body = b"name,description,price\n" + rows + b"\xff\xfe,broken,2\n"
+
+    response = client.post("/products/import", data=body, content_type="text/csv")
+
+    assert response.status_code == 400
+    report = response.get_json()
+    assert 0 < report["inserted"] < 2000
+    assert "Unreadable CSV" in report["error"]
+
+
+def test_add_product_rejects_a_non_string_name(client):
+    response = client.post("/products/add_product", json={"name": ["x"], "description": "d", "price": 1})
+
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+
+
+@pytest.fixture
+def lazy_app(monkeypatch):
+    from app import TestingConfig, create_app
+    from app.common.extensions import db
+    from app.common.models import Product
+    from app.products import views
+
+    monkeypatch.setattr(TestingConfig, "LAZY_BLUEPRINTS", True, raising=False)
+    application = create_app("testing")
+    with application.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Product(name="Lazy lamp", description="Desk lamp", price=20.0))
+        db.session.commit()
+    views.search_result_cache.clear()
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def test_blueprints_load_on_first_request(lazy_app):
+    loader = lazy_app.extensions["blueprint_loader"]
+    assert not loader.loaded
+    assert "products_bp" not in lazy_app.blueprints
+
+    response = lazy_app.test_client().get("/products/search?q=lamp")
+    assert response.status_code == 200
+    assert loader.loaded
+    # The on_loaded hook built the search index from the database.
+    assert [product["name"] for product in response.get_json()["results"]] == ["Lazy lamp"]
+
+
+def test_warmup_loads_deferred_blueprints(lazy_app):
+    from app.common.startup import warmup
+
+    warmup(lazy_app, freeze=False)
+    assert lazy_app.extensions["blueprint_loader"].loaded
+    assert "products_bp" in lazy_app.blueprints
+
+
+def test_warmup_disposes_the_async_engine_from_a_running_loop(lazy_app):
+    import asyncio
+
+    from app.common.startup import warmup
+
+    class AsyncEngine:
+        disposed = False
+
+        async def dispose(self):
+            self.disposed = True
+
+    engine = lazy_app.extensions["async_engine"] = AsyncEngine()
+
+    async def warm_up_in_loop():
+        warmup(lazy_app, freeze=False)
+
+    asyncio.run(warm_up_in_loop())
+    assert engine.disposed
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_client(app):
+    from app.common.extensions import db
+    from app.common.instrumentation import init_instrumentation
+
+    app.config["INTERNAL_API_TOKEN"] = "internal-token"
+    init_instrumentation(app, db)
+    return app.test_client()
+
+
+def test_metrics_require_the_internal_token(metrics_client):
+    assert metrics_client.get("/internal/metrics").status_code == 403
+    assert metrics_client.get("/internal/metrics", headers={"X-Internal-Token": "wrong"}).status_code == 403
+
+
+def test_metrics_count_sql_per_endpoint(metrics_client, add_products):
+    add_products("Red shoe")
+    assert metrics_client.get("/products/search?q=shoe").status_code == 200
+    response = metrics_client.get("/internal/metrics", headers={"X-Internal-Token": "internal-token"})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'app_request_duration_seconds_count{endpoint="products_bp.search_products"} 1' in body
+    assert 'app_request_sql_statements_count{endpoint="products_bp.search_products"} 1' in body
@@ -0,0 +1,44 @@
+import sqlite3
+from pathlib import Path
+
+from app.common.models import Product
+
+MIGRATIONS = Path(__file__).resolve().parents[2] / "migrations"
+
+# The product table as it was before any migration in this folder.
+BASELINE_SCHEMA = """
+CREATE TABLE product (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(80) NOT NULL UNIQUE,
+    description TEXT NOT NULL,
+    price FLOAT NOT NULL
+);
+INSERT INTO product (name, description, price) VALUES ('Lamp', 'Desk lamp', 20.0);
+"""
+
+
+def migrated_product_columns():
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(BASELINE_SCHEMA)
+    for script in sorted(MIGRATIONS.glob("*.sql")):
+        connection.executescript(script.read_text())
+    columns = {row[1]: row for row in connection.execute("PRAGMA table_info(product)")}
+    return connection, columns
+
+
+def test_version_migration_adds_a_non_null_version():
+    connection, columns = migrated_product_columns()
+    assert columns["version"][3] == 1  # NOT NULL
+    assert not Product.__table__.columns["version"].nullable
+    assert connection.execute("SELECT version FROM product").fetchone() == (1,)
+
+
+def test_in_stock_migration_marks_existing_products_in_stock():
+    connection, columns = migrated_product_columns()
+    assert columns["in_stock"][3] == 1  # NOT NULL
+    assert connection.execute("SELECT in_stock FROM product").fetchone() == (1,)
+
+
+def test_migrations_produce_every_model_column():
+    _, columns = migrated_product_columns()
+    assert set(columns) == set(Product.__table__.columns.keys())
@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def reset_client(app, monkeypatch):
+    from app.auth import password_reset
+    from app.common.extensions import db
+    from app.common.models import User
+
+    sent = []
+    monkeypatch.setattr(password_reset, "send_reset_email", lambda email, token: sent.append(token))
+    monkeypatch.setattr(User, "set_password", lambda self, password: setattr(self, "password_hash", f"hashed:{password}"))
+    app.register_blueprint(password_reset.password_reset_bp)
+    with app.app_context():
+        db.session.add(User(email="user@example.com", password_hash="old"))
+        db.session.commit()
+    client = app.test_client()
+    client.sent = sent
+    return client
+
+
+def test_reset_token_can_only_be_used_once(app, reset_client):
+    from app.common.extensions import db
+    from app.common.models import User
+
+    response = reset_client.post("/request-password-reset", json={"email": "user@example.com"})
+    assert response.status_code == 200
+    token = reset_client.sent[0]
+
+    response = reset_client.post(f"/reset-password/{token}", json={"password": "new-password-1"})
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.execute(db.select(User.password_hash)).scalar() == "hashed:new-password-1"
+
+    response = reset_client.post(f"/reset-password/{token}", json={"password": "other-password-2"})
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.execute(db.select(User.password_hash)).scalar() == "hashed:new-password-1"
+
+
+def test_revocation_is_shared_through_the_database(app, reset_client):
+    from app.auth.reset_tokens import ResetTokenVerifier
+    from app.common import utils
+
+    reset_client.post("/request-password-reset", json={"email": "user@example.com"})
+    token = reset_client.sent[0]
+    other_worker = ResetTokenVerifier(utils.SECRET_KEY, utils._find_user_id,
+                                      shared_revoked=utils.DatabaseRevokedTokens())
+    with app.app_context():
+        assert other_worker.verify(token) is not None
+
+    assert reset_client.post(f"/reset-password/{token}", json={"password": "new-password-1"}).status_code == 200
+    with app.app_context():
+        assert other_worker.verify(token) is None
@@ -0,0 +1,30 @@
+def test_product_is_answered_with_304_for_matching_etag(client, add_products):
+    product_id, = add_products("Lamp")
+    response = client.get(f"/products/{product_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_listing_etag_changes_after_a_write(client, add_products):
+    add_products("Lamp")
+    etag = client.get("/products/").headers["ETag"]
+    assert client.get("/products/", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/products/add_product", json={"name": "Chair", "description": "Oak chair", "price": 50.0})
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.get_json()["results"]] == ["Lamp", "Chair"]
+
+
+def test_listing_cursor_is_bound_to_page_size(client, add_products):
+    add_products("A lamp", "B lamp", "C lamp")
+    first = client.get("/products/?per_page=2").get_json()
+    assert len(first["results"]) == 2
+
+    response = client.get(f"/products/?per_page=2&cursor={first['next_cursor']}")
+    assert [product["name"] for product in response.get_json()["results"]] == ["C lamp"]
+    assert client.get(f"/products/?per_page=3&cursor={first['next_cursor']}").status_code == 400
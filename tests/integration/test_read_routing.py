@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.fixture
+def routed_app(monkeypatch):
+    from app import TestingConfig, create_app
+    from app.common.extensions import db
+
+    monkeypatch.setattr(TestingConfig, "SQLITE_READ_ROUTING", True, raising=False)
+    monkeypatch.setattr(TestingConfig, "SQLITE_PRAGMAS", {"journal_mode": "WAL"}, raising=False)
+    monkeypatch.setattr(TestingConfig, "INSTRUMENTATION_ENABLED", True, raising=False)
+    monkeypatch.setattr(TestingConfig, "INTERNAL_API_TOKEN", "internal-token", raising=False)
+    application = create_app("testing")
+    with application.app_context():
+        db.drop_all()
+        db.create_all()
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.drop_all()
+    application.extensions["read_engine"].dispose()
+
+
+def test_read_session_is_shared_per_app_context_and_closed(routed_app):
+    from app.common.database import read_session
+
+    with routed_app.app_context():
+        session = read_session()
+        assert read_session() is session
+        assert session.get_bind() is routed_app.extensions["read_engine"]
+    with routed_app.app_context():
+        assert read_session() is not session
+
+
+def test_reads_on_the_read_engine_are_counted(routed_app):
+    from app.common.extensions import db
+    from app.common.models import Product
+
+    with routed_app.app_context():
+        db.session.add(Product(name="Lamp", description="Desk lamp", price=20.0))
+        db.session.commit()
+    client = routed_app.test_client()
+    assert client.get("/products/1").status_code == 200
+    body = client.get("/internal/metrics", headers={"X-Internal-Token": "internal-token"}).get_data(as_text=True)
+    assert 'app_request_sql_statements_sum{endpoint="products_bp.get_product"} 1' in body
@@ -0,0 +1,64 @@
+from app.products.pagination import encode_cursor
+
+
+def collect_pages(client, url):
+    ids, cursor = [], None
+    while True:
+        body = client.get(url + (f"&cursor={cursor}" if cursor else "")).get_json()
+        ids.extend(product["id"] for product in body["results"])
+        cursor = body["pagination"]["next_cursor"]
+        if cursor is None:
+            return ids, body
+
+
+def test_cursors_walk_every_match_once(client, add_products):
+    added = add_products(*(f"mug {number}" for number in range(7)))
+
+    ids, last_page = collect_pages(client, "/products/search?q=mug&per_page=3")
+
+    assert sorted(ids) == sorted(added)
+    assert last_page["pagination"]["total_count"] == 7
+
+
+def test_repository_cursors_walk_every_match_once(client, add_products):
+    from app.products.views import search_service
+
+    added = add_products(*(f"cup {number}" for number in range(5)))
+    search_service.search_index.is_ready = False
+    try:
+        ids, _ = collect_pages(client, "/products/search?q=cup&per_page=2")
+    finally:
+        search_service.search_index.is_ready = True
+
+    assert ids == sorted(added)
+
+
+def test_repository_matches_like_wildcards_literally(app, add_products):
+    from app.products.repositories import ProductRepository
+
+    add_products("50% off mug", "500 mugs", "cup_holder", "cup holder", "back\\slash", description="")
+    repository = ProductRepository()
+    with app.app_context():
+        def names(query):
+            return sorted(product["name"] for product in repository.search_page(query, 10)[0])
+
+        assert names("50%") == ["50% off mug"]
+        assert names("p_h") == ["cup_holder"]
+        assert names("k\\s") == ["back\\slash"]
+
+
+def test_cursor_without_an_id_is_a_bad_request(client, add_products):
+    add_products("mug 1", "mug 2")
+
+    response = client.get(f"/products/search?q=mug&cursor={encode_cursor({'pos': 1})}")
+
+    assert response.status_code == 400
+
+
+def test_cursor_cannot_be_reused_with_another_page_size(client, add_products):
+    add_products(*(f"mug {number}" for number in range(4)))
+    cursor = client.get("/products/search?q=mug&per_page=2").get_json()["pagination"]["next_cursor"]
+
+    assert client.get(f"/products/search?q=mug&per_page=2&cursor={cursor}").status_code == 200
+    assert client.get(f"/products/search?q=mug&per_page=3&cursor={cursor}").status_code == 400
+    assert client.get(f"/products/search?q=cup&per_page=2&cursor={cursor}").status_code == 400
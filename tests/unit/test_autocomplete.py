@@ -0,0 +1,97 @@
+from app.products import autocomplete
+from app.products.autocomplete import AutocompleteIndex, PrefixIndex, label_keys, normalize_prefix
+
+
+def make_index(*products):
+    index = AutocompleteIndex()
+    index.rebuild(products)
+    return index
+
+
+def names(suggestions):
+    return [product["name"] for product in suggestions["products"]]
+
+
+def test_prefixes_and_labels_are_normalized_alike():
+    assert normalize_prefix("  Red-RU") == "red ru"
+    assert normalize_prefix("red ") == "red "
+    assert label_keys("Red Running Shoe") == ("red running shoe", "running shoe", "shoe")
+
+
+def test_any_word_of_a_name_matches():
+    index = make_index({"id": 1, "name": "Red Running Shoe"}, {"id": 2, "name": "Rain Jacket"})
+
+    assert names(index.suggest("runn")) == ["Red Running Shoe"]
+    assert names(index.suggest("r")) == ["Rain Jacket", "Red Running Shoe"]
+    assert names(index.suggest("red ")) == ["Red Running Shoe"]
+    assert names(index.suggest("rain ")) == ["Rain Jacket"]
+    assert index.suggest("   ") == {"products": [], "categories": []}
+
+
+def test_viewed_products_rank_first_and_keep_their_views_across_rebuilds():
+    products = [{"id": product_id, "name": f"Mug {product_id}"} for product_id in range(1, 4)]
+    index = make_index(*products)
+    index.record_view(3)
+    index.record_view(3)
+    index.record_view(2)
+
+    assert names(index.suggest("mug", limit=2)) == ["Mug 3", "Mug 2"]
+    index.rebuild(products)
+    assert names(index.suggest("mug", limit=2)) == ["Mug 3", "Mug 2"]
+
+
+def test_categories_are_ranked_by_product_count():
+    index = make_index({"id": 1, "name": "Trail shoe", "categories": ["Shoes", "Sale"]},
+                       {"id": 2, "name": "Road shoe", "categories": ["Shoes"]})
+
+    assert index.suggest("s")["categories"] == [{"name": "Shoes", "product_count": 2},
+                                                {"name": "Sale", "product_count": 1}]
+
+    index.add_product({"id": 1, "name": "Trail shoe", "categories": ["Shoes"]})
+    index.remove_product(2)
+    assert index.suggest("s")["categories"] == [{"name": "Shoes", "product_count": 1}]
+    assert names(index.suggest("road")) == []
+
+
+def test_cached_top_lists_follow_updates(monkeypatch):
+    monkeypatch.setattr(autocomplete, "SCAN_LIMIT", 2)
+    index = PrefixIndex()
+    index.rebuild((entry_id, f"lamp {entry_id}", 0) for entry_id in range(10))
+    assert [entry.id for entry in index.top("lamp", 3)] == [0, 1, 2]
+
+    index.set_score(7, 5)
+    index.put(20, "lamp twenty", 3)
+    assert [entry.id for entry in index.top("lamp", 3)] == [7, 20, 0]
+
+    index.set_score(7, 0)
+    index.remove(20)
+    assert [entry.id for entry in index.top("lamp", 3)] == [0, 1, 2]
+    assert len(index) == 10
+
+
+def test_score_updates_only_check_cached_prefix_lengths(monkeypatch):
+    monkeypatch.setattr(autocomplete, "SCAN_LIMIT", 2)
+    index = PrefixIndex()
+    index.rebuild((entry_id, f"extraordinarily long lamp {entry_id}", 0) for entry_id in range(10))
+    index.top("extraord", 3)
+    entry = index._by_id[7]
+
+    checked = index._cached_prefixes(entry)
+    assert sorted(index._cached_lengths) == [1, 2, 8]
+    assert sorted(checked) == ["e", "ex", "extraord", "l", "la", "lo"]
+
+    index.set_score(7, 5)
+    assert [candidate.id for candidate in index.top("extraord", 2)] == [7, 0]
+    index.set_score(7, 0)
+    assert [candidate.id for candidate in index.top("extraord", 2)] == [0, 1]
+    assert index._cached_lengths == {8: 1}  # lists holding the demoted entry were dropped
+
+
+def test_autocomplete_endpoint_validates_its_parameters(client, add_products):
+    add_products("Desk lamp", "Floor lamp")
+
+    assert client.get("/products/autocomplete?q=%20").status_code == 400
+    assert client.get("/products/autocomplete?q=lamp&limit=0").status_code == 400
+    response = client.get("/products/autocomplete?q=lam&limit=5")
+    assert response.status_code == 200
+    assert sorted(names(response.get_json())) == ["Desk lamp", "Floor lamp"]
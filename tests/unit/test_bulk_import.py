@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+from app.products.bulk_import import BulkImportError, iter_records, validate_product_payload
+
+
+def valid(**overrides):
+    return {"name": "mug", "description": "a mug", "price": 4.5, **overrides}
+
+
+def test_valid_payload():
+    assert validate_product_payload(valid()) is None
+
+
+@pytest.mark.parametrize("overrides", [
+    {"name": ["mug"]},
+    {"name": {"en": "mug"}},
+    {"description": 7},
+    {"price": float("nan")},
+    {"price": float("inf")},
+    {"price": True},
+    {"price": "4.5"},
+    {"price": -1},
+    {"in_stock": "yes"},
+])
+def test_invalid_payloads(overrides):
+    assert validate_product_payload(valid(**overrides)) is not None
+
+
+def test_ndjson_rows_and_parse_errors():
+    body = io.BytesIO(b'{"name": "a"}\n\nnot json\n[1]\n')
+
+    rows = list(iter_records(body, "application/x-ndjson"))
+
+    assert [(number, error is None) for number, _, error in rows] == [(1, True), (2, False), (3, False)]
+
+
+def test_csv_values_are_converted():
+    body = io.BytesIO(b"name,description,price,in_stock\nmug,a mug,4.5,no\n")
+
+    (_, record, error), = iter_records(body, "text/csv; charset=utf-8")
+
+    assert error is None
+    assert record == {"name": "mug", "description": "a mug", "price": 4.5, "in_stock": False}
+
+
+def test_unreadable_csv_raises_an_import_error():
+    body = io.BytesIO(b"name,description,price\nmug,a mug,1\n\xff\xfe,broken,2\n")
+
+    with pytest.raises(BulkImportError):
+        list(iter_records(body, "text/csv"))
+
+
+def test_unsupported_content_type():
+    with pytest.raises(BulkImportError):
+        iter_records(io.BytesIO(b""), "application/xml")
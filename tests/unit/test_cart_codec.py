@@ -0,0 +1,92 @@
+import pytest
+
+from app.cart.cart_codec import CartCodecError, decode_cart, decode_cart_lines, encode_cart, is_encoded_cart
+from app.cart.cart_repository import CartRepository
+from app.cart.cart_store import SQLiteCartStore
+
+
+def test_round_trip_keeps_ids_quantities_and_exact_prices():
+    cart = {
+        "1": {"id": 1, "price": "19.90", "quantity": 2, "name": "Lamp"},
+        "sku-9": {"id": "sku-9", "price": 0.1, "quantity": 1},
+        "42": {"id": "42", "price": 5, "quantity": 3},
+    }
+    blob = encode_cart(cart)
+    assert is_encoded_cart(blob)
+    assert decode_cart(blob) == {
+        "1": {"id": 1, "price": "19.90", "quantity": 2},
+        "sku-9": {"id": "sku-9", "price": "0.1", "quantity": 1},
+        "42": {"id": "42", "price": "5", "quantity": 3},
+    }
+
+
+def test_large_carts_are_compressed():
+    cart = {str(index): {"id": index, "price": "1.00", "quantity": 1} for index in range(200)}
+    blob = encode_cart(cart)
+    assert blob[3] & 0x01
+    assert len(decode_cart_lines(blob)) == 200
+
+
+@pytest.mark.parametrize("cart", [
+    {"1": {"id": 1}},
+    {"1": {"id": 1, "price": "NaN"}},
+    {"1": {"id": 1, "price": "1", "quantity": -1}},
+])
+def test_invalid_lines_are_rejected(cart):
+    with pytest.raises(CartCodecError):
+        encode_cart(cart)
+
+
+def test_corrupt_blobs_are_rejected():
+    blob = encode_cart({"1": {"id": 1, "price": "1", "quantity": 1}})
+    with pytest.raises(CartCodecError):
+        decode_cart(blob[:-3])
+    with pytest.raises(CartCodecError):
+        decode_cart(blob[:2] + b"\x09" + blob[3:])
+
+
+def catalog(known):
+    return lambda product_ids: {product_id: {"id": int(product_id), "name": f"Product {product_id}"}
+                                for product_id in product_ids if product_id in known}
+
+
+class LegacyStore:
+    """
+    Store returning a cart record written before the encoding existed.
+    """
+
+    def __init__(self, cart):
+        self.record = {"user_id": "u1", "data": cart, "revision": 4}
+
+    def get(self, table, query):
+        return dict(self.record)
+
+    def save(self, table, record):
+        self.record = dict(record)
+
+
+def test_legacy_cart_is_migrated_only_when_details_can_be_restored():
+    legacy = {"1": {"id": 1, "price": 2, "quantity": 1, "name": "Old name"},
+              "2": {"id": 2, "price": 3, "quantity": 1, "name": "Discontinued"}}
+    store = LegacyStore(legacy)
+
+    cart, revision = CartRepository(store, product_loader=catalog({"1"})).get_cart_with_revision("u1")
+    assert revision == 4
+    assert cart["2"]["name"] == "Discontinued"
+    assert store.record["data"] == legacy
+
+    repository = CartRepository(store, product_loader=catalog({"1", "2"}))
+    repository.get_cart_with_revision("u1")
+    assert is_encoded_cart(store.record["data"])
+    assert store.record["revision"] == 4
+    assert repository.get_cart("u1")["2"] == {"id": 2, "price": "3", "quantity": 1, "name": "Product 2"}
+
+
+def test_failing_loader_leaves_cart_unhydrated():
+    def broken(product_ids):
+        raise RuntimeError("catalog unavailable")
+
+    store = SQLiteCartStore(":memory:")
+    repository = CartRepository(store, product_loader=broken)
+    repository.save_cart("u1", {"1": {"id": 1, "price": "2.50", "quantity": 1}}, revision=1)
+    assert repository.get_cart("u1") == {"1": {"id": 1, "price": "2.50", "quantity": 1}}
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+import pytest
+
+from app.cart.cart_cache import CartCache
+from app.cart.cart_repository import CartRepository
+from app.cart.cart_repricing import CartRepricer, np
+from app.cart.cart_service import CartService
+from app.cart.cart_store import SQLiteCartStore
+
+ENGINES = [False] + ([True] if np is not None else [])
+
+
+def line(product_id, price, quantity=1):
+    return {str(product_id): {"id": product_id, "price": price, "quantity": quantity}}
+
+
+@pytest.fixture
+def store():
+    return SQLiteCartStore(":memory:")
+
+
+@pytest.fixture
+def service(store):
+    service = CartService(CartRepository(store), cache=CartCache(), write_behind_delay=60.0)
+    yield service
+    service.close()
+
+
+def test_scan_pages_through_every_cart(store):
+    repository = CartRepository(store)
+    for user_id in ["u3", "u1", "u5", "u2", "u4"]:
+        repository.save_cart(user_id, line(1, "1.00"), revision=1)
+
+    assert [record["user_id"] for record in store.scan("cart", page_size=2)] == ["u1", "u2", "u3", "u4", "u5"]
+    assert [len(batch) for batch in repository.iter_encoded_batches(2)] == [2, 2, 1]
+
+
+@pytest.mark.parametrize("use_numpy", ENGINES)
+def test_reprice_writes_through_the_service(service, store, use_numpy):
+    repository = CartRepository(store)
+    repository.save_cart("u1", {**line(1, "2.00", 3), **line(2, "5.00")}, revision=4)
+    repository.save_cart("u2", line(2, "5.00"), revision=1)
+    assert service.retrieve_cart_with_revision("u1")[1] == 4  # cached before the price change
+
+    repriced = []
+    report = CartRepricer(service, use_numpy=use_numpy).reprice(
+        {1: "2.50"}, on_repriced=lambda *args: repriced.append(args))
+
+    assert report["carts_scanned"] == 2
+    assert report["carts_changed"] == 1
+    assert report["lines_repriced"] == 1
+    assert repriced == [("u1", Decimal("11.00"), Decimal("12.50"))]
+    cart_data, revision = service.retrieve_cart_with_revision("u1")
+    assert revision == 5
+    assert Decimal(str(cart_data["1"]["price"])) == Decimal("2.50")
+    stored, stored_revision = repository.get_cart_with_revision("u1")
+    assert stored_revision == 5
+    assert Decimal(stored["1"]["price"]) == Decimal("2.50")
+    assert stored["2"]["price"] == "5.00"
+
+
+def test_carts_changed_since_the_scan_are_not_overwritten(service, store):
+    repository = CartRepository(store)
+    repository.save_cart("u1", line(1, "2.00"), revision=1)
+    assert service.retrieve_cart_with_revision("u1")[1] == 1
+
+    class RacingRepricer(CartRepricer):
+        def _write_back(self, user_id, blob, revision, new_prices):
+            # Another worker saves the cart between the scan and the write-back.
+            repository.save_cart(user_id, line(1, "2.00", 7), revision=2)
+            return super()._write_back(user_id, blob, revision, new_prices)
+
+    report = RacingRepricer(service, use_numpy=False).reprice({1: "3.00"})
+
+    assert report["carts_changed"] == 0
+    assert report["carts_conflicted"] == 1
+    stored, revision = repository.get_cart_with_revision("u1")
+    assert (revision, stored["1"]["quantity"], stored["1"]["price"]) == (2, 7, "2.00")
+    assert service.retrieve_cart_with_revision("u1")[1] == 2
+
+
+def test_queued_saves_are_not_replaced_by_a_reprice(service, store):
+    CartRepository(store).save_cart("u1", line(1, "2.00"), revision=1)
+    service.save_cart("u1", line(1, "2.00", 4))
+
+    report = CartRepricer(service, use_numpy=False).reprice({1: "3.00"})
+
+    assert report["carts_conflicted"] == 1
+    assert service.retrieve_cart_with_revision("u1")[0]["1"]["quantity"] == 4
+    service.flush_all()
+    assert CartRepository(store).get_cart_with_revision("u1")[1] == 2
+
@@ -0,0 +1,210 @@
+import pytest
+
+from app.cart import cart_service as cart_service_module
+from app.cart.cart_cache import CartCache
+from app.cart.cart_repository import CartRepository
+from app.cart.cart_service import CartRevisionConflictError, CartService
+from app.cart.cart_store import SQLiteCartStore
+from app.cart.shopping_cart import ShoppingCart
+
+
+class FlakyStore(SQLiteCartStore):
+    """
+    In-memory store whose saves fail while ``failing`` is set.
+    """
+
+    def __init__(self):
+        super().__init__(":memory:")
+        self.failing = False
+        self.saves = 0
+
+    def save(self, table, record):
+        if self.failing:
+            raise OSError("disk unavailable")
+        self.saves += 1
+        return super().save(table, record)
+
+
+def cart(quantity=1):
+    return {"1": {"id": 1, "price": "2.50", "quantity": quantity}}
+
+
+@pytest.fixture
+def store():
+    return FlakyStore()
+
+
+@pytest.fixture
+def service(store):
+    service = CartService(CartRepository(store), cache=CartCache(), write_behind_delay=60.0)
+    yield service
+    store.failing = False
+    service.close()
+
+
+def test_write_behind_requires_a_repository():
+    with pytest.raises(ValueError):
+        CartService(None, cache=CartCache(), write_behind_delay=1.0)
+
+
+def test_saves_are_coalesced_into_one_write(service, store):
+    for quantity in range(1, 4):
+        service.save_cart("u1", cart(quantity))
+
+    assert store.saves == 0
+    assert service.retrieve_cart_with_revision("u1") == (cart(3), 3)
+    assert service.flush_all() == 1
+    assert store.saves == 1
+    assert CartRepository(store).get_cart_with_revision("u1")[1] == 3
+
+
+def test_failed_flushes_back_off_and_keep_the_cart(service, store):
+    service.save_cart("u1", cart())
+    store.failing = True
+
+    assert service.flush_all() == 0
+    assert service.failed_flush_count() == 1
+    # The retry is not due yet, so nothing is attempted.
+    assert service.flush_all() == 0
+    assert service.pending_count() == 1
+    assert service.retrieve_cart_with_revision("u1") == (cart(), 1)
+
+
+def test_saves_are_written_through_while_a_flush_is_failing(service, store):
+    service.save_cart("u1", cart())
+    store.failing = True
+    service.flush_all()
+
+    with pytest.raises(OSError):
+        service.save_cart("u1", cart(2))
+
+    store.failing = False
+    assert service.save_cart("u1", cart(3)) == 2
+    assert service.pending_count() == 0
+    assert service.failed_flush_count() == 0
+    stored, revision = CartRepository(store).get_cart_with_revision("u1")
+    assert (stored["1"]["quantity"], revision) == (3, 2)
+
+
+def test_automatic_retries_stop_after_the_attempt_limit(service, store, monkeypatch):
+    monkeypatch.setattr(cart_service_module, "FLUSH_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(cart_service_module, "MAX_FLUSH_ATTEMPTS", 2)
+    service.save_cart("u1", cart())
+    store.failing = True
+
+    service.flush_all()
+    service.flush_all()
+    store.failing = False
+    assert service.flush_all() == 0
+
+    assert service.flush_all(retry_failed=True) == 1
+    assert service.failed_flush_count() == 0
+
+
+def add(product_id, quantity=1):
+    return {"op": "add", "product": {"id": product_id, "price": "1.00"}, "quantity": quantity}
+
+
+def test_save_if_revision_only_replaces_the_expected_revision():
+    store = SQLiteCartStore(":memory:")
+    record = {"user_id": "u1", "data": b"\x01", "format": 1, "revision": 1}
+    assert store.save_if_revision("cart", record, 0)
+    assert not store.save_if_revision("cart", {**record, "revision": 2}, 0)
+    assert not store.save_if_revision("cart", {**record, "revision": 2}, 5)
+    assert store.save_if_revision("cart", {**record, "revision": 2}, 1)
+    assert store.get("cart", {"user_id": "u1"})["revision"] == 2
+    assert not store.save_if_revision("cart", {**record, "user_id": "u2", "revision": 4}, 3)
+
+
+def test_delta_against_a_stale_worker_copy_is_rejected(store):
+    first = CartService(CartRepository(store), cache=CartCache())
+    second = CartService(CartRepository(store), cache=CartCache())
+    first.apply_delta("u1", 0, [add(1)])
+    assert second.retrieve_cart_with_revision("u1")[1] == 1  # cached by the second worker
+    first.apply_delta("u1", 1, [add(2)])
+
+    with pytest.raises(CartRevisionConflictError) as conflict:
+        second.apply_delta("u1", 1, [add(3)])
+    assert conflict.value.current_revision == 2
+    cart_data, revision = second.apply_delta("u1", 2, [add(3)])
+    assert revision == 3
+    assert sorted(CartRepository(store).get_cart("u1")) == ["1", "2", "3"]
+
+
+def test_delta_writes_a_queued_cart_through(service, store):
+    service.save_cart("u1", cart())
+    assert service.apply_delta("u1", 1, [add(2)])[1] == 2
+    assert service.pending_count() == 0
+    assert sorted(CartRepository(store).get_cart("u1")) == ["1", "2"]
+
+
+def test_retried_merge_is_not_applied_twice(service):
+    guest = ShoppingCart.from_dict({"5": {"id": 5, "price": "3.00", "quantity": 2}})
+    merged, revision = service.merge_guest_cart("u1", guest, 0)
+    assert revision == 1
+
+    with pytest.raises(CartRevisionConflictError):
+        service.merge_guest_cart("u1", guest, 0)
+    assert service.retrieve_cart("u1")["5"]["quantity"] == 2
+
+
+def test_async_write_behind_save_runs_off_the_event_loop(service, monkeypatch):
+    import asyncio
+    import threading
+
+    save_threads = []
+    save_cart = service.save_cart
+
+    def recording_save(user_id, cart_data):
+        save_threads.append(threading.current_thread())
+        return save_cart(user_id, cart_data)
+
+    monkeypatch.setattr(service, "save_cart", recording_save)
+
+    assert asyncio.run(service.save_cart_async("u1", cart(2))) == 1
+    assert save_threads and save_threads[0] is not threading.main_thread()
+    assert service.retrieve_cart("u1")["1"]["quantity"] == 2
+    assert service.pending_count() == 1
+
+
+def test_store_refuses_to_move_a_revision_backwards():
+    store = SQLiteCartStore(":memory:")
+    record = {"user_id": "u1", "data": b"\x01", "format": 1, "revision": 3}
+    assert store.save("cart", record)
+    assert not store.save("cart", {**record, "data": b"\x02", "revision": 2})
+    assert store.save("cart", {**record, "data": b"\x03"})
+    assert store.save("cart", {key: value for key, value in record.items() if key != "revision"})
+    assert store.get("cart", {"user_id": "u1"})["revision"] == 3
+
+
+def test_flush_racing_a_delta_does_not_overwrite_it(service, store, monkeypatch):
+    import threading
+
+    service.save_cart("u1", cart())
+    save_if_revision = store.save_if_revision
+    flusher = threading.Thread(target=service.flush_all)
+
+    def racing_save_if_revision(table, record, expected_revision):
+        # The background flush takes the queued cart while the delta is being written.
+        flusher.start()
+        flusher.join(0.2)
+        return save_if_revision(table, record, expected_revision)
+
+    monkeypatch.setattr(store, "save_if_revision", racing_save_if_revision)
+    assert service.apply_delta("u1", 1, [add(2)])[1] == 2
+    flusher.join()
+
+    stored, revision = CartRepository(store).get_cart_with_revision("u1")
+    assert revision == 2
+    assert sorted(stored) == ["1", "2"]
+    assert service.pending_count() == 0
+
+
+def test_stale_queued_cart_is_dropped_when_a_newer_one_is_stored(service, store):
+    service.save_cart("u1", cart(1))
+    CartRepository(store).save_cart("u1", cart(9), revision=5)  # another worker
+
+    assert service.flush_all() == 0
+    assert service.pending_count() == 0
+    assert service.retrieve_cart_with_revision("u1")[1] == 5
+    assert service.retrieve_cart("u1")["1"]["quantity"] == 9
@@ -0,0 +1,147 @@
+import smtplib
+import sqlite3
+import time
+
+import pytest
+
+from app.common.email_outbox import EmailOutbox, OutboxStore
+
+
+class FakeSMTP:
+    """
+    SMTP client recording delivered messages; ``fail_with`` makes ``sendmail`` raise.
+    """
+
+    def __init__(self, delivered, fail_with=None):
+        self.delivered = delivered
+        self.fail_with = fail_with
+
+    def sendmail(self, sender, recipient, message):
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.delivered.append((recipient, message))
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSMTPFactory:
+    def __init__(self):
+        self.delivered = []
+        self.timeouts = []
+        self.fail_with = None
+
+    def __call__(self, host, port, timeout=None):
+        self.timeouts.append(timeout)
+        return FakeSMTP(self.delivered, self.fail_with)
+
+
+def make_outbox(factory, store=None, **options):
+    options.setdefault("workers", 1)
+    options.setdefault("backoff_seconds", 0.01)
+    options.setdefault("idle_timeout", 0.05)
+    return EmailOutbox(store=store or OutboxStore(), smtp_factory=factory, **options)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_delivers_message_with_timeout_and_clears_spool():
+    factory = FakeSMTPFactory()
+    outbox = make_outbox(factory, smtp_timeout=7.0)
+    outbox.start()
+    try:
+        outbox.send("user@example.com", "Grüße", "Hallo, Welt")
+        assert wait_until(lambda: outbox.metrics()["sent"] == 1)
+    finally:
+        outbox.stop()
+    assert factory.timeouts == [7.0]
+    assert factory.delivered[0][0] == "user@example.com"
+    assert outbox.store.pending() == []
+
+
+def test_transient_failure_is_retried():
+    factory = FakeSMTPFactory()
+    factory.fail_with = smtplib.SMTPServerDisconnected("gone")
+    outbox = make_outbox(factory)
+    outbox.start()
+    try:
+        outbox.send("user@example.com", "Hi", "Body")
+        assert wait_until(lambda: outbox.metrics()["retried"] >= 1)
+        factory.fail_with = None
+        assert wait_until(lambda: outbox.metrics()["sent"] == 1)
+    finally:
+        outbox.stop()
+    assert outbox.metrics()["failed"] == 0
+
+
+def test_permanent_rejection_is_not_retried():
+    factory = FakeSMTPFactory()
+    factory.fail_with = smtplib.SMTPRecipientsRefused({"user@example.com": (550, b"No such user")})
+    outbox = make_outbox(factory)
+    outbox.start()
+    try:
+        outbox.send("user@example.com", "Hi", "Body")
+        assert wait_until(lambda: outbox.metrics()["failed"] == 1)
+    finally:
+        outbox.stop()
+    assert outbox.metrics()["retried"] == 0
+    assert outbox.store.pending() == []
+
+
+class BrokenStore(OutboxStore):
+    """
+    Spool whose first ``claim`` raises, as a locked or corrupt database would.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.broken = True
+
+    def claim(self, message_id):
+        if self.broken:
+            self.broken = False
+            raise sqlite3.OperationalError("database is locked")
+        return super().claim(message_id)
+
+
+def test_worker_survives_spool_errors():
+    factory = FakeSMTPFactory()
+    outbox = make_outbox(factory, store=BrokenStore())
+    outbox.start()
+    try:
+        outbox.send("first@example.com", "Hi", "Body")
+        outbox.send("second@example.com", "Hi", "Body")
+        assert wait_until(lambda: outbox.metrics()["sent"] == 1)
+        assert all(thread.is_alive() for thread in outbox._threads)
+    finally:
+        outbox.stop()
+    assert [recipient for recipient, _ in factory.delivered] == ["second@example.com"]
+
+
+def test_start_only_replays_messages_with_expired_leases(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    live = OutboxStore(path)
+    dead = OutboxStore(path, lease_seconds=-1.0)
+    live.add("live@example.com", "Hi", "Body")
+    dead.add("dead@example.com", "Hi", "Body")
+
+    factory = FakeSMTPFactory()
+    outbox = make_outbox(factory, store=OutboxStore(path))
+    outbox.start()
+    try:
+        assert wait_until(lambda: outbox.metrics()["sent"] == 1)
+    finally:
+        outbox.stop()
+    assert [recipient for recipient, _ in factory.delivered] == ["dead@example.com"]
+    assert [message["recipient"] for message in live.pending()] == ["live@example.com"]
+    assert not OutboxStore(path).claim(live.pending()[0]["id"])
@@ -0,0 +1,34 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from app.common.instrumentation import LatencyHistogram, _after_cursor_execute, _before_cursor_execute
+
+
+def test_histogram_percentiles_are_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for value in range(1, 10001):
+        histogram.record(value)
+    percentiles = histogram.percentiles()
+    assert abs(percentiles[0.5] - 5000) / 5000 < 0.04
+    assert abs(percentiles[0.99] - 9900) / 9900 < 0.04
+    assert histogram.count == 10000 and histogram.max == 10000
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in (0, 1, 2, 3):
+        histogram.record(value)
+    assert histogram.percentiles((0.25, 1.0)) == {0.25: 0, 1.0: 3}
+
+
+def test_failed_statement_leaves_no_start_time_behind():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    with engine.connect() as connection:
+        try:
+            connection.execute(text("SELECT * FROM missing_table"))
+        except OperationalError:
+            pass
+        connection.execute(text("SELECT 1"))
+        assert "query_start_time" not in connection.connection.info
@@ -0,0 +1,60 @@
+import datetime
+import decimal
+import json
+import uuid
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.common.json_provider import FastJSONProvider, dumps_bytes, stream_json_array
+
+VALUES = {
+    "when": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+    "day": datetime.date(2024, 5, 1),
+    "price": decimal.Decimal("2.50"),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "text": "naïve",
+}
+
+
+def test_encoding_matches_flask_default_provider():
+    app = Flask(__name__)
+    expected = json.loads(DefaultJSONProvider(app).dumps(VALUES))
+    assert json.loads(dumps_bytes(VALUES)) == expected
+    assert json.loads(FastJSONProvider(app).dumps(VALUES)) == expected
+    assert expected["when"] == "Wed, 01 May 2024 12:30:00 GMT"
+
+
+def test_both_encoders_write_non_ascii_as_utf8(monkeypatch):
+    from app.common import json_provider
+
+    encoded = dumps_bytes({"text": "naïve"})
+    monkeypatch.setattr(json_provider, "orjson", None)
+    assert dumps_bytes({"text": "naïve"}) == encoded == '{"text":"naïve"}'.encode("utf-8")
+
+
+def read_stream(response):
+    return json.loads(b"".join(response.response))
+
+
+def test_stream_json_array_encodes_head_items_and_tail():
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = stream_json_array(iter(range(250)), key="items", head={"kind": "n"},
+                                     tail=lambda: {"count": 250})
+        assert read_stream(response) == {"kind": "n", "items": list(range(250)), "count": 250}
+
+
+def test_stream_failure_ends_with_an_error_member():
+    def items():
+        yield from range(150)
+        raise RuntimeError("database went away")
+
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = stream_json_array(items(), key="items", tail=lambda: {"count": 150})
+        body = read_stream(response)
+    assert response.status_code == 200
+    assert body["items"] == list(range(150))
+    assert body["count"] == 150
+    assert "incomplete" in body["error"]
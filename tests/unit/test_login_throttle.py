@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from app.auth.login_throttle import InMemoryThrottleBackend, LoginThrottle, SQLiteThrottleBackend
+from app.common.custom_exceptions import LoginThrottledError
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryThrottleBackend(shards=4)
+    return SQLiteThrottleBackend(str(tmp_path / "throttle.db"))
+
+
+def make_throttle(backend, clock=None, **limits):
+    limits.setdefault("account_limit", 3)
+    limits.setdefault("ip_limit", 10)
+    return LoginThrottle(backend, window_seconds=60.0, clock=clock or FakeClock(), **limits)
+
+
+def test_reserve_rejects_attempts_over_the_account_limit(backend):
+    throttle = make_throttle(backend)
+    assert [throttle.reserve("User@example.com") for _ in range(3)] == [1, 2, 3]
+    with pytest.raises(LoginThrottledError):
+        throttle.reserve("user@example.com ")
+
+
+def test_success_and_release_uncount_attempts(backend):
+    throttle = make_throttle(backend, ip_limit=2)
+    throttle.reserve("a@example.com", "10.0.0.1")
+    throttle.release("a@example.com", "10.0.0.1")
+    throttle.reserve("a@example.com", "10.0.0.1")
+    throttle.record_success("a@example.com", "10.0.0.1")
+    assert throttle.reserve("a@example.com", "10.0.0.1") == 1
+    throttle.reserve("b@example.com", "10.0.0.1")
+    with pytest.raises(LoginThrottledError):
+        throttle.reserve("c@example.com", "10.0.0.1")
+    # The rejected attempt was not counted against the other account either.
+    assert throttle.reserve("c@example.com", "10.0.0.2") == 1
+
+
+def test_concurrent_attempts_cannot_exceed_the_limit(backend):
+    throttle = make_throttle(backend, account_limit=5)
+    admitted = []
+    barrier = threading.Barrier(20)
+
+    def attempt():
+        barrier.wait()
+        try:
+            throttle.reserve("target@example.com")
+            admitted.append(True)
+        except LoginThrottledError:
+            pass
+
+    threads = [threading.Thread(target=attempt) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 5
+
+
+def test_counters_expire_after_two_windows(backend):
+    clock = FakeClock()
+    throttle = make_throttle(backend, clock=clock)
+    for _ in range(3):
+        throttle.reserve("a@example.com")
+    clock.now += 120.0
+    assert throttle.reserve("a@example.com") == 1
+
+
+def test_sqlite_backend_purges_on_write(tmp_path):
+    backend = SQLiteThrottleBackend(str(tmp_path / "throttle.db"), purge_every=2)
+    clock = FakeClock()
+    throttle = make_throttle(backend, clock=clock)
+    throttle.reserve("old@example.com")
+    clock.now += 180.0
+    throttle.reserve("new@example.com")
+    keys = [row[0] for row in backend._connection().execute("SELECT key FROM login_throttle")]
+    assert keys == ["account:new@example.com"]
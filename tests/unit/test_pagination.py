@@ -0,0 +1,53 @@
+import pytest
+
+from app.products.pagination import (CountCache, InvalidCursorError, cursor_scope, decode_cursor,
+                                     encode_cursor, total_pages)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor({"pos": 20, "id": 7, "s": 1.5})
+
+    assert decode_cursor(token) == {"pos": 20, "id": 7, "s": 1.5}
+
+
+@pytest.mark.parametrize("position", [
+    {"pos": 1},
+    {"pos": 1, "id": "7"},
+    {"pos": True, "id": 7},
+    {"pos": -1, "id": 7},
+    {"pos": 1, "id": 7, "s": "high"},
+])
+def test_malformed_positions_are_rejected(position):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor(position))
+
+
+def test_garbage_token_is_rejected():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not a cursor!")
+
+
+def test_cursor_is_only_accepted_for_its_scope():
+    scope = cursor_scope("search", ["shoe"], 10)
+    token = encode_cursor({"pos": 10, "id": 3}, scope)
+
+    assert decode_cursor(token, scope)["id"] == 3
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token, cursor_scope("search", ["shoe"], 20))
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token)
+
+
+def test_total_pages():
+    assert total_pages(0, 10) == 0
+    assert total_pages(10, 10) == 1
+    assert total_pages(11, 10) == 2
+
+
+def test_count_cache_normalizes_queries():
+    cache = CountCache()
+    cache.set("Red  Shoe", 4)
+
+    assert cache.get("red shoe") == 4
+    cache.clear()
+    assert cache.get("red shoe") is None
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.auth.password_hashing import HashingUnavailableError, PasswordHasher
+
+FAST_METHOD = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=1, max_pending=1, queue_timeout=0.1, method=FAST_METHOD)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    password_hash = hasher.hash_password("s3cret-pass")
+    assert password_hash.startswith(FAST_METHOD + "$")
+    assert hasher.verify_password(password_hash, "s3cret-pass") == (True, None)
+    assert hasher.verify_password(password_hash, "wrong") == (False, None)
+
+
+def test_outdated_hash_is_replaced(hasher):
+    old_hash = generate_password_hash("s3cret-pass", method="pbkdf2:sha256:500")
+    verified, new_hash = hasher.verify_password(old_hash, "s3cret-pass")
+    assert verified
+    assert new_hash.startswith(FAST_METHOD + "$")
+
+
+def test_rehash_is_skipped_when_pool_is_busy(hasher, monkeypatch):
+    def busy(password):
+        raise HashingUnavailableError("busy")
+
+    monkeypatch.setattr(hasher, "hash_password", busy)
+    old_hash = generate_password_hash("s3cret-pass", method="pbkdf2:sha256:500")
+    assert hasher.verify_password(old_hash, "s3cret-pass") == (True, None)
+
+
+def test_slow_operation_times_out_and_keeps_its_slot(hasher):
+    hasher.hash_password("warm-up-1")  # start the worker process outside the timed call
+    hasher.operation_timeout = 0.2
+    with pytest.raises(HashingUnavailableError):
+        hasher._run("hash", time.sleep, 1.0)
+    with pytest.raises(HashingUnavailableError):
+        hasher.hash_password("another-1")
+    assert hasher.metrics()["rejected"] == 1
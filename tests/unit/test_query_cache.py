@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from app.products.query_cache import SearchResultCache, search_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_keys_ignore_case_spacing_and_optionally_term_order():
+    assert search_cache_key("Red  Shoe", 1, 10) == search_cache_key("red shoe", 1, 10)
+    assert search_cache_key("shoe red", 1, 10) != search_cache_key("red shoe", 1, 10)
+    assert search_cache_key("shoe red", 1, 10, ignore_term_order=True) == \
+        search_cache_key("red shoe", 1, 10, ignore_term_order=True)
+    assert search_cache_key("red", 1, 10, cursor="abc") == search_cache_key("red", 2, 10, cursor="abc")
+    assert search_cache_key("red", 1, 10, scope="index") != search_cache_key("red", 1, 10, scope="repository")
+
+
+def test_results_are_reused_until_the_generation_changes():
+    generation = [0]
+    cache = SearchResultCache(generation=lambda: generation[0])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"results": len(calls)}
+
+    assert cache.get_or_compute("k", compute) == {"results": 1}
+    assert cache.get_or_compute("k", compute) == {"results": 1}
+    generation[0] += 1
+    assert cache.get_or_compute("k", compute) == {"results": 2}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_results_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = SearchResultCache(ttl_seconds=30.0, clock=clock)
+    values = iter(["first", "second"])
+
+    assert cache.get_or_compute("k", lambda: next(values)) == "first"
+    clock.now = 30.0
+    assert cache.get_or_compute("k", lambda: next(values)) == "first"
+    clock.now = 30.5
+    assert cache.get_or_compute("k", lambda: next(values)) == "second"
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 1
+
+
+def test_memory_bound_evicts_the_least_recently_used():
+    cache = SearchResultCache(max_bytes=4000)
+    for key in range(20):
+        cache.get_or_compute(key, lambda: "x" * 200)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 4000
+    assert stats["evictions"] > 0
+    assert cache.get_or_compute(19, lambda: "recomputed") == "x" * 200
+
+
+def test_concurrent_misses_run_one_search_and_share_errors():
+    cache = SearchResultCache()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("search failed")
+
+    errors = []
+
+    def lookup():
+        try:
+            cache.get_or_compute("k", slow)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 4
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", slow)  # failures are not cached
+    assert len(calls) == 2
+
+
+def test_shared_entries_keep_each_callers_corrected_query(client, add_products):
+    from app.products.views import search_result_cache
+
+    add_products("Running shoe", "Desk lamp")
+
+    first = client.get("/products/search?q=runing+shoe").get_json()
+    second = client.get("/products/search?q=shoe+runing").get_json()
+
+    assert first["corrected_query"] == "running shoe"
+    assert second["corrected_query"] == "shoe running"
+    assert second["results"] == first["results"]
+    assert search_result_cache.stats()["hits"] == 1
+
+
+def test_stats_require_the_internal_token(app, client):
+    app.config["INTERNAL_API_TOKEN"] = "internal-token"
+
+    assert client.get("/products/search/stats").status_code == 403
+    assert client.get("/products/search/stats", headers={"X-Internal-Token": "wrong"}).status_code == 403
+    response = client.get("/products/search/stats", headers={"X-Internal-Token": "internal-token"})
+    assert response.status_code == 200
+    assert "hits" in response.get_json()
@@ -0,0 +1,53 @@
+from app.products.representation_cache import ProductRepresentationCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_product_etag_changes_with_version_and_content():
+    cache = ProductRepresentationCache()
+    first = cache.put_product({"id": 1, "name": "Lamp"}, version=1)
+    assert cache.get_product(1) is first
+    assert cache.put_product({"id": 1, "name": "Lamp"}, version=1).etag == first.etag
+    assert cache.put_product({"id": 1, "name": "Lamp"}, version=2).etag != first.etag
+    assert cache.put_product({"id": 1, "name": "Desk lamp"}, version=1).etag != first.etag
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ProductRepresentationCache(ttl_seconds=5.0, clock=clock)
+    cache.put_product({"id": 1}, version=1)
+    clock.now = 6.0
+    assert cache.get_product(1) is None
+
+
+def test_generation_bump_retires_listings():
+    cache = ProductRepresentationCache()
+    generation = cache.generation
+    cache.put_listing((None, 20), {"results": []}, generation)
+    assert cache.get_listing((None, 20)) is not None
+    cache.bump_generation()
+    assert cache.get_listing((None, 20)) is None
+
+
+def test_listing_raced_by_a_write_is_not_served():
+    cache = ProductRepresentationCache()
+    generation = cache.generation
+    cache.bump_generation()  # a write lands while the page is being queried
+    cache.put_listing((None, 20), {"results": []}, generation)
+    assert cache.get_listing((None, 20)) is None
+
+
+def test_lru_evicts_oldest_entry():
+    cache = ProductRepresentationCache(max_entries=2)
+    for product_id in (1, 2):
+        cache.put_product({"id": product_id}, version=1)
+    cache.get_product(1)
+    cache.put_product({"id": 3}, version=1)
+    assert cache.get_product(2) is None
+    assert cache.get_product(1) is not None
@@ -0,0 +1,79 @@
+import time
+
+import jwt
+
+from app.auth.reset_tokens import BloomFilter, ResetTokenVerifier
+
+SECRET = "reset-token-test-secret-0123456789"
+USERS = {"user@example.com": 7}
+
+
+def make_token(email="user@example.com", lifetime=3600, **claims):
+    payload = {"email": email, **claims}
+    if lifetime is not None:
+        payload["exp"] = int(time.time()) + lifetime
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+
+class SharedSet:
+    """
+    Stand-in for the database table shared by all workers.
+    """
+
+    def __init__(self):
+        self.digests = set()
+
+    def __contains__(self, digest):
+        return digest in self.digests
+
+    def add(self, digest, expires_at):
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        return True
+
+
+def make_verifier(shared=None):
+    return ResetTokenVerifier(SECRET, USERS.get, shared_revoked=shared)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    items = [str(index).encode() for index in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert sum(str(-index).encode() in bloom for index in range(1, 1001)) < 20
+
+
+def test_valid_token_resolves_to_user():
+    verifier = make_verifier()
+    assert verifier.verify(make_token()) == 7
+    assert verifier.verify(make_token("nobody@example.com")) is None
+
+
+def test_tokens_without_expiry_or_expired_are_rejected():
+    verifier = make_verifier()
+    assert verifier.verify(make_token(lifetime=None)) is None
+    assert verifier.verify(make_token(lifetime=-10)) is None
+    assert verifier.revoke(make_token(lifetime=None)) is False
+
+
+def test_revocation_is_seen_by_other_workers():
+    shared = SharedSet()
+    first, second = make_verifier(shared), make_verifier(shared)
+    token = make_token()
+    assert second.verify(token) == 7  # cached by the second worker
+
+    assert first.revoke(token) is True
+    assert first.verify(token) is None
+    assert second.verify(token) is None
+    assert second.revoke(token) is False
+
+
+def test_local_revocation_without_shared_store():
+    verifier = make_verifier()
+    token = make_token()
+    assert verifier.revoke(token) is True
+    assert verifier.revoke(token) is False
+    assert verifier.verify(token) is None
@@ -0,0 +1,102 @@
+from app.products.search_index import InvertedIndex, tokenize
+
+
+def make_index(*products):
+    index = InvertedIndex()
+    index.rebuild(products)
+    return index
+
+
+def test_tokenize_lowercases_and_splits_on_punctuation():
+    assert tokenize("Red-Running SHOE, size 42") == ["red", "running", "shoe", "size", "42"]
+    assert tokenize(None) == []
+
+
+def test_search_requires_every_term():
+    index = make_index({"id": 1, "name": "red shoe"}, {"id": 2, "name": "blue shoe"}, {"id": 3, "name": "red hat"})
+
+    results, total = index.search("shoe red")
+
+    assert [product["id"] for product in results] == [1]
+    assert total == 1
+
+
+def test_name_matches_rank_above_description_matches():
+    index = make_index({"id": 1, "name": "lamp", "description": "a bright shoe light"},
+                       {"id": 2, "name": "shoe", "description": "leather"})
+
+    results, _ = index.search("shoe")
+
+    assert [product["id"] for product in results] == [2, 1]
+
+
+def test_add_replaces_and_remove_drops_a_product():
+    index = make_index({"id": 1, "name": "red shoe"})
+
+    index.add_product({"id": 1, "name": "green boot"})
+    assert index.search("shoe") == ([], 0)
+    assert index.search("boot")[1] == 1
+
+    assert index.remove_product(1) is True
+    assert index.remove_product(1) is False
+    assert len(index) == 0
+
+
+def test_search_pages_through_ranked_results():
+    index = make_index(*({"id": product_id, "name": f"mug {product_id}"} for product_id in range(1, 8)))
+
+    first, total = index.search("mug", page=1, per_page=3)
+    third, _ = index.search("mug", page=3, per_page=3)
+
+    assert total == 7
+    assert len(first) == 3
+    assert len(third) == 1
+
+
+def test_search_endpoint_is_answered_from_the_index(client, add_products):
+    add_products("red shoe", "blue shoe", "red hat")
+
+    response = client.get("/products/search?q=red")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert {product["name"] for product in body["results"]} == {"red shoe", "red hat"}
+    assert body["pagination"]["total_count"] == 2
+
+
+def test_facets_are_counted_over_every_match():
+    index = make_index({"id": 1, "name": "red shoe", "price": 30, "categories": ["shoes"]},
+                       {"id": 2, "name": "blue shoe", "price": 120, "in_stock": False, "categories": ["shoes"]},
+                       {"id": 10 ** 12, "name": "shoe polish", "price": 5, "categories": ["care"]},
+                       {"id": 4, "name": "red hat", "price": 30, "categories": ["hats"]})
+
+    _, total, facets = index.search_with_facets("shoe", limit=1)
+
+    assert total == 3
+    assert facets == {"category": {"shoes": 2, "care": 1},
+                      "price": {"25-50": 1, "100-250": 1, "0-25": 1},
+                      "in_stock": {True: 2, False: 1}}
+
+
+def test_facet_counts_follow_updates_and_removals():
+    index = make_index({"id": 1, "name": "red shoe", "price": 30, "categories": ["shoes"]})
+
+    index.add_product({"id": 1, "name": "red shoe", "price": 300, "in_stock": False, "categories": ["sale"]})
+    assert index.search_with_facets("shoe", limit=10)[2] == {
+        "category": {"sale": 1}, "price": {"250+": 1}, "in_stock": {False: 1}}
+
+    index.remove_product(1)
+    assert index.search_with_facets("shoe", limit=10)[2] == {"category": {}, "price": {}, "in_stock": {}}
+
+
+def test_facet_bitmaps_use_dense_document_numbers():
+    index = make_index({"id": 10 ** 12, "name": "shoe", "categories": ["shoes"]},
+                       {"id": 7, "name": "hat", "categories": ["hats"]})
+
+    assert sorted(index._document_numbers.values()) == [0, 1]
+    index.remove_product(10 ** 12)
+    index.add_product({"id": 10 ** 15, "name": "boot", "categories": ["shoes"]})
+
+    assert sorted(index._document_numbers.values()) == [0, 1]  # the freed number is reused
+    assert max(bits.bit_length() for bitmaps in index._facets.values() for bits in bitmaps.values()) <= 2
+    assert index.facet_counts([7, 10 ** 15, 10 ** 12])["category"] == {"shoes": 1, "hats": 1}
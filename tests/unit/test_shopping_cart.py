@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+import pytest
+
+from app.cart.shopping_cart import ShoppingCart, ShoppingCartError
+
+
+def product(product_id, price="10.00", **details):
+    return {"id": product_id, "price": price, **details}
+
+
+def test_adding_a_product_twice_sums_its_quantity():
+    cart = ShoppingCart("u1")
+    cart.add_product(product(1, "2.50"))
+    cart.add_product(product(1, "2.50"), quantity=3)
+
+    assert len(cart) == 1
+    assert cart.get_quantity(1) == 4
+    assert cart.get_total_price() == Decimal("10.00")
+
+
+def test_totals_are_exact_decimals():
+    cart = ShoppingCart()
+    cart.add_product(product(1, 0.1), quantity=3)
+
+    assert cart.get_total_price() == Decimal("0.3")
+
+
+def test_partial_and_full_removal():
+    cart = ShoppingCart()
+    cart.add_product(product("a", "5"), quantity=3)
+
+    cart.remove_product("a", 2)
+    assert cart.get_quantity("a") == 1
+    cart.remove_product("a")
+    assert "a" not in cart
+    assert cart.get_total_price() == 0
+
+
+def test_set_quantity_to_zero_removes_the_line():
+    cart = ShoppingCart()
+    cart.add_product(product(1))
+
+    cart.set_quantity(1, 0)
+
+    assert len(cart) == 0
+
+
+def test_set_quantities_treats_int_and_str_ids_as_one_line():
+    cart = ShoppingCart()
+    cart.add_product(product(101, "2.00"), quantity=3)
+
+    cart.set_quantities({101: 0, "101": 2})
+
+    assert cart.get_quantity(101) == 2
+    assert cart.get_total_price() == Decimal("4.00")
+
+
+@pytest.mark.parametrize("quantity", [0, -1, True, 1.5, "2"])
+def test_invalid_quantities_are_rejected(quantity):
+    with pytest.raises(ShoppingCartError):
+        ShoppingCart().add_product(product(1), quantity=quantity)
+
+
+@pytest.mark.parametrize("bad", [{"id": 1}, {"price": 1}, {"id": 1, "price": "abc"}, {"id": 1, "price": -1}])
+def test_invalid_products_are_rejected(bad):
+    with pytest.raises(ShoppingCartError):
+        ShoppingCart().add_product(bad)
+
+
+def test_batch_operations_are_all_or_nothing():
+    cart = ShoppingCart()
+    cart.add_product(product(1))
+
+    with pytest.raises(ShoppingCartError):
+        cart.add_products([(product(2), 1), (product(3), 0)])
+    with pytest.raises(ShoppingCartError):
+        cart.remove_products([1, 99])
+
+    assert cart.get_quantity(1) == 1
+    assert 2 not in cart
+
+
+def test_round_trip_through_the_stored_form():
+    cart = ShoppingCart("u1")
+    cart.add_product(product(1, "3.00", name="mug"), quantity=2)
+
+    restored = ShoppingCart.from_dict(cart.to_dict(), user_id="u1")
+
+    assert restored.to_dict() == {"1": {"id": 1, "price": "3.00", "name": "mug", "quantity": 2}}
+    assert restored.get_total_price() == Decimal("6.00")
+
+
+def test_merge_only_accepts_guest_carts():
+    cart = ShoppingCart("u1")
+    cart.add_product(product(1), quantity=1)
+    guest = ShoppingCart()
+    guest.add_product(product(1), quantity=2)
+
+    cart.merge(guest)
+
+    assert cart.get_quantity(1) == 3
+    with pytest.raises(ShoppingCartError):
+        cart.merge(ShoppingCart("u2"))
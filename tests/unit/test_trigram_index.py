@@ -0,0 +1,65 @@
+from app.products.trigram_index import TrigramIndex, bounded_edit_distance, max_edits, trigrams
+
+
+def make_index(*names, **kwargs):
+    index = TrigramIndex(**kwargs)
+    index.rebuild({"id": product_id, "name": name} for product_id, name in enumerate(names, 1))
+    return index
+
+
+def test_trigrams_are_padded():
+    assert trigrams("shoe") == {"  s", " sh", "sho", "hoe", "oe "}
+
+
+def test_edit_distance_is_bounded_and_counts_transpositions():
+    assert bounded_edit_distance("running", "runing", 2) == 1
+    assert bounded_edit_distance("shoe", "sheo", 1) == 1
+    assert bounded_edit_distance("kitten", "sitting", 3) == 3
+    assert bounded_edit_distance("kitten", "sitting", 2) is None
+    assert bounded_edit_distance("lamp", "lampshade", 2) is None
+    assert (max_edits("ab"), max_edits("shoe"), max_edits("running")) == (0, 1, 2)
+
+
+def test_misspelled_terms_are_corrected_to_the_nearest_word():
+    index = make_index("Running shoe", "Desk lamp", "Rain jacket")
+
+    assert index.correct("runing") == "running"
+    assert index.correct("lmap") == "lamp"
+    assert index.correct("xyzzy") is None
+    assert index.correct("la") is None  # too short to correct
+    assert index.correct_query("red runing shoe") == "red running shoe"  # "red" has no near word
+    assert index.correct_query("running shoe") is None
+
+
+def test_frequency_prefers_common_words_and_skips_unused_ones():
+    index = make_index("Coat", "Cost", "Boat")
+    counts = {"coat": 1, "cost": 5, "boat": 0}
+
+    def frequency(word):
+        return counts.get(word, 0)
+
+    assert index.correct("cozt", frequency=frequency) == "cost"
+    assert index.correct("boatt", frequency=frequency) is None
+    assert index.correct_query("coat cozt", frequency=frequency) == "coat cost"
+
+
+def test_memory_budget_drops_common_trigrams_then_stops_indexing():
+    names = [f"item{number:04d}" for number in range(400)]
+    index = make_index(*names, memory_budget=60 * 1024)
+
+    # Indexing stops at the first word that cannot be fitted in.
+    assert len(index) < len(names)
+    assert index.memory_usage < 64 * 1024
+    before = len(index)
+    index.add_product({"id": 9999, "name": "brandnewword"})
+    assert len(index) == before
+
+
+def test_search_falls_back_to_the_corrected_query(client, add_products):
+    add_products("Running shoe", "Desk lamp")
+
+    body = client.get("/products/search?q=runing").get_json()
+
+    assert body["corrected_query"] == "running"
+    assert [product["name"] for product in body["results"]] == ["Running shoe"]
+    assert client.get("/products/search?q=lamp").get_json()["corrected_query"] is None